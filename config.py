@@ -2,17 +2,21 @@ from dotenv import dotenv_values
 
 class ConfigEnvars:
 
-  def __init__(self, sentic_net_url: str, sentic_net_api_key: str, sentic_net_language):
+  def __init__(self, sentic_net_url: str, sentic_net_api_key: str, sentic_net_language, iemocap_path: str | None = None):
     self.SENTIC_NET_URL = sentic_net_url
     self.SENTIC_NET_API_KEY = sentic_net_api_key
     self.SENTIC_NET_LANGUAGE = sentic_net_language
+    self.IEMOCAP_PATH = iemocap_path
 
 loaded_config = dotenv_values(".env")
 
 
 
+# Missing values are left empty so the scripts that do not need them (or that
+# receive them explicitly, like the benchmarks) still run without a .env file
 config = ConfigEnvars(
-  loaded_config['SENTIC_NET_URL'],
-  loaded_config['SENTIC_NET_API_KEY'],
-  loaded_config['SENTIC_NET_LANGUAGE']
+  loaded_config.get('SENTIC_NET_URL'),
+  loaded_config.get('SENTIC_NET_API_KEY'),
+  loaded_config.get('SENTIC_NET_LANGUAGE'),
+  loaded_config.get('IEMOCAP_PATH')
 )
\ No newline at end of file
@@ -0,0 +1,144 @@
+from labels import CLASSIFIER_LABELS, LabelSet
+import numpy as np
+import pandas as pd
+import json
+import os
+
+BINARY_EXTENSION = ".cols"
+BINARY_VERSION = 1
+
+"""
+----------------------------
+BINARY COLUMNAR FORMAT
+----------------------------
+Besides the tab separated text files, the dataframes in `out/` can be saved in a
+binary columnar format: a directory (with the `.cols` extension) holding one NumPy
+file per column plus a `meta.json` file describing them.
+
+- Label columns (the classifier labels with 0/1 values) are packed together as the
+  bitmasks of a LabelSet, one byte per row, in `labels.npy`.
+- Text columns are stored as a single UTF-8 buffer (`<n>.data.npy`) plus the offsets
+  of every row in characters (`<n>.offsets.npy`), and a mask of missing values
+  (`<n>.nulls.npy`) when there is any.
+- Numeric columns are stored as they are (`<n>.npy`).
+
+All of the files are memory-mapped when loaded, so only the pages actually used are read.
+"""
+
+def binary_path(path: str) -> str:
+  """Get the path of the binary version of a text artifact (e.g. out/iemocap.csv -> out/iemocap.cols)."""
+  return os.path.splitext(path)[0] + BINARY_EXTENSION
+
+def is_binary(path: str) -> bool:
+  return path.endswith(BINARY_EXTENSION)
+
+def _is_label_column(column: pd.Series) -> bool:
+  return column.name in CLASSIFIER_LABELS and pd.api.types.is_integer_dtype(column) and column.isin([0, 1]).all()
+
+def _save_text(directory: str, index: int, column: pd.Series) -> dict:
+  nulls = column.isna().to_numpy()
+  values = column.where(~nulls, "").astype(str).tolist()
+
+  offsets = np.zeros(len(values) + 1, dtype=np.int64)
+  np.cumsum([len(value) for value in values], out=offsets[1:])
+
+  np.save(os.path.join(directory, f"{index}.data.npy"), np.frombuffer("".join(values).encode("utf-8"), dtype=np.uint8))
+  np.save(os.path.join(directory, f"{index}.offsets.npy"), offsets)
+
+  if nulls.any():
+    np.save(os.path.join(directory, f"{index}.nulls.npy"), nulls)
+
+  return { "kind": "text", "nulls": bool(nulls.any()) }
+
+def save_binary(df: pd.DataFrame, path: str):
+  os.makedirs(path, exist_ok=True)
+
+  # The metadata is removed first and written last, so a directory without it is an incomplete save
+  meta_path = os.path.join(path, "meta.json")
+  if os.path.exists(meta_path):
+    os.remove(meta_path)
+
+  label_names = [name for name in df.columns if _is_label_column(df[name])]
+  columns = []
+
+  for index, name in enumerate(df.columns):
+    column = df[name]
+
+    if name in label_names:
+      columns.append({ "name": name, "kind": "label" })
+    elif pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+      np.save(os.path.join(path, f"{index}.npy"), column.to_numpy())
+      columns.append({ "name": name, "kind": "numeric" })
+    else:
+      columns.append({ "name": name, **_save_text(path, index, column) })
+
+  if len(label_names) > 0:
+    np.save(os.path.join(path, "labels.npy"), LabelSet.from_frame(df, label_names).masks)
+
+  with open(meta_path, "w", encoding="utf-8") as file:
+    json.dump({ "version": BINARY_VERSION, "rows": len(df), "labels": label_names, "columns": columns }, file, indent=2)
+
+def load_binary_meta(path: str) -> dict:
+  with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as file:
+    return json.load(file)
+
+def load_binary_label_set(path: str, mmap: bool = True) -> LabelSet:
+  """Load only the labels of a binary artifact, as they are stored on disk."""
+  meta = load_binary_meta(path)
+
+  if len(meta["labels"]) == 0:
+    return LabelSet(np.zeros(meta["rows"], dtype=np.uint8), [])
+
+  return LabelSet(np.load(os.path.join(path, "labels.npy"), mmap_mode="r" if mmap else None), meta["labels"])
+
+def load_binary_labels(path: str, mmap: bool = True) -> np.ndarray:
+  """Load only the (rows x labels) 0/1 matrix of a binary artifact."""
+  return load_binary_label_set(path, mmap).to_dense()
+
+def _load_text(path: str, index: int, nulls: bool, mmap_mode: str | None) -> np.ndarray:
+  data = np.load(os.path.join(path, f"{index}.data.npy"), mmap_mode=mmap_mode)
+  offsets = np.load(os.path.join(path, f"{index}.offsets.npy"), mmap_mode=mmap_mode).tolist()
+
+  # The buffer is decoded once and then sliced by the character offsets
+  text = data.tobytes().decode("utf-8")
+  values = np.empty(len(offsets) - 1, dtype=object)
+  values[:] = [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+  if nulls:
+    values[np.load(os.path.join(path, f"{index}.nulls.npy"))] = np.nan
+
+  return values
+
+def load_binary(path: str, mmap: bool = True) -> pd.DataFrame:
+  meta = load_binary_meta(path)
+  mmap_mode = "r" if mmap else None
+
+  labels = load_binary_labels(path, mmap)
+  label_ids = { name: index for index, name in enumerate(meta["labels"]) }
+
+  data = {}
+  for index, column in enumerate(meta["columns"]):
+    if column["kind"] == "label":
+      data[column["name"]] = labels[:, label_ids[column["name"]]]
+    elif column["kind"] == "numeric":
+      data[column["name"]] = np.load(os.path.join(path, f"{index}.npy"), mmap_mode=mmap_mode)
+    else:
+      data[column["name"]] = _load_text(path, index, column["nulls"], mmap_mode)
+
+  return pd.DataFrame(data, copy=False)
+
+def load_dataframe(path: str, mmap: bool = True) -> pd.DataFrame:
+  """Load a dataframe from a tab separated file or from a binary artifact."""
+  if is_binary(path):
+    return load_binary(path, mmap)
+
+  return pd.read_csv(path, sep='\t')
+
+def save_dataframe(df: pd.DataFrame, path: str, binary: bool = False):
+  """Save a dataframe as a tab separated file, or in the binary columnar format
+  (next to it, with the `.cols` extension) when `binary` is set.
+  """
+  if binary:
+    save_binary(df, binary_path(path))
+  else:
+    df.to_csv(path, sep='\t', index=False)
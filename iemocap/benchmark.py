@@ -0,0 +1,141 @@
+from iemocap.parser import IEMOCAP_EMOTIONS, IemocapParser
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict
+import argparse
+import os
+import random
+import re
+import time
+
+"""
+Micro-benchmark of the IEMOCAP file parsing: the line by line functions that were
+used by the extraction (kept below as they were) against the single pass parser.
+Both are run over the same synthetic files, written in the format of the dataset.
+"""
+
+def legacy_get_dialog(path: str):
+  dialogs: Dict[str, str] = {}
+  with open(path, "r") as file:
+    for line in file:
+      # We split the line into: [dialog_id, timestampt, dialog]
+      splitted_line = line.strip().split(" ", 2)
+
+      # There are comments made during the session irrelevant for the dialog processings
+      if (len(splitted_line) < 3):
+        continue
+
+      dialogs[splitted_line[0]] = splitted_line[2]
+
+  return dialogs
+
+def legacy_get_dialog_emotions(path_list: list[str]):
+  emotions_dict: Dict[str, set] = { }
+
+  for path in path_list:
+    with open(path, "r") as file:
+      for line in file:
+        # We split the line into: [dialog_id, emotion_1, ..., emotion_n, comments]
+        dialog_id, emotions = line.strip().split(" ", 1)
+
+        # List of emotions (omitting the comments and 'Neutral state')
+        emo = re.findall(r":([\w]+);", emotions)
+
+        # If the key exists or is being added for the first time then we create the set
+        if dialog_id not in emotions_dict.keys():
+          emotions_dict[dialog_id] = set()
+
+        emotions_dict[dialog_id].update(emo)
+
+  return emotions_dict
+
+def write_synthetic_dialog(directory: str, name: str, utterances: int, evaluators: int, generator: random.Random):
+  """Write the transcription and the evaluation files of a synthetic dialog."""
+  dialog_ids = [f"{name}_{speaker}{index:03d}" for index in range(utterances) for speaker in "FM"]
+
+  transcription_file = os.path.join(directory, f"{name}.txt")
+  with open(transcription_file, "w") as file:
+    for dialog_id in dialog_ids:
+      start = generator.uniform(0, 300)
+      words = " ".join(generator.choice(["well", "I", "know", "that", "you", "were", "there", "yeah"]) for _ in range(12))
+      file.write(f"{dialog_id} [{start:08.4f}-{start + 2:08.4f}]: {words.capitalize()}.\n")
+
+  evaluation_files = []
+  for evaluator in range(1, evaluators + 1):
+    evaluation_file = os.path.join(directory, f"{name}_e{evaluator}_cat.txt")
+    evaluation_files.append(evaluation_file)
+
+    with open(evaluation_file, "w") as file:
+      for dialog_id in dialog_ids:
+        emotions = ["Neutral state"] + list(IEMOCAP_EMOTIONS)
+        categories = " ".join(f":{emotion};" for emotion in generator.sample(emotions, generator.choice([1, 1, 2])))
+        file.write(f"{dialog_id} {categories} ()\n")
+
+  return transcription_file, evaluation_files
+
+def measure(function: Callable, repeat: int) -> float:
+  """Best time out of `repeat` runs, in seconds."""
+  best = float("inf")
+
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    best = min(best, time.perf_counter() - start)
+
+  return best
+
+def main(parser: argparse.ArgumentParser):
+  args = parser.parse_args()
+  generator = random.Random(args.seed)
+
+  with TemporaryDirectory() as directory:
+    dialogs = [
+      write_synthetic_dialog(directory, f"Ses01F_impro{index:03d}", args.utterances, args.evaluators, generator)
+      for index in range(args.dialogs)
+    ]
+
+    transcription_files = [transcription_file for transcription_file, _ in dialogs]
+    evaluation_files = [evaluation_file for _, evaluation_files in dialogs for evaluation_file in evaluation_files]
+
+    iemocap_parser = IemocapParser()
+
+    # Both implementations must give the same results before being compared
+    for transcription_file, dialog_evaluation_files in dialogs:
+      masks = iemocap_parser.parse_evaluations(dialog_evaluation_files)
+      emotions = { dialog_id: set(iemocap_parser.vocabulary.to_names(mask)) for dialog_id, mask in masks.items() }
+
+      assert dict(iemocap_parser.parse_transcription(transcription_file)) == legacy_get_dialog(transcription_file)
+      assert emotions == legacy_get_dialog_emotions(dialog_evaluation_files)
+
+    lines = args.utterances * 2
+    cases = [
+      ("transcription", transcription_files, len(transcription_files) * lines,
+        lambda: [legacy_get_dialog(path) for path in transcription_files],
+        lambda: [iemocap_parser.parse_transcription(path) for path in transcription_files]),
+      ("evaluation", evaluation_files, len(evaluation_files) * lines,
+        lambda: [legacy_get_dialog_emotions(files) for _, files in dialogs],
+        lambda: [iemocap_parser.parse_evaluations(files) for _, files in dialogs])
+    ]
+
+    print(f"Dialogs: {args.dialogs} | Utterances per dialog: {lines} | Evaluators: {args.evaluators}")
+    print()
+    print(f"{'Files':<15}{'Lines':>10}{'Legacy (ns/line)':>18}{'Parser (ns/line)':>18}{'Speedup':>10}")
+
+    for name, _, total_lines, legacy, single_pass in cases:
+      legacy_time = measure(legacy, args.repeat)
+      parser_time = measure(single_pass, args.repeat)
+
+      print(
+        f"{name:<15}{total_lines:>10}{legacy_time / total_lines * 1e9:>18.0f}"
+        f"{parser_time / total_lines * 1e9:>18.0f}{legacy_time / parser_time:>9.2f}x"
+      )
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Micro-benchmark of the IEMOCAP file parsing | SENTI-Lib")
+
+  parser.add_argument("-d", "--dialogs", help="Amount of synthetic dialogs", action='store', type=int, default=150)
+  parser.add_argument("-u", "--utterances", help="Utterances per speaker in every dialog", action='store', type=int, default=40)
+  parser.add_argument("-e", "--evaluators", help="Evaluation files per dialog", action='store', type=int, default=3)
+  parser.add_argument("-r", "--repeat", help="Runs of every case, the best one is reported", action='store', type=int, default=5)
+  parser.add_argument("-s", "--seed", help="Seed of the synthetic files", action='store', type=int, default=42)
+
+  main(parser)
@@ -1,31 +1,100 @@
+from iemocap.manifest import ExtractionManifest
+from iemocap.parser import IemocapParser
+from config import config
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from glob import glob
-from typing import Dict
-import re
+from typing import Callable, Dict, Iterator
+import argparse
 import json
+import multiprocessing
+import os
+import re
+
+# Root of the dataset, it can be given in the IEMOCAP_PATH variable of the .env file
+# (several roots, like shards of the dataset, are separated by os.pathsep)
+BASE_PATH = config.IEMOCAP_PATH or "/Users/ayepez/Desktop/IEMOCAP_full_release"
+
+# Sessions are the directories of a root named 'Session<number>'
+SESSION_EXPRESSION = re.compile(r"^Session(\d+)$")
+
+# Parser shared by all of the files parsed in a process
+PARSER = IemocapParser()
+
+def get_pool_context():
+  """Get the start method of the pools of processes.
+
+  Forking a process while other threads run (like the stages of the pipeline)
+  can leave a lock held forever in the children, so the workers are started from
+  a clean process instead: a fork server where available, spawned otherwise.
+  """
+  if "forkserver" in multiprocessing.get_all_start_methods():
+    return multiprocessing.get_context("forkserver")
+
+  return multiprocessing.get_context("spawn")
+
+def get_roots(path: str | None = None):
+  """Get the list of roots of the dataset from a path (by default `BASE_PATH`),
+  several roots are separated by os.pathsep (':' in Linux and macOS).
+  """
+  path = BASE_PATH if path is None else path
+
+  return [root for root in path.split(os.pathsep) if root]
+
+def get_sessions(root: str):
+  """Get the sessions found in a root of the dataset, in numerical order."""
+  if not os.path.isdir(root):
+    return []
+
+  sessions = []
+  for name in os.listdir(root):
+    match = SESSION_EXPRESSION.match(name)
+
+    if match is not None and os.path.isdir(os.path.join(root, name)):
+      sessions.append((int(match.group(1)), name))
 
-BASE_PATH = "/Users/ayepez/Desktop/IEMOCAP_full_release"
-SESSIONS = ["Session1", "Session2", "Session3", "Session4", "Session5"]
+  return [name for _, name in sorted(sessions)]
 
-def get_transcription_files():
+def get_transcription_files(root: str, sessions: list[str]):
   """Get a list of all of transcription files existing in the dataset
   per session recorded.
   """
   transcription_files = []
-  for session in SESSIONS:
-    transcription_files.append(glob(f"{BASE_PATH}/{session}/dialog/transcriptions/*.txt"))
+  for session in sessions:
+    transcription_files.append(sorted(glob(f"{root}/{session}/dialog/transcriptions/*.txt")))
 
   return transcription_files
 
-def get_emotion_evaluation_files():
+def get_emotion_evaluation_files(root: str, sessions: list[str]):
   """Get a list of all of emotion evaluation categories files existing
   in the dataset per session recorded.
   """
   emotion_evaluation_files = []
-  for session in SESSIONS:
-    emotion_evaluation_files.append(glob(f"{BASE_PATH}/{session}/dialog/EmoEvaluation/Categorical/*.txt"))
+  for session in sessions:
+    emotion_evaluation_files.append(sorted(glob(f"{root}/{session}/dialog/EmoEvaluation/Categorical/*.txt")))
 
   return emotion_evaluation_files
 
+def discover_corpus(roots: list[str] | None = None):
+  """Find the sessions of every root and their files.
+
+  The roots are listed concurrently (each one may live in a different disk or
+  network share) and the result keeps the order of the roots. Each element is a
+  tuple structured as follows:
+    (session, [transcription_file_1, ..., transcription_file_n], [evaluation_file_1, ..., evaluation_file_n])
+  """
+  roots = get_roots() if roots is None else roots
+
+  def discover_root(root: str):
+    sessions = get_sessions(root)
+    return list(zip(sessions, get_transcription_files(root, sessions), get_emotion_evaluation_files(root, sessions)))
+
+  if len(roots) <= 1:
+    return [session for root in roots for session in discover_root(root)]
+
+  with ThreadPoolExecutor(max_workers=len(roots)) as executor:
+    return [session for sessions in executor.map(discover_root, roots) for session in sessions]
+
 def get_dialog(path: str):
   """Get the dialogs from a single transcription file.
 
@@ -36,19 +105,7 @@ def get_dialog(path: str):
       dialog_id: dialog
     }
   """
-  dialogs: Dict[str, str] = {}
-  with open(path, "r") as file:
-    for line in file:
-      # We split the line into: [dialog_id, timestampt, dialog]
-      splitted_line = line.strip().split(" ", 2)
-
-      # There are comments made during the session irrelevant for the dialog processings
-      if (len(splitted_line) < 3):
-        continue
-
-      dialogs[splitted_line[0]] = splitted_line[2]
-
-  return dialogs
+  return dict(PARSER.parse_transcription(path))
 
 def get_dialog_emotions(path_list: list[str]):
   """Gets the emotions categorized in the dialog for a specific session.
@@ -62,29 +119,45 @@ def get_dialog_emotions(path_list: list[str]):
       dialog_id: set([emotion_1, ..., emotion_n])
     }
   """
-  emotions_dict: Dict[str, set] = { }
+  masks = PARSER.parse_evaluations(path_list)
+
+  return { dialog_id: set(PARSER.vocabulary.to_names(mask)) for dialog_id, mask in masks.items() }
+
+def map_files(function: Callable, files_per_session: list[list], workers: int = 1) -> list[list]:
+  """Apply a parsing function to every file of every session.
+
+  With more than one worker the files of all of the sessions are parsed in a
+  pool of processes. The results keep the same (session, file) structure and
+  order as the input, so the merge afterwards is deterministic.
+  """
+  all_files = [file for files in files_per_session for file in files]
 
-  for path in path_list:
-    with open(path, "r") as file:
-      for line in file:
-        # We split the line into: [dialog_id, emotion_1, ..., emotion_n, comments]
-        dialog_id, emotions = line.strip().split(" ", 1)
+  if workers <= 1:
+    results = [function(file) for file in all_files]
+  else:
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_pool_context()) as executor:
+      results = list(executor.map(function, all_files, chunksize=max(1, len(all_files) // (workers * 4))))
 
-        # List of emotions (omitting the comments and 'Neutral state')
-        emo = re.findall(":([\w]+);", emotions)
+  # Group the results back by session
+  grouped_results = []
+  for files in files_per_session:
+    grouped_results.append(results[:len(files)])
+    results = results[len(files):]
 
-        # If the key exists or is being added for the first time then we create the set
-        if dialog_id not in emotions_dict.keys():
-          emotions_dict[dialog_id] = set()
-          
-        emotions_dict[dialog_id].update(emo)
+  return grouped_results
 
-  return emotions_dict
+def get_file_emotions(path: str):
+  """Gets the emotions categorized in a single evaluation file, see `get_dialog_emotions`."""
+  return get_dialog_emotions([path])
 
-def extract_dialog_emotions():
+def extract_dialog_emotions(workers: int = 1, roots: list[str] | None = None):
   """For each one of the sessions, extract the dialog and the emotions
   categorized by all of the evaluators involved in the respectived session.
 
+  Every file is parsed independently (in parallel when `workers` is greater than
+  one) and the results are merged in session and file name order, so the result
+  does not depend on the amount of workers.
+
   The result is a dictionary where the key is the dialog_id and the value is another
   dictionary with the dialog and the emotions categorized by all of the evaluators.
 
@@ -93,65 +166,215 @@ def extract_dialog_emotions():
       session_nr: {
         dialog_id: {
           dialog: { dialog_id: dialog },
-          emotions: { dialog_id: set([emotion_1, ..., emotion_n]) }
+          emotions: { dialog_id: [emotion_1, ..., emotion_n] }
         }
       }
     }
   """
-  all_information: Dict[str, Dict[str, str | set]] = { }
+  all_information: Dict[str, Dict[str, str | list]] = { }
+  corpus = discover_corpus(roots)
+  sessions = [session for session, _, _ in corpus]
 
   # Create the dict instances for each session
-  for session in SESSIONS:
+  for session in sessions:
     all_information[session] = { }
 
-  # Get the transcription files
-  transcription_files = get_transcription_files()
+  # Parse the transcription and the emotions files
+  dialogs_per_session = map_files(get_dialog, [files for _, files, _ in corpus], workers)
+  emotions_per_session = map_files(get_file_emotions, [files for _, _, files in corpus], workers)
 
   # For each one of the sessions we fill the dictionary with the dialog
-  for index, session in enumerate(SESSIONS):
-    # Files for current session
-    files = transcription_files[index]
-
-    for file in files:
-      # Get the dialog
-      dialogs = get_dialog(file)
-
+  for session, dialogs_per_file in zip(sessions, dialogs_per_session):
+    for dialogs in dialogs_per_file:
       # Save the dialog based on the proposed format
       for dialog_id, dialog in dialogs.items():
-        # Create instance if it does not exist
-        if dialog_id not in all_information[session].keys():
-          all_information[session][dialog_id] = { }
-
-        all_information[session][dialog_id]["dialog"] = dialog
-
-  # Get the emotions files
-  emotion_evaluation_files = get_emotion_evaluation_files()
+        all_information[session].setdefault(dialog_id, { })["dialog"] = dialog
 
   # For each one of the sessions we fill the dictionary with the emotions evaluation
-  for index, session in enumerate(SESSIONS):
-    # Files for current session
-    files = emotion_evaluation_files[index]
+  # of all of the evaluators
+  for session, emotions_per_file in zip(sessions, emotions_per_session):
+    session_emotions: Dict[str, set] = { }
 
-    emotions = get_dialog_emotions(files)
+    for emotions in emotions_per_file:
+      for dialog_id, emotion_set in emotions.items():
+        session_emotions.setdefault(dialog_id, set()).update(emotion_set)
 
-    for dialog_id, emotions in emotions.items():
-      # # Create instance if it does not exist
-      # if dialog_id not in all_information[session].keys():
-      #   print("Dialog ID not found: ", dialog_id)
+    for dialog_id, emotions in session_emotions.items():
+      # Evaluations of dialogs without transcription are ignored
+      if dialog_id not in all_information[session]:
+        continue
 
-      all_information[session][dialog_id]["emotions"] = list(emotions)
+      # Sorted so the output is the same on every run
+      all_information[session][dialog_id]["emotions"] = sorted(emotions)
 
   return all_information
 
 
-def save_dialog_emotions_json():
+def get_dialog_name(path: str):
+  """Get the name of the dialog a file belongs to, from both the transcription
+  files (Ses01F_impro01.txt) and the evaluation files (Ses01F_impro01_e1_cat.txt).
+  """
+  name = os.path.splitext(os.path.basename(path))[0]
+
+  if os.path.dirname(path).endswith("Categorical"):
+    # We remove the evaluator and the category suffix: [dialog_name, evaluator, cat]
+    name = name.rsplit("_", 2)[0]
+
+  return name
+
+def get_dialog_tasks(roots: list[str] | None = None):
+  """Get the files to be parsed for every dialog of the dataset (see
+  `discover_corpus`), in root, session and file name order.
+
+  Each task is a tuple structured as follows:
+    (session, transcription_file, [evaluation_file_1, ..., evaluation_file_n])
+  """
+  tasks = []
+
+  for session, transcription_files, evaluation_files in discover_corpus(roots):
+    evaluations_per_dialog: Dict[str, list[str]] = { }
+    for path in evaluation_files:
+      evaluations_per_dialog.setdefault(get_dialog_name(path), []).append(path)
+
+    for path in transcription_files:
+      tasks.append((session, path, evaluations_per_dialog.get(get_dialog_name(path), [])))
+
+  return tasks
+
+def get_dialog_records(task: tuple[str, str, list[str]]):
+  """Parse the transcription and the evaluations of a single dialog (see
+  `get_dialog_tasks`) into one record per utterance, in transcription order.
+
+  Each record is a dictionary structured as follows (the emotions are missing
+  when the utterance was not evaluated):
+    {
+      session: session_nr,
+      id: dialog_id,
+      dialog: dialog,
+      emotions: [emotion_1, ..., emotion_n]
+    }
+  """
+  session, transcription_file, evaluation_files = task
+
+  masks = PARSER.parse_evaluations(evaluation_files)
+  records = []
+
+  # A dict keeps the last dialog of a repeated dialog_id, in the position of the first one
+  for dialog_id, dialog in dict(PARSER.parse_transcription(transcription_file)).items():
+    record = { "session": session, "id": dialog_id, "dialog": dialog }
+
+    # Sorted so the output is the same on every run
+    mask = masks.get(dialog_id)
+    if mask is not None:
+      record["emotions"] = sorted(PARSER.vocabulary.to_names(mask))
+
+    records.append(record)
+
+  return records
+
+def iter_dialog_records(
+  workers: int = 1,
+  manifest: ExtractionManifest | None = None,
+  roots: list[str] | None = None
+) -> Iterator[dict]:
+  """Yield the record of every utterance of the dataset (see `get_dialog_records`)
+  as soon as the dialog it belongs to is parsed.
+
+  With more than one worker the dialogs are parsed in a pool of processes, with
+  at most a few dialogs per worker in flight, so the memory used does not grow
+  with the size of the dataset. The records are always yielded in session and
+  file name order.
+
+  The dialogs of all of the `roots` go through the same pool, so the shards of a
+  dataset are parsed concurrently.
+
+  When a `manifest` is given, the dialogs whose files did not change since the
+  previous extraction are taken from it instead of being parsed again, and the
+  ones parsed are added to it (it still has to be saved afterwards) with the
+  fingerprints their files had before being parsed.
+  """
+  tasks = get_dialog_tasks(roots)
+
+  if workers <= 1:
+    for task in tasks:
+      records = manifest.get(task) if manifest is not None else None
+
+      if records is None:
+        files = manifest.fingerprint(task) if manifest is not None else None
+        records = get_dialog_records(task)
+
+        if manifest is not None:
+          manifest.put(task, records, files)
+
+      yield from records
+    return
+
+  with ProcessPoolExecutor(max_workers=workers, mp_context=get_pool_context()) as executor:
+    in_flight = deque()
+
+    def pop_records():
+      task, records, files, future = in_flight.popleft()
+      if future is None:
+        return records
+
+      records = future.result()
+      if manifest is not None:
+        manifest.put(task, records, files)
+
+      return records
+
+    for task in tasks:
+      records = manifest.get(task) if manifest is not None else None
+
+      # Wait for the oldest dialog before submitting a new one once the window is full
+      while len(in_flight) >= workers * 2:
+        yield from pop_records()
+
+      # Reused dialogs also go through the window, so the order is kept
+      files, future = None, None
+      if records is None:
+        files = manifest.fingerprint(task) if manifest is not None else None
+        future = executor.submit(get_dialog_records, task)
+
+      in_flight.append((task, records, files, future))
+
+    while in_flight:
+      yield from pop_records()
+
+def save_dialog_emotions_jsonl(
+  path: str = "./out/iemocap.jsonl",
+  workers: int = 1,
+  manifest: ExtractionManifest | None = None,
+  roots: list[str] | None = None
+):
+  """Saves the dialog and the emotions categorized by all of the evaluators
+  into a JSON Lines file, with one record per utterance (see `get_dialog_records`).
+
+  The records are written as the dialogs are parsed, so the whole dataset is
+  never held in memory. With a `manifest` only the dialogs with changed files
+  are parsed again (see `iter_dialog_records`), and the manifest is saved once
+  the file is complete.
+  """
+  saved = 0
+
+  with open(path, "w", encoding='utf-8') as file:
+    for record in iter_dialog_records(workers, manifest, roots):
+      file.write(json.dumps(record, ensure_ascii=False) + "\n")
+      saved += 1
+
+  if manifest is not None:
+    manifest.save()
+
+  return saved
+
+def save_dialog_emotions_json(workers: int = 1, roots: list[str] | None = None):
   """Saves the dialog and the emotions categorized by all of the evaluators
   into a JSON file.
 
   The JSON file constains the structure follows the one defined in the function
   `extract_dialog_emotions`.
   """
-  all_information = extract_dialog_emotions()
+  all_information = extract_dialog_emotions(workers, roots)
 
   # Save the result as a JSON file with proper formatting to ensure readability
   with open("./out/iemocap.json", "w", encoding='utf-8') as file:
@@ -160,4 +383,54 @@ def save_dialog_emotions_json():
 
 
 if __name__ == "__main__":
-  save_dialog_emotions_json()
\ No newline at end of file
+  parser = argparse.ArgumentParser(description="Extraction of the dialogs and emotions of IEMOCAP | SENTI-Lib")
+  parser.add_argument(
+    "-w",
+    "--workers",
+    help="Amount of processes used to parse the files of the dataset",
+    action='store',
+    type=int,
+    default=os.cpu_count()
+  )
+  parser.add_argument(
+    "--format",
+    help="Format of the output: one record per utterance (jsonl) or the nested JSON of all of the sessions (json)",
+    action='store',
+    choices=["jsonl", "json"],
+    default="jsonl"
+  )
+  parser.add_argument(
+    "-m",
+    "--manifest",
+    help="Manifest of the files already parsed, only the dialogs with changed files are parsed again (jsonl format only)",
+    action='store',
+    default="./out/iemocap_manifest.json"
+  )
+  parser.add_argument(
+    "--full",
+    help="Parse all of the files again, ignoring (and not updating) the manifest",
+    action='store_true'
+  )
+  parser.add_argument(
+    "-r",
+    "--root",
+    help="Root of the dataset (or of a shard of it), it can be given multiple times. By default IEMOCAP_PATH of the .env file",
+    action='append',
+    default=None
+  )
+  args = parser.parse_args()
+
+  roots = get_roots() if args.root is None else [root for path in args.root for root in get_roots(path)]
+
+  # Every root must hold at least one session, a wrong path would silently produce an empty dataset
+  missing_roots = [root for root in roots if len(get_sessions(root)) == 0]
+  if len(roots) == 0 or len(missing_roots) > 0:
+    print(f"[ERROR] No sessions were found in the roots: {', '.join(missing_roots) or '(none given)'}")
+  elif args.format == "jsonl":
+    manifest = None if args.full else ExtractionManifest(args.manifest)
+    save_dialog_emotions_jsonl(workers=args.workers, manifest=manifest, roots=roots)
+
+    if manifest is not None:
+      print(manifest.summary())
+  else:
+    save_dialog_emotions_json(args.workers, roots)
@@ -1,8 +1,12 @@
+from labels import LabelMapping, LabelSet, label_frame
+import frames
+from typing import Iterable, Iterator
+import argparse
 import pandas as pd
 import json
+import os
 
 IEMOCAP_LABELS = ["happiness", "anger", "sadness", "frustration", "neutral state", "excitement", "fear", "surprise", "other"]
-CLASSIFIER_LABELS = ["joy", "sadness", "trust", "disgust", "fear", "anger", "surprise", "anticipation"]
 
 """
 ----------------------------
@@ -25,112 +29,122 @@ Emotions will be assigned as follows:
 - Surprise: surprise
 - Other:
 """
+# Keys are the categories as written in the evaluation files of the dataset ('Neutral state'
+# is never extracted, and 'Disgust' is left out of the assignment just like 'Other')
+IEMOCAP_MAPPING = LabelMapping({
+  "Happiness": ["joy", "trust"],
+  "Anger": ["anger"],
+  "Sadness": ["sadness"],
+  "Frustration": ["anger", "sadness"],
+  "Excited": ["joy", "anticipation"],
+  "Fear": ["fear"],
+  "Surprise": ["surprise"],
+  "Disgust": [],
+  "Other": []
+})
 
 def load_json(path: str):
   with open(path, "r") as file:
     return json.load(file)
 
-def save_dataframe(df: pd.DataFrame, filename: str):
-  df.to_csv("out/" + filename, sep='\t', index=False)
-
-def pre_process(json_data: dict):
-  data = []
+def iter_jsonl(path: str) -> Iterator[dict]:
+  """Read the records of a JSON Lines extraction one line at a time."""
+  with open(path, "r", encoding="utf-8") as file:
+    for line in file:
+      if line.strip():
+        yield json.loads(line)
+
+def iter_json_records(json_data: dict) -> Iterator[dict]:
+  """Flatten the nested JSON extraction ({ session: { dialog_id: {...} } }) into
+  the same records of the JSON Lines extraction.
+  """
+  for session, utterances in json_data.items():
+    for id, utterance in utterances.items():
+      yield { "session": session, "id": id, **utterance }
+
+def load_records(path: str) -> Iterator[dict]:
+  """Get the records of an extraction, either in JSON Lines (streamed) or in the nested JSON format."""
+  if path.endswith(".jsonl"):
+    return iter_jsonl(path)
+
+  return iter_json_records(load_json(path))
+
+def save_dataframe(df: pd.DataFrame, filename: str, binary: bool = False):
+  frames.save_dataframe(df, "out/" + filename, binary)
+
+def pre_process(records: Iterable[dict]):
+  ids = []
+  dialogs = []
+  emotions = []
   error = []
 
-  for session in json_data:
-    for id in json_data[session]:
-      # We manually save the row with id, dialog and emotions present
-      row = []
+  # The records are consumed one at a time, so they can come straight from the extraction
+  for record in records:
+    # There may be some cases were the emotions are not present, we discard them
+    if "emotions" not in record:
+      error.append(record["id"])
+      continue
 
-      row.append(id)
-      row.append(json_data[session][id]["dialog"])
+    ids.append(record["id"])
+    dialogs.append(record["dialog"])
+    emotions.append(record["emotions"])
 
-      # There may be some cases were the emotions are not present, we discard them
-      if "emotions" not in json_data[session][id]:
-        error.append(id)
-        continue
+  data = pd.DataFrame({ "id": ids, "dialog": dialogs, "emotions": emotions })
 
-      row.append(json_data[session][id]["emotions"])
+  return data, error
 
-      data.append(row)
+def convert_column(column: pd.Series) -> LabelSet:
+  # Every row is the list of emotions given by the evaluators
+  return LabelSet.from_dense(IEMOCAP_MAPPING.from_tokens(column))
 
-  return data, error
+def get_extraction_filename() -> str:
+  """Get the extraction in out/ formatted by default: iemocap.jsonl when it exists, iemocap.json otherwise."""
+  return "iemocap.jsonl" if os.path.exists("./out/iemocap.jsonl") else "iemocap.json"
+
+def main(filename: str, binary: bool = False, records: Iterable[dict] | None = None) -> pd.DataFrame:
+  """Format an extraction and save it, the records can be given when they are
+  already in memory (e.g. handed by the pipeline) instead of reading the file.
+  Returns the dataframe saved.
+  """
+  if records is None:
+    records = load_records("./out/" + filename)
 
-def get_column(label: str, data: list):
-  index = 0
-
-  if label == "id":
-    index = 0
-  elif label == "dialog":
-    index = 1
-  elif label == "emotions":
-    index = 2
-
-  return [row[index] for row in data]
-
-def convert_row(row: list[1 | 0]) -> list[1 | 0]:
-  new_row = [0 for _ in range(0, len(CLASSIFIER_LABELS))]
-
-  # We assign it according to the end result assignments we set up as end result
-  assignment_index = []
-
-  for element in row:
-    # Manually go through the labels and parse them to the new emotions/labels
-    # while ignoring the 'neutral state' and 'other' emotions
-    if element == "Happiness":
-      assignment_index.append(0)
-      assignment_index.append(2)
-    elif element == "Anger":
-      assignment_index.append(5)
-    elif element == "Sadness":
-      assignment_index.append(1)
-    elif element == "Frustration":
-      assignment_index.append(5)
-      assignment_index.append(1)
-    elif element == "Excited":
-      assignment_index.append(0)
-      assignment_index.append(7)
-    elif element == "Fear":
-      assignment_index.append(4)
-    elif element == "Surprise":
-      assignment_index.append(6)
-
-  # We assign the new indexes to the new resulting row
-  for new_index in assignment_index:
-    new_row[new_index] = 1
-
-  return new_row
-
-def main(filename: str):
   # We process the dataset from the original format to the 3 columns (id, text, target)
-  df = load_json("./out/" + filename)
-  data, error = pre_process(df)
+  data, error = pre_process(records)
 
   if len(error) > 0:
     print("Amount of rows malformed with errors: ", len(error))
 
-  # Obtain individual columns
-  dialog_id_column = get_column("id", data)
-  dialog_column = get_column("dialog", data)
-  target_column = get_column("emotions", data)
-
   # Convert the target column to the new format
-  new_target_column = [convert_row(row) for row in target_column]
+  new_target_column = convert_column(data["emotions"])
 
   # Join the text and the labels in a new dataframe
-  text_and_labels = [
-    [
-      dialog_id_column[index],
-      dialog_column[index], 
-      *new_target_column[index]
-    ] for index in range(0,int(len(new_target_column)))
-  ]
-  new_df = pd.DataFrame(text_and_labels, columns=["ID", "Dialog", *CLASSIFIER_LABELS])
+  new_df = label_frame(data["id"], data["dialog"], new_target_column, columns=("ID", "Dialog"))
 
   # Save the new dataframe
-  save_dataframe(new_df, filename.replace(".json", ".csv"))
+  save_dataframe(new_df, os.path.splitext(filename)[0] + ".csv", binary)
+
+  return new_df
   
 
 if __name__ == "__main__":
-  main("iemocap.json")
-  
\ No newline at end of file
+  parser = argparse.ArgumentParser(description="Formatter of the IEMOCAP extraction to the classifier labels | SENTI-Lib")
+  parser.add_argument(
+    "--binary",
+    help="Save the results in the binary columnar format (.cols) instead of tab separated text",
+    action='store_true'
+  )
+  parser.add_argument(
+    "-i",
+    "--input",
+    help="Extraction in out/ to be formatted (JSON Lines or nested JSON), by default iemocap.jsonl when it exists",
+    action='store',
+    default=None
+  )
+  args = parser.parse_args()
+
+  filename = args.input
+  if filename is None:
+    filename = get_extraction_filename()
+
+  main(filename, args.binary)
@@ -0,0 +1,176 @@
+from typing import Dict
+import hashlib
+import json
+import os
+import time
+
+# Increased whenever the records produced for a dialog change, so older manifests are discarded
+MANIFEST_VERSION = 2
+
+def get_file_fingerprint(path: str, content_hash: bool = True) -> list:
+  """Get the fingerprint of a file as [mtime_ns, size, sha256], the hash is
+  only computed when `content_hash` is set (None otherwise).
+  """
+  stat = os.stat(path)
+  digest = None
+
+  if content_hash:
+    with open(path, "rb") as file:
+      digest = hashlib.sha256(file.read()).hexdigest()
+
+  return [stat.st_mtime_ns, stat.st_size, digest]
+
+class ExtractionManifest:
+  """Record of the files parsed by a previous extraction and of their results.
+
+  For every dialog (addressed by its transcription file) the manifest keeps the
+  fingerprint of all of the files it was parsed from, and its records are kept
+  in a JSON Lines file of their own in `records_directory` (by default next to
+  the manifest), so the manifest never holds the records of the whole dataset.
+  A dialog is only parsed again when one of its files is added, removed or has
+  a different content: the modification time and size are checked first, and
+  the content hash is only computed when they differ, so a file that was just
+  touched keeps its results.
+
+  The records files are named after the fingerprints of the files they come
+  from, so the ones of the previous manifest are never overwritten before the
+  new manifest is saved.
+
+  The manifest is stored as a JSON file, written to a temporary file first and
+  then moved over the previous one. It is structured as follows:
+    {
+      version: MANIFEST_VERSION,
+      updated_at: unix timestamp of the last update,
+      dialogs: {
+        transcription_file: {
+          files: { path: [mtime_ns, size, sha256] },
+          records: name of the records file
+        }
+      }
+    }
+  """
+  def __init__(self, path: str, records_directory: str | None = None):
+    self.path = path
+    self.records_directory = records_directory if records_directory is not None else path + ".records"
+    self.dialogs: Dict[str, dict] = { }
+
+    self.reused = 0
+    self.parsed = 0
+
+    self._seen: set[str] = set()
+    self._changed = False
+
+    if os.path.exists(path):
+      with open(path, "r", encoding="utf-8") as file:
+        state = json.load(file)
+
+      if state.get("version") == MANIFEST_VERSION:
+        self.dialogs = state["dialogs"]
+
+  def _is_unchanged(self, path: str, fingerprint: list) -> bool:
+    if not os.path.exists(path):
+      return False
+
+    current = get_file_fingerprint(path, content_hash=False)
+    if current[:2] == fingerprint[:2]:
+      return True
+
+    # The file was modified (or just touched), we compare the content
+    current = get_file_fingerprint(path)
+    if current[2] != fingerprint[2]:
+      return False
+
+    fingerprint[:2] = current[:2]
+    self._changed = True
+    return True
+
+  def _load_records(self, name: str) -> list[dict] | None:
+    path = os.path.join(self.records_directory, name)
+    if not os.path.exists(path):
+      return None
+
+    try:
+      with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+    except ValueError:
+      return None
+
+  def get(self, task: tuple[str, str, list[str]]) -> list[dict] | None:
+    """Get the records of a dialog task (see `get_dialog_tasks`) if none of its files changed."""
+    _, transcription_file, evaluation_files = task
+    self._seen.add(transcription_file)
+
+    entry = self.dialogs.get(transcription_file)
+    if entry is None or set(entry["files"]) != { transcription_file, *evaluation_files }:
+      return None
+
+    for path, fingerprint in entry["files"].items():
+      if not self._is_unchanged(path, fingerprint):
+        return None
+
+    records = self._load_records(entry["records"])
+    if records is None:
+      return None
+
+    self.reused += 1
+    return records
+
+  def fingerprint(self, task: tuple[str, str, list[str]]) -> Dict[str, list]:
+    """Get the fingerprints of the files of a dialog task, taken before they are
+    parsed so a file edited in the meantime is parsed again the next time.
+    """
+    _, transcription_file, evaluation_files = task
+    return { path: get_file_fingerprint(path) for path in [transcription_file, *evaluation_files] }
+
+  def put(self, task: tuple[str, str, list[str]], records: list[dict], files: Dict[str, list]):
+    """Add the records of a dialog task parsed from the files with the given fingerprints (see `fingerprint`)."""
+    _, transcription_file, _ = task
+    self._seen.add(transcription_file)
+
+    name = hashlib.sha256(json.dumps([transcription_file, files], sort_keys=True).encode("utf-8")).hexdigest() + ".jsonl"
+    os.makedirs(self.records_directory, exist_ok=True)
+
+    temporary_path = os.path.join(self.records_directory, name + ".tmp")
+    with open(temporary_path, "w", encoding="utf-8") as file:
+      for record in records:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+      file.flush()
+      os.fsync(file.fileno())
+
+    os.replace(temporary_path, os.path.join(self.records_directory, name))
+
+    self.dialogs[transcription_file] = { "files": files, "records": name }
+    self.parsed += 1
+    self._changed = True
+
+  def save(self):
+    """Save the manifest, dropping the dialogs that were not part of this extraction
+    and the records files no dialog points to anymore.
+    """
+    dialogs = { path: entry for path, entry in self.dialogs.items() if path in self._seen }
+
+    # Nothing to be written when every dialog was reused as it was
+    if not self._changed and len(dialogs) == len(self.dialogs) and os.path.exists(self.path):
+      return
+
+    state = { "version": MANIFEST_VERSION, "updated_at": time.time(), "dialogs": dialogs }
+    temporary_path = self.path + ".tmp"
+
+    with open(temporary_path, "w", encoding="utf-8") as file:
+      file.write(json.dumps(state, ensure_ascii=False))
+      file.flush()
+      os.fsync(file.fileno())
+
+    os.replace(temporary_path, self.path)
+    self.dialogs = dialogs
+
+    # The previous manifest is replaced, so its records files can be removed now
+    if os.path.isdir(self.records_directory):
+      names = { entry["records"] for entry in dialogs.values() }
+
+      for name in os.listdir(self.records_directory):
+        if name not in names:
+          os.remove(os.path.join(self.records_directory, name))
+
+  def summary(self) -> str:
+    return f"Dialogs reused: {self.reused} | Dialogs parsed: {self.parsed}"
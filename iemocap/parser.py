@@ -0,0 +1,138 @@
+from typing import Dict, Iterable, Iterator
+import re
+
+# Categories written in the evaluation files of the dataset, the position in the tuple is
+# the bit of the category in the emotion bitmasks ('Neutral state' is never captured)
+IEMOCAP_EMOTIONS = ("Happiness", "Anger", "Sadness", "Frustration", "Excited", "Fear", "Surprise", "Disgust", "Other")
+
+# Size of the blocks read from the files, the dataset files are usually read in a single block
+CHUNK_SIZE = 1 << 20
+
+# Distinct emotion texts whose bitmask is kept by the parser
+MAX_CACHED_MASKS = 4096
+
+def iter_blocks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[list[str]]:
+  """Read the lines of a file in large blocks instead of one line at a time.
+
+  The file is read as bytes and every block is decoded at once, so each yielded
+  list holds all of the complete lines of a block (without the line breaks).
+  """
+  with open(path, "rb") as file:
+    remainder = b""
+
+    while True:
+      chunk = file.read(chunk_size)
+      if not chunk:
+        break
+
+      # The last line may continue in the next block
+      lines, _, remainder = (remainder + chunk).rpartition(b"\n")
+      if lines:
+        yield lines.decode("utf-8").split("\n")
+
+    if remainder:
+      yield [remainder.decode("utf-8")]
+
+class EmotionVocabulary:
+  """Table of the emotion categories, where every category is a bit of an integer
+  bitmask, so the emotions given by all of the evaluators of an utterance are
+  merged with a bitwise or.
+
+  Categories missing in the table get the next free bit the first time they are
+  seen, so no category of the files is ever lost.
+  """
+  def __init__(self, emotions: Iterable[str] = IEMOCAP_EMOTIONS):
+    self.emotions = list(emotions)
+    self.bits = { emotion: 1 << index for index, emotion in enumerate(self.emotions) }
+
+  def get_bit(self, emotion: str) -> int:
+    bit = self.bits.get(emotion)
+
+    if bit is None:
+      bit = 1 << len(self.emotions)
+      self.emotions.append(emotion)
+      self.bits[emotion] = bit
+
+    return bit
+
+  def to_names(self, mask: int) -> list[str]:
+    """Get the categories of a bitmask, in the order of the table."""
+    return [emotion for index, emotion in enumerate(self.emotions) if mask >> index & 1]
+
+class IemocapParser:
+  """Single pass parser of the transcription and the emotion evaluation files.
+
+  Every file is read in large blocks and each line goes through a single split
+  plus a precompiled expression. The results are compact (dialog_id, value)
+  tuples, where the emotions are bitmasks of the vocabulary instead of sets.
+
+  The dialog IDs are not interned, with files parsed once the cost of interning
+  every ID is higher than the lookups it saves (see `iemocap/benchmark.py`).
+  """
+  def __init__(self, vocabulary: EmotionVocabulary | None = None):
+    self.vocabulary = vocabulary if vocabulary is not None else EmotionVocabulary()
+
+    # Categories are written as ':Category;' and anything after them is a comment
+    self._emotions = re.compile(r":(\w+);")
+
+    # Bitmask of every distinct emotions text, the same few combinations of
+    # categories are repeated in most of the lines
+    self._masks: Dict[str, int] = { }
+
+  def parse_transcription(self, path: str) -> list[tuple[str, str]]:
+    """Get the (dialog_id, dialog) tuples of a transcription file, in order.
+
+    Lines are structured as 'dialog_id timestamp: dialog', the ones with less
+    than three parts are comments made during the session and are skipped.
+    """
+    dialogs = []
+
+    for lines in iter_blocks(path):
+      for line in lines:
+        # We split the line into: [dialog_id, timestamp, dialog]
+        parts = line.strip().split(" ", 2)
+
+        if len(parts) == 3:
+          dialogs.append((parts[0], parts[2]))
+
+    return dialogs
+
+  def parse_evaluation(self, path: str) -> Iterator[tuple[str, int]]:
+    """Yield the (dialog_id, emotion bitmask) tuples of an evaluation file."""
+    masks = self._masks
+
+    for lines in iter_blocks(path):
+      for line in lines:
+        # We split the line into: [dialog_id, emotions and comments]
+        dialog_id, _, emotions = line.strip().partition(" ")
+
+        if not dialog_id:
+          continue
+
+        mask = masks.get(emotions)
+        if mask is None:
+          mask = self._parse_emotions(emotions)
+
+        yield dialog_id, mask
+
+  def _parse_emotions(self, emotions: str) -> int:
+    mask = 0
+    for emotion in self._emotions.findall(emotions):
+      mask |= self.vocabulary.get_bit(emotion)
+
+    # The table is emptied once in a while so comments can not make it grow without limit
+    if len(self._masks) >= MAX_CACHED_MASKS:
+      self._masks.clear()
+    self._masks[emotions] = mask
+
+    return mask
+
+  def parse_evaluations(self, paths: Iterable[str]) -> Dict[str, int]:
+    """Merge the emotions of all of the evaluators into one bitmask per dialog_id."""
+    masks: Dict[str, int] = { }
+
+    for path in paths:
+      for dialog_id, mask in self.parse_evaluation(path):
+        masks[dialog_id] = masks.get(dialog_id, 0) | mask
+
+    return masks
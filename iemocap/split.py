@@ -1,36 +1,330 @@
-from sklearn.model_selection import train_test_split
+from labels import CLASSIFIER_LABELS, LabelSet
+import frames
+from typing import Callable, Iterator
+import argparse
+import hashlib
 import numpy as np
 import pandas as pd
+import os
+
+DEFAULT_SEED = 42
+TRAIN_FRACTION = 0.7
+ID_COLUMN = "ID"
+
+ASSIGNMENTS = ["random", "hash"]
+
+"""
+----------------------------
+SPLIT ASSIGNMENT
+----------------------------
+Every row is assigned to a part: 0 (train) or 1 (test) for a train/test split, or
+the number of its fold for a k-fold split. The parts are computed for all of the
+rows at once with NumPy, and the same rows always get the same parts for the same
+seed, whether the file is split in memory or streamed in chunks:
+
+- Random: one uniform number per row, drawn in order from a generator seeded with
+  the seed (train when the number is <= TRAIN_FRACTION, as it was always done).
+- Hash: the uniform number of a row comes from the hash of its ID keyed with the
+  seed, so it does not depend on the position of the row or on the other rows.
+  Adding, removing or reordering rows never moves the rest to another part, and
+  new rows can be appended to the previous outputs (see `split_streaming`).
+- Stratified: the rows of every label bitmask are shuffled and split separately,
+  so every combination of labels keeps the same proportions in every part.
+"""
 
 def load_dataframe(path: str) -> pd.DataFrame:
-  return pd.read_csv(path, sep='\t')
+  return frames.load_dataframe(path)
+
+def save_dataframe(df: pd.DataFrame, filename: str, binary: bool = False):
+  frames.save_dataframe(df, "out/" + filename, binary)
+
+def hash_uniform(ids: pd.Series, seed: int = DEFAULT_SEED) -> np.ndarray:
+  """Get a uniform number in [0, 1) for every ID from its hash keyed with the seed."""
+  hash_key = hashlib.sha256(str(seed).encode("utf-8")).hexdigest()[:16]
+  hashes = pd.util.hash_pandas_object(pd.Series(ids, dtype=str), index=False, hash_key=hash_key).to_numpy()
+
+  # The 53 highest bits fill the mantissa of a double, like the generator does
+  return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+def parts_from_uniform(uniform: np.ndarray, folds: int | None = None, train_fraction: float = TRAIN_FRACTION) -> np.ndarray:
+  """Turn uniform numbers in [0, 1) into the part of every row."""
+  if folds is None:
+    return (uniform > train_fraction).astype(np.int8)
+
+  return np.minimum((uniform * folds).astype(np.int64), folds - 1).astype(np.int8)
+
+def stratified_parts(
+  masks: np.ndarray,
+  seed: int = DEFAULT_SEED,
+  folds: int | None = None,
+  train_fraction: float = TRAIN_FRACTION
+) -> np.ndarray:
+  """Get the part of every row keeping the proportions of every label bitmask.
+
+  The rows are sorted by bitmask and, inside every bitmask, in a random order,
+  so the rank of a row inside its bitmask decides its part.
+  """
+  gen = np.random.default_rng(seed)
+  masks = np.asarray(masks)
+  n = len(masks)
+
+  order = np.lexsort((gen.random(n), masks))
+  sorted_masks = masks[order]
 
-def save_dataframe(df: pd.DataFrame, filename: str):
-  df.to_csv("out/" + filename, sep='\t', index=False)
+  # Start and size of every group of rows with the same bitmask
+  starts = np.flatnonzero(np.r_[True, sorted_masks[1:] != sorted_masks[:-1]]) if n > 0 else np.zeros(0, dtype=np.int64)
+  sizes = np.diff(np.r_[starts, n])
 
-def main(filename: str):
-  df = load_dataframe("./out/" + filename)
+  ranks = np.empty(n, dtype=np.int64)
+  ranks[order] = np.arange(n) - np.repeat(starts, sizes)
 
-  # We use a generator to create a random number between 0 and 1
-  # and select 42 as the seed for reproducibility
-  gen = np.random.default_rng(42)
-  
-  # We add a column to the dataframe with a random number for each row
-  df['split'] = [gen.random() for _ in range(0, len(df))]
+  if folds is None:
+    train_sizes = np.empty(n, dtype=np.float64)
+    train_sizes[order] = np.repeat(np.round(sizes * train_fraction), sizes)
 
-  # Use the random number to split the dataset based on the 70/30 rule
-  msk = df["split"] <= 0.7
+    return (ranks >= train_sizes).astype(np.int8)
 
-  train = df[msk]
-  test = df[~msk]
+  # A random first fold per bitmask, otherwise the first fold would get the extra
+  # row of every bitmask whose size is not a multiple of the folds
+  offsets = np.empty(n, dtype=np.int64)
+  offsets[order] = np.repeat(gen.integers(folds, size=len(sizes)), sizes)
 
-  # Remove the split column
-  train = train.drop(columns=["split"])
-  test = test.drop(columns=["split"])
+  return ((ranks + offsets) % folds).astype(np.int8)
+
+def get_outputs(filename: str, folds: int | None = None) -> list[tuple[str, Callable[[np.ndarray], np.ndarray]]]:
+  """Get the output files of a split and the selection of the rows of each one
+  from the parts of the rows.
+
+  A train/test split creates <name>-train and <name>-test, and a k-fold split
+  creates <name>-fold<i>-train and <name>-fold<i>-test for every fold i (1 to k).
+  """
+  if folds is None:
+    return [
+      (filename.replace(".csv", "-train.csv"), lambda parts: parts == 0),
+      (filename.replace(".csv", "-test.csv"), lambda parts: parts == 1)
+    ]
+
+  outputs = []
+  for fold in range(folds):
+    outputs.append((filename.replace(".csv", f"-fold{fold + 1}-train.csv"), lambda parts, fold=fold: parts != fold))
+    outputs.append((filename.replace(".csv", f"-fold{fold + 1}-test.csv"), lambda parts, fold=fold: parts == fold))
+
+  return outputs
+
+def split_frame(
+  df: pd.DataFrame,
+  filename: str,
+  binary: bool = False,
+  folds: int | None = None,
+  stratify: bool = False,
+  seed: int = DEFAULT_SEED,
+  train_fraction: float = TRAIN_FRACTION,
+  assign: str = "random",
+  id_column: str = ID_COLUMN
+) -> dict[str, pd.DataFrame]:
+  """Split a dataframe already in memory (the contents of `filename`) and save
+  the outputs. Returns the dataframe saved in every output file.
+  """
+  if stratify:
+    parts = stratified_parts(LabelSet.from_frame(df).masks, seed, folds, train_fraction)
+  elif assign == "hash":
+    parts = parts_from_uniform(hash_uniform(df[id_column], seed), folds, train_fraction)
+  else:
+    # A single draw of a random number between 0 and 1 for every row
+    parts = parts_from_uniform(np.random.default_rng(seed).random(len(df)), folds, train_fraction)
 
   # Save the resulting dataframes
-  save_dataframe(train, filename.replace(".csv", "-train.csv"))
-  save_dataframe(test, filename.replace(".csv", "-test.csv"))
+  splits = {}
+  for output, select in get_outputs(filename, folds):
+    splits[output] = df[select(parts)]
+    save_dataframe(splits[output], output, binary)
+
+  return splits
+
+def split_in_memory(
+  filename: str,
+  binary: bool = False,
+  folds: int | None = None,
+  stratify: bool = False,
+  seed: int = DEFAULT_SEED,
+  train_fraction: float = TRAIN_FRACTION,
+  assign: str = "random",
+  id_column: str = ID_COLUMN
+):
+  # In binary mode the input is the binary version of the file as well
+  path = "./out/" + filename
+  df = load_dataframe(frames.binary_path(path) if binary else path)
+
+  split_frame(df, filename, binary, folds, stratify, seed, train_fraction, assign, id_column)
+
+def read_chunks(path: str, chunk_size: int, usecols: list[str] | None = None) -> Iterator[pd.DataFrame]:
+  # The values are kept as the text they are, so the rows are written back unchanged
+  return pd.read_csv(path, sep='\t', dtype=str, keep_default_na=False, usecols=usecols, chunksize=chunk_size)
+
+def read_split_ids(path: str, id_column: str, chunk_size: int) -> set[str]:
+  """Get the IDs of the rows already saved in a split output."""
+  if not os.path.exists(path) or os.path.getsize(path) == 0:
+    return set()
+
+  ids = set()
+  for chunk in read_chunks(path, chunk_size, [id_column]):
+    ids.update(chunk[id_column])
+
+  return ids
+
+def split_streaming(
+  filename: str,
+  folds: int | None = None,
+  stratify: bool = False,
+  seed: int = DEFAULT_SEED,
+  train_fraction: float = TRAIN_FRACTION,
+  chunk_size: int = 100_000,
+  assign: str = "random",
+  id_column: str = ID_COLUMN,
+  incremental: bool = False
+):
+  """Split a tab separated file in chunks, writing all of the outputs in a single
+  pass, so the file never has to fit in memory.
+
+  The random split draws the numbers of every chunk in order, so the result is the
+  same as the one of `split_in_memory`. The stratified split needs the bitmasks of
+  all of the rows first, they are read in a previous pass over the label columns
+  only (one byte per row).
+
+  With `incremental` (only for the hash assignment) the previous outputs are kept
+  and only the rows whose IDs are not in them yet are appended, so a dataset that
+  grows only needs its new rows to be split (and processed afterwards).
+
+  Returns the amount of rows split.
+  """
+  path = "./out/" + filename
+  outputs = get_outputs(filename, folds)
+
+  # Every row of the previous split is in at least one of the outputs
+  known_ids = set()
+  if incremental:
+    for output, _ in outputs:
+      known_ids.update(read_split_ids("out/" + output, id_column, chunk_size))
+
+  parts = None
+  if stratify:
+    masks = [LabelSet.from_frame(chunk.astype(np.uint8)).masks for chunk in read_chunks(path, chunk_size, CLASSIFIER_LABELS)]
+    parts = stratified_parts(np.concatenate(masks) if masks else np.zeros(0, dtype=np.uint8), seed, folds, train_fraction)
+
+  gen = np.random.default_rng(seed)
+  files = [open("out/" + output, "a" if incremental else "w", encoding="utf-8", newline="") for output, _ in outputs]
+
+  # The header is only written at the start of every file
+  headers = [file.tell() == 0 for file in files]
+  saved = 0
+
+  try:
+    position = 0
+    for chunk in read_chunks(path, chunk_size):
+      if parts is not None:
+        chunk_parts = parts[position:position + len(chunk)]
+      elif assign == "hash":
+        chunk_parts = parts_from_uniform(hash_uniform(chunk[id_column], seed), folds, train_fraction)
+      else:
+        chunk_parts = parts_from_uniform(gen.random(len(chunk)), folds, train_fraction)
+
+      position += len(chunk)
+
+      if len(known_ids) > 0:
+        new_rows = ~chunk[id_column].isin(known_ids).to_numpy()
+        chunk, chunk_parts = chunk[new_rows], chunk_parts[new_rows]
+
+      for index, (file, (_, select)) in enumerate(zip(files, outputs)):
+        chunk[select(chunk_parts)].to_csv(file, sep='\t', index=False, header=headers[index])
+        headers[index] = False
+
+      saved += len(chunk)
+  finally:
+    for file in files:
+      file.close()
+
+  return saved
+
+def main(
+  filename: str,
+  binary: bool = False,
+  folds: int | None = None,
+  stratify: bool = False,
+  stream: bool = False,
+  seed: int = DEFAULT_SEED,
+  train_fraction: float = TRAIN_FRACTION,
+  chunk_size: int = 100_000,
+  assign: str = "random",
+  id_column: str = ID_COLUMN,
+  incremental: bool = False
+):
+  if folds is not None and folds < 2:
+    print("[ERROR] A k-fold split needs at least 2 folds.")
+    return
+
+  if assign == "hash" and stratify:
+    print("[ERROR] The stratified split depends on all of the rows, it can not be assigned by hash.")
+    return
+
+  if incremental and assign != "hash":
+    print("[ERROR] Only the hash assignment can be updated incrementally.")
+    return
+
+  # The incremental mode appends to the previous outputs, which is only done while streaming
+  stream = stream or incremental
+
+  if stream and binary:
+    print("[ERROR] The streaming mode only works with tab separated files.")
+    return
+
+  if stream:
+    saved = split_streaming(filename, folds, stratify, seed, train_fraction, chunk_size, assign, id_column, incremental)
+
+    if incremental:
+      print(f"New rows split: {saved}")
+  else:
+    split_in_memory(filename, binary, folds, stratify, seed, train_fraction, assign, id_column)
 
 if __name__ == "__main__":
-  main("iemocap.csv")
\ No newline at end of file
+  parser = argparse.ArgumentParser(description="Train/test splitter of the IEMOCAP dataset | SENTI-Lib")
+  parser.add_argument(
+    "--binary",
+    help="Read and save the splits in the binary columnar format (.cols) instead of tab separated text",
+    action='store_true'
+  )
+  parser.add_argument("-i", "--input", help="File in out/ to be split", action='store', default="iemocap.csv")
+  parser.add_argument("-k", "--folds", help="Create a k-fold split instead of a train/test split", action='store', type=int, default=None)
+  parser.add_argument("--stratify", help="Keep the proportions of every combination of labels in every split", action='store_true')
+  parser.add_argument("--stream", help="Split the file in chunks, writing all of the outputs in a single pass", action='store_true')
+  parser.add_argument("--chunk-size", help="Rows per chunk in the streaming mode", action='store', type=int, default=100_000)
+  parser.add_argument("-s", "--seed", help="Seed of the split", action='store', type=int, default=DEFAULT_SEED)
+  parser.add_argument("--train-fraction", help="Fraction of the rows in the train split", action='store', type=float, default=TRAIN_FRACTION)
+  parser.add_argument(
+    "-a",
+    "--assign",
+    help="Assignment of the rows: random draws in row order, or the hash of the ID of the row (stable when the dataset grows)",
+    action='store',
+    choices=ASSIGNMENTS,
+    default="random"
+  )
+  parser.add_argument("--id-column", help="Column with the ID of the rows, used by the hash assignment", action='store', default=ID_COLUMN)
+  parser.add_argument(
+    "--incremental",
+    help="Append only the rows that are not in the previous outputs yet (hash assignment only, implies --stream)",
+    action='store_true'
+  )
+  args = parser.parse_args()
+
+  main(
+    args.input,
+    args.binary,
+    args.folds,
+    args.stratify,
+    args.stream,
+    args.seed,
+    args.train_fraction,
+    args.chunk_size,
+    args.assign,
+    args.id_column,
+    args.incremental
+  )
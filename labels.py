@@ -0,0 +1,156 @@
+from typing import Iterable
+import numpy as np
+import pandas as pd
+
+# Minimized set of emotions (based on the principal dyad of the Plutchik's wheel of emotions)
+# used for the final classification of the text in all of the datasets
+CLASSIFIER_LABELS = ["joy", "sadness", "trust", "disgust", "fear", "anger", "surprise", "anticipation"]
+
+# Amount of bits set in every possible byte, used to count the labels of a bitmask
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+class LabelSet:
+  """Multi-label targets stored as one uint8 bitmask per row, where bit `i` of a
+  row is set when the row has the label `labels[i]`.
+
+  For the 8 classifier labels a whole row fits in a single byte, so set operations
+  between rows (or between datasets) are plain vectorized bitwise operations.
+  """
+  def __init__(self, masks: np.ndarray, labels: list[str] = CLASSIFIER_LABELS):
+    if len(labels) > 8:
+      raise ValueError(f"A LabelSet holds up to 8 labels, got {len(labels)}")
+
+    self.masks = np.asarray(masks, dtype=np.uint8).reshape(-1)
+    self.labels = list(labels)
+
+  @classmethod
+  def from_dense(cls, matrix: np.ndarray, labels: list[str] = CLASSIFIER_LABELS) -> "LabelSet":
+    """Build the bitmasks from a (rows x labels) 0/1 matrix, the format used by sklearn."""
+    matrix = np.asarray(matrix, dtype=np.uint8).reshape(-1, len(labels))
+
+    return cls(np.packbits(matrix, axis=1, bitorder="little").reshape(-1), labels)
+
+  @classmethod
+  def from_frame(cls, df: pd.DataFrame, labels: list[str] = CLASSIFIER_LABELS) -> "LabelSet":
+    """Build the bitmasks from the label columns of a dataframe."""
+    return cls.from_dense(df[labels].to_numpy(dtype=np.uint8), labels)
+
+  def to_dense(self) -> np.ndarray:
+    """Get the (rows x labels) 0/1 uint8 matrix, the format used by sklearn."""
+    return np.unpackbits(self.masks[:, None], axis=1, count=len(self.labels), bitorder="little")
+
+  def _check_labels(self, other: "LabelSet"):
+    if self.labels != other.labels:
+      raise ValueError("Both label sets must use the same labels")
+
+  def union(self, other: "LabelSet") -> "LabelSet":
+    self._check_labels(other)
+    return LabelSet(self.masks | other.masks, self.labels)
+
+  def intersection(self, other: "LabelSet") -> "LabelSet":
+    self._check_labels(other)
+    return LabelSet(self.masks & other.masks, self.labels)
+
+  def difference(self, other: "LabelSet") -> "LabelSet":
+    self._check_labels(other)
+    return LabelSet(self.masks & ~other.masks, self.labels)
+
+  def cardinality(self) -> np.ndarray:
+    """Amount of labels of every row."""
+    return _POPCOUNT[self.masks]
+
+  def has_label(self, label: str) -> np.ndarray:
+    """Boolean mask of the rows with the given label."""
+    return (self.masks & np.uint8(1 << self.labels.index(label))) != 0
+
+  def __len__(self) -> int:
+    return len(self.masks)
+
+  def __getitem__(self, index) -> "LabelSet":
+    return LabelSet(self.masks[index], self.labels)
+
+class LabelMapping:
+  """Declarative mapping from the labels of a source taxonomy to the classifier labels.
+
+  The rules are given as a dictionary where every source label lists the
+  classifier labels it is assigned to (an empty list means the label is known
+  but ignored, like 'neutral'):
+    {
+      source_label: [classifier_label_1, ..., classifier_label_n]
+    }
+
+  The rules are compiled into a (source labels x classifier labels) projection
+  matrix, so a whole column of labels is converted with a single multiplication
+  followed by a threshold.
+  """
+  def __init__(self, rules: dict[str, list[str]], target_labels: list[str] = CLASSIFIER_LABELS):
+    self.source_labels = list(rules.keys())
+    self.target_labels = list(target_labels)
+    self.source_ids = { label: index for index, label in enumerate(self.source_labels) }
+
+    target_ids = { label: index for index, label in enumerate(self.target_labels) }
+
+    self.matrix = np.zeros((len(self.source_labels), len(self.target_labels)), dtype=np.float32)
+    for source_label, targets in rules.items():
+      for target in targets:
+        self.matrix[self.source_ids[source_label], target_ids[target]] = 1
+
+  def from_multi_hot(self, multi_hot: np.ndarray) -> np.ndarray:
+    """Project a (rows x source labels) multi-hot matrix into a (rows x classifier
+    labels) multi-hot matrix of 0/1 uint8 values.
+    """
+    multi_hot = np.asarray(multi_hot, dtype=np.float32).reshape(-1, len(self.source_labels))
+
+    return ((multi_hot @ self.matrix) > 0).astype(np.uint8)
+
+  def tokens_to_multi_hot(self, column: Iterable, sep: str | None = None) -> np.ndarray:
+    """Convert a column of source labels into a (rows x source labels) multi-hot matrix.
+
+    Every element of the column can be a single label, a list of labels or, when
+    `sep` is given, a string of labels separated by `sep`. Missing values and
+    unknown labels are ignored.
+    """
+    series = pd.Series(column, dtype=object).reset_index(drop=True)
+
+    if sep is not None:
+      series = series.str.split(sep)
+
+    # One row per label, keeping the index of the row it comes from
+    exploded = series.explode()
+    ids = exploded.map(self.source_ids)
+    valid = ids.notna().to_numpy()
+
+    multi_hot = np.zeros((len(series), len(self.source_labels)), dtype=np.uint8)
+    multi_hot[exploded.index.to_numpy()[valid], ids.to_numpy()[valid].astype(np.intp)] = 1
+
+    return multi_hot
+
+  def from_tokens(self, column: Iterable, sep: str | None = None) -> np.ndarray:
+    """Convert a column of source labels (see `tokens_to_multi_hot`) into a
+    (rows x classifier labels) multi-hot matrix of 0/1 uint8 values.
+    """
+    return self.from_multi_hot(self.tokens_to_multi_hot(column, sep))
+
+def label_frame(
+  ids: Iterable,
+  texts: Iterable,
+  label_matrix: "np.ndarray | LabelSet",
+  columns: tuple[str, str] = ("ID", "Dialog"),
+  target_labels: list[str] = CLASSIFIER_LABELS
+) -> pd.DataFrame:
+  """Build the (id, text, *labels) dataframe saved by the format scripts.
+
+  The label matrix is assigned in one shot as a single contiguous uint8 block,
+  and the id and text columns are added next to it without going row by row.
+  """
+  if isinstance(label_matrix, LabelSet):
+    label_matrix = label_matrix.to_dense()
+
+  df = pd.DataFrame(np.ascontiguousarray(label_matrix, dtype=np.uint8), columns=target_labels, copy=False)
+
+  # Plain arrays are inserted so the columns are never aligned on a pandas index
+  id_column, text_column = columns
+  df.insert(0, text_column, pd.Series(texts).to_numpy())
+  df.insert(0, id_column, pd.Series(ids).to_numpy())
+
+  return df
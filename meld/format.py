@@ -1,7 +1,9 @@
+from labels import LabelMapping, LabelSet, label_frame
+import frames
+import argparse
 import pandas as pd
 
 MELD_LABELS = ["neutral", "joy", "surprise", "anger", "sadness", "disgust", "fear"]
-CLASSIFIER_LABELS = ["joy", "sadness", "trust", "disgust", "fear", "anger", "surprise", "anticipation"]
 
 """
 ----------------------------
@@ -22,85 +24,59 @@ Emotions will be assigned as follows:
 - Disgust: disgust
 - Fear: fear
 """
+MELD_MAPPING = LabelMapping({
+  "neutral": [],
+  "joy": ["joy"],
+  "surprise": ["surprise"],
+  "anger": ["anger"],
+  "sadness": ["sadness"],
+  "disgust": ["disgust"],
+  "fear": ["fear"]
+})
 
 def load_dataframe(path: str) -> pd.DataFrame:
   return pd.read_csv(path)
 
-def save_dataframe(df: pd.DataFrame, filename: str):
-  df.to_csv("out/" + filename, sep='\t', index=False)
+def save_dataframe(df: pd.DataFrame, filename: str, binary: bool = False):
+  frames.save_dataframe(df, "out/" + filename, binary)
 
 def pre_process(df: pd.DataFrame) -> pd.DataFrame:
-  # Obtain necessary columns separately
-  scene_id = df["Sr No."].to_list()
-  dialog = df["Utterance"].to_list()
-  emotion = df["Emotion"].to_list() 
-
-  # Join the text and the labels in a new dataframe
-  text_and_labels = [
-    [
-      scene_id[index],
-      dialog[index],
-      emotion[index]
-    ] for index in range(0,len(dialog))
-  ]
-
-  return pd.DataFrame(text_and_labels, columns=["id", "text", "target"])
-
-def convert_row(element: str) -> list[1 | 0]:
-  new_row = [0 for _ in range(0, len(CLASSIFIER_LABELS))]
-
-  # We assign it according to the end result assignments we set up as end result
-  assignment_index = []
-
-  # Manually go through the labels and parse them to the new emotions/labels
-  # while ignoring the 'neutral' emotions
-  if element == "joy":
-    assignment_index.append(0)
-  elif element == "surprise":
-    assignment_index.append(6)
-  elif element == "anger":
-    assignment_index.append(5)
-  elif element == "sadness":
-    assignment_index.append(1)
-  elif element == "disgust":
-    assignment_index.append(3)
-  elif element == "fear":
-    assignment_index.append(4)
-    
-
-  # We assign the new indexes to the new resulting row
-  for new_index in assignment_index:
-    new_row[new_index] = 1
-
-  return new_row
-
-def main(filename: str):
+  # Obtain necessary columns with the names used in the rest of the process
+  return pd.DataFrame({
+    "id": df["Sr No."].to_numpy(),
+    "text": df["Utterance"].to_numpy(),
+    "target": df["Emotion"].to_numpy()
+  })
+
+def convert_column(column: pd.Series) -> LabelSet:
+  # Every row has a single emotion
+  return LabelSet.from_dense(MELD_MAPPING.from_tokens(column))
+
+def main(filename: str, binary: bool = False) -> pd.DataFrame:
   # We process the dataset from the original format to the 3 columns (id, text, target)
   df = load_dataframe("./meld/dataset/" + filename)
 
   df = pre_process(df)
 
-  # Obtain individual columns
-  id_column = df["id"].tolist()
-  text_column = df["text"].tolist()
-  target_column = df["target"].tolist()
-
   # Convert the target column to the new format
-  new_target_column = [convert_row(row) for row in target_column]
+  new_target_column = convert_column(df["target"])
 
   # Join the text and the labels in a new dataframe
-  text_and_labels = [
-    [
-      id_column[index],
-      text_column[index], 
-      *new_target_column[index]
-    ] for index in range(0,int(len(new_target_column)))
-  ]
-  new_df = pd.DataFrame(text_and_labels, columns=["ID", "Dialog", *CLASSIFIER_LABELS])
+  new_df = label_frame(df["id"], df["text"], new_target_column, columns=("ID", "Dialog"))
 
   # Save the new dataframe
-  save_dataframe(new_df, filename.replace(".csv", ".v2.csv"))
+  save_dataframe(new_df, filename.replace(".csv", ".v2.csv"), binary)
+
+  return new_df
 
 if __name__ == "__main__":
-  main("train_sent_emo.csv")
-  main("test_sent_emo.csv")
\ No newline at end of file
+  parser = argparse.ArgumentParser(description="Formatter of the MELD dataset to the classifier labels | SENTI-Lib")
+  parser.add_argument(
+    "--binary",
+    help="Save the results in the binary columnar format (.cols) instead of tab separated text",
+    action='store_true'
+  )
+  args = parser.parse_args()
+
+  main("train_sent_emo.csv", args.binary)
+  main("test_sent_emo.csv", args.binary)
@@ -0,0 +1,526 @@
+from iemocap.extraction import get_dialog_tasks, get_roots, get_sessions, iter_dialog_records
+from iemocap.manifest import ExtractionManifest, get_file_fingerprint
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Any, Callable, Dict
+import iemocap.format as iemocap_format
+import iemocap.split as iemocap_split
+import meld.format as meld_format
+import senticnet.format as senticnet_format
+import senticnet.metrics as senticnet_metrics
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+
+# The SemEval scripts live in 'sem-eval', which can not be imported as a package
+_spec = importlib.util.spec_from_file_location("sem_eval_format", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sem-eval", "format.py"))
+sem_eval_format = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sem_eval_format)
+
+# Messages of the stages running at the same time are printed one at a time
+_PRINT_LOCK = Lock()
+
+# Increased whenever the fingerprints of the stages change, so older states are discarded
+STATE_VERSION = 1
+
+MELD_FILES = ["train_sent_emo.csv", "test_sent_emo.csv"]
+SEM_EVAL_FILES = ["2018-E-c-En-train.txt", "2018-E-c-En-test-gold.txt"]
+
+# Original datasets whose texts are sent to SenticNet, and the name of the output of every one
+FETCHES = [
+  ("out/iemocap-train.csv", "senticnet_iemocap_train"),
+  ("out/iemocap-test.csv", "senticnet_iemocap_test"),
+  ("out/train_sent_emo.v2.csv", "senticnet_meld_train"),
+  ("out/test_sent_emo.v2.csv", "senticnet_meld_test"),
+  ("out/2018-E-c-En-train.v2.txt", "senticnet_sem_eval_train"),
+  ("out/2018-E-c-En-test-gold.v2.txt", "senticnet_sem_eval_test")
+]
+
+# The fetcher writes outputs of its own, the ones of the older fetcher in
+# senticnet/dataset are only read (when the pipeline runs without the fetch)
+FETCH_DIRECTORY = "out/fetch"
+
+"""
+----------------------------
+PIPELINE
+----------------------------
+The scripts of the project are the stages of a dependency graph, run in a single
+process by `Pipeline.run`:
+
+  extract_iemocap -> format_iemocap -> split_iemocap --+
+  format_meld -----------------------------------------+--> [fetch] -> format_senticnet -> metrics
+  format_sem_eval -------------------------------------+
+
+- Every stage starts as soon as the ones it depends on are done, so independent
+  branches (like the formatting of IEMOCAP, MELD and SemEval) run in parallel.
+- The data is handed between stages in memory: every stage gets the values
+  returned by the stages it depends on (the records of the extraction, the
+  formatted dataframes, ...). The outputs are still saved in `out/`, so each
+  script keeps working on its own.
+- A stage is skipped when the fingerprint of its inputs (their content, plus the
+  parameters of the stage) is the one of its last run and its outputs are still
+  the ones it saved. The stages after a skipped one read its outputs from disk.
+- The fetch only runs with `--with-fetch`, into `out/fetch/<name>.tsv`, and
+  format_senticnet then formats those files instead of the ones in senticnet/dataset.
+
+The fingerprints are kept in a JSON state file, structured as follows:
+  {
+    version: STATE_VERSION,
+    stages: {
+      stage: { fingerprint: sha256, outputs: { path: [mtime_ns, size, sha256] } }
+    },
+    files: { path: [mtime_ns, size, sha256] }
+  }
+"""
+
+class Stage:
+  """A step of the pipeline.
+
+  - `inputs` returns the files read by the stage, it is called right before the
+    stage runs so the outputs of the previous stages already exist.
+  - `run` gets the values returned by the stages in `dependencies` (None for the
+    skipped ones) and returns the value handed to the stages after it.
+  - `always` stages are never skipped (e.g. the ones that depend on an external service).
+  """
+  def __init__(
+    self,
+    name: str,
+    run: Callable[[Dict[str, Any]], Any],
+    inputs: Callable[[], list[str]],
+    outputs: list[str],
+    dependencies: list[str] | None = None,
+    params: dict | None = None,
+    always: bool = False
+  ):
+    self.name = name
+    self.run = run
+    self.inputs = inputs
+    self.outputs = outputs
+    self.dependencies = dependencies or []
+    self.params = params or {}
+    self.always = always
+
+def log(message: str):
+  with _PRINT_LOCK:
+    print(message, flush=True)
+
+class PipelineState:
+  """Fingerprints of the inputs and outputs of the last successful run of every
+  stage. Like the extraction manifest, the content of a file is only hashed
+  again when its modification time or size changed.
+  """
+  def __init__(self, path: str):
+    self.path = path
+    self.stages: Dict[str, dict] = { }
+    self.files: Dict[str, list] = { }
+    self._lock = Lock()
+
+    if os.path.exists(path):
+      with open(path, "r", encoding="utf-8") as file:
+        state = json.load(file)
+
+      if state.get("version") == STATE_VERSION:
+        self.stages = state["stages"]
+        self.files = state["files"]
+
+  def get_fingerprint(self, path: str) -> list | None:
+    if not os.path.exists(path):
+      return None
+
+    current = get_file_fingerprint(path, content_hash=False)
+
+    with self._lock:
+      known = self.files.get(path)
+
+    if known is not None and known[:2] == current[:2]:
+      return known
+
+    current = get_file_fingerprint(path)
+    with self._lock:
+      self.files[path] = current
+
+    return current
+
+  def stage_fingerprint(self, stage: Stage) -> str:
+    inputs = {}
+    for path in stage.inputs():
+      fingerprint = self.get_fingerprint(path)
+      inputs[path] = fingerprint[2] if fingerprint is not None else None
+
+    return hashlib.sha256(json.dumps({ "params": stage.params, "inputs": inputs }, sort_keys=True).encode("utf-8")).hexdigest()
+
+  def is_unchanged(self, stage: Stage, fingerprint: str) -> bool:
+    with self._lock:
+      previous = self.stages.get(stage.name)
+
+    if previous is None or previous["fingerprint"] != fingerprint:
+      return False
+
+    # The outputs must still be the ones the stage saved
+    return all(self.get_fingerprint(path) == previous["outputs"].get(path) for path in stage.outputs)
+
+  def update(self, stage: Stage, fingerprint: str):
+    outputs = { path: self.get_fingerprint(path) for path in stage.outputs }
+
+    with self._lock:
+      self.stages[stage.name] = { "fingerprint": fingerprint, "outputs": outputs }
+      self.save()
+
+  def save(self):
+    # Written to a temporary file first, so an interrupted save keeps the previous state
+    temporary_path = self.path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+      file.write(json.dumps({ "version": STATE_VERSION, "stages": self.stages, "files": self.files }))
+      file.flush()
+      os.fsync(file.fileno())
+
+    os.replace(temporary_path, self.path)
+
+class Pipeline:
+  def __init__(self, stages: list[Stage], state: PipelineState | None = None):
+    self.stages = { stage.name: stage for stage in stages }
+    self.state = state
+
+    for stage in stages:
+      for dependency in stage.dependencies:
+        if dependency not in self.stages:
+          raise ValueError(f"Stage {stage.name} depends on the unknown stage {dependency}")
+
+  def select(self, targets: list[str] | None = None) -> list[str]:
+    """Get the stages needed for the targets (all of them by default), in an
+    order where every stage comes after the ones it depends on.
+    """
+    order: list[str] = []
+    visiting: set[str] = set()
+
+    def visit(name: str):
+      if name in order:
+        return
+      if name in visiting:
+        raise ValueError(f"The stages have a dependency cycle through {name}")
+
+      visiting.add(name)
+      for dependency in self.stages[name].dependencies:
+        visit(dependency)
+      visiting.remove(name)
+
+      order.append(name)
+
+    for name in targets or list(self.stages):
+      if name not in self.stages:
+        raise ValueError(f"Unknown stage {name}, use one of: {', '.join(self.stages)}")
+      visit(name)
+
+    return order
+
+  def _run_stage(self, stage: Stage, values: Dict[str, Any], force: bool) -> tuple[str, Any]:
+    """Run a stage (unless it can be skipped) with the values of its dependencies."""
+    fingerprint = self.state.stage_fingerprint(stage) if self.state is not None else None
+
+    if not force and not stage.always and fingerprint is not None and self.state.is_unchanged(stage, fingerprint):
+      log(f"[{stage.name}] skipped, the inputs did not change")
+      return "skipped", None
+
+    log(f"[{stage.name}] running")
+    start = time.perf_counter()
+    value = stage.run(values)
+
+    if self.state is not None:
+      self.state.update(stage, fingerprint)
+
+    log(f"[{stage.name}] done in {time.perf_counter() - start:.2f} s")
+    return "done", value
+
+  def run(self, targets: list[str] | None = None, jobs: int = 3, force: bool = False) -> Dict[str, str]:
+    """Run the stages needed for the targets, every stage as soon as the ones it
+    depends on are finished, with at most `jobs` stages at the same time.
+
+    A stage that fails blocks the ones that depend on it, the rest of the graph
+    still runs. Returns the status of every stage (done, skipped, failed or blocked).
+    """
+    pending = self.select(targets)
+    statuses: Dict[str, str] = { }
+    values: Dict[str, Any] = { }
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+      running = {}
+
+      while pending or running:
+        for name in list(pending):
+          dependencies = self.stages[name].dependencies
+
+          if any(statuses.get(dependency) in ("failed", "blocked") for dependency in dependencies):
+            log(f"[{name}] blocked by a failed stage")
+            statuses[name] = "blocked"
+            pending.remove(name)
+          elif all(statuses.get(dependency) in ("done", "skipped") for dependency in dependencies):
+            # The values are taken here, the ones no other stage needs are dropped once this one is submitted
+            stage_values = { dependency: values.get(dependency) for dependency in dependencies }
+            running[executor.submit(self._run_stage, self.stages[name], stage_values, force)] = name
+            pending.remove(name)
+
+        if not running:
+          continue
+
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+          name = running.pop(future)
+
+          try:
+            statuses[name], values[name] = future.result()
+          except Exception as error:
+            log(f"[ERROR] [{name}] {error}")
+            statuses[name] = "failed"
+
+        # The values are only kept while a stage that needs them is still to run
+        for name in list(values):
+          if all(name not in self.stages[other].dependencies for other in pending):
+            values.pop(name)
+
+    return statuses
+
+def merge_dataframes(values: Dict[str, Any]) -> dict:
+  """Merge the {path: dataframe} values handed by the previous stages."""
+  dataframes = {}
+  for value in values.values():
+    dataframes.update(value or {})
+
+  return dataframes
+
+def build_pipeline(
+  roots: list[str],
+  workers: int = 1,
+  with_fetch: bool = False,
+  fetch_concurrency: int = 1,
+  manifest_path: str = "senticnet/evaluations.json",
+  output_path: str = "out/evaluations.json",
+  state: PipelineState | None = None
+) -> Pipeline:
+  def extract_iemocap(values: dict) -> list[dict] | None:
+    missing_roots = [root for root in roots if len(get_sessions(root)) == 0]
+
+    if len(roots) == 0 or len(missing_roots) > 0:
+      message = f"No sessions were found in the roots: {', '.join(missing_roots) or '(none given)'}"
+
+      # The corpus is not always available, the previous extraction is used then (like iemocap/format.py does)
+      filename = iemocap_format.get_extraction_filename()
+      if not os.path.exists("./out/" + filename):
+        raise ValueError(message)
+
+      log(f"[extract_iemocap] {message}, using out/{filename}")
+      return None
+
+    manifest = ExtractionManifest("./out/iemocap_manifest.json")
+    records = []
+
+    with open("./out/iemocap.jsonl", "w", encoding="utf-8") as file:
+      for record in iter_dialog_records(workers, manifest, roots):
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        records.append(record)
+
+    manifest.save()
+
+    return records
+
+  def iemocap_files() -> list[str]:
+    return [path for _, transcription_file, evaluation_files in get_dialog_tasks(roots) for path in [transcription_file, *evaluation_files]]
+
+  def format_iemocap(values: dict) -> dict:
+    records = values["extract_iemocap"]
+    filename = "iemocap.jsonl" if records is not None else iemocap_format.get_extraction_filename()
+
+    return { "out/iemocap.csv": iemocap_format.main(filename, records=records) }
+
+  def split_iemocap(values: dict) -> dict:
+    df = (values["format_iemocap"] or {}).get("out/iemocap.csv")
+    if df is None:
+      df = iemocap_split.load_dataframe("./out/iemocap.csv")
+
+    splits = iemocap_split.split_frame(df, "iemocap.csv")
+
+    return { "out/" + output: split for output, split in splits.items() }
+
+  def format_meld(values: dict) -> dict:
+    return { "out/" + filename.replace(".csv", ".v2.csv"): meld_format.main(filename) for filename in MELD_FILES }
+
+  def format_sem_eval(values: dict) -> dict:
+    return { "out/" + filename.replace(".txt", ".v2.txt"): sem_eval_format.main(filename) for filename in SEM_EVAL_FILES }
+
+  def senticnet_files() -> list[str]:
+    if with_fetch:
+      return [f"{FETCH_DIRECTORY}/{name}.tsv" for _, name in FETCHES]
+
+    return [f"senticnet/dataset/{name}.txt" for _, name in FETCHES]
+
+  def fetch(values: dict):
+    os.makedirs(FETCH_DIRECTORY, exist_ok=True)
+
+    # The fetcher runs as its own script, as a resumable job over every dataset
+    for (gold, _), output in zip(FETCHES, senticnet_files()):
+      column = senticnet_metrics.load_dataframe(gold).columns[1]
+      command = [
+        sys.executable, "-m", "senticnet.fetch",
+        "-f", gold, "-n", column, "--output", output, "-j", "-c", str(fetch_concurrency)
+      ]
+
+      # The output of the fetcher goes through the log, so it is not mixed with the other stages.
+      # The fetcher reports its errors (e.g. an output it can not resume) without an exit code
+      failed = False
+      with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True) as process:
+        for line in process.stdout:
+          log(f"[fetch] {line.rstrip()}")
+          failed = failed or line.startswith("[ERROR]")
+
+      if process.returncode != 0 or failed:
+        raise RuntimeError(f"The fetch of {gold} failed")
+
+  def format_senticnet(values: dict) -> dict:
+    return {
+      f"out/{name}.csv": senticnet_format.main(name + ".txt", source=path)
+      for (_, name), path in zip(FETCHES, senticnet_files())
+    }
+
+  def metrics(values: dict) -> list[dict]:
+    entries = senticnet_metrics.load_manifest(manifest_path)
+    dataframes = merge_dataframes(values)
+
+    results = [senticnet_metrics.evaluate_entry(entry, dataframes) for entry in entries]
+    senticnet_metrics.save_results(results, output_path)
+
+    for result in results:
+      if result["status"] != "ok":
+        raise ValueError(f"{result['name']}: {result['error']}")
+
+    return results
+
+  def metrics_files() -> list[str]:
+    entries = senticnet_metrics.load_manifest(manifest_path)
+    return [manifest_path] + [entry[key] for entry in entries for key in ["gold", "prediction"]]
+
+  fetch_dependencies = ["fetch"] if with_fetch else []
+
+  stages = [
+    Stage("extract_iemocap", extract_iemocap, iemocap_files, ["out/iemocap.jsonl"], params={ "roots": roots }),
+    Stage(
+      "format_iemocap",
+      format_iemocap,
+      lambda: ["out/" + iemocap_format.get_extraction_filename()],
+      ["out/iemocap.csv"],
+      ["extract_iemocap"]
+    ),
+    Stage(
+      "split_iemocap",
+      split_iemocap,
+      lambda: ["out/iemocap.csv"],
+      ["out/iemocap-train.csv", "out/iemocap-test.csv"],
+      ["format_iemocap"],
+      { "seed": iemocap_split.DEFAULT_SEED, "train_fraction": iemocap_split.TRAIN_FRACTION }
+    ),
+    Stage(
+      "format_meld",
+      format_meld,
+      lambda: ["meld/dataset/" + filename for filename in MELD_FILES],
+      ["out/" + filename.replace(".csv", ".v2.csv") for filename in MELD_FILES]
+    ),
+    Stage(
+      "format_sem_eval",
+      format_sem_eval,
+      lambda: ["sem-eval/dataset/" + filename for filename in SEM_EVAL_FILES],
+      ["out/" + filename.replace(".txt", ".v2.txt") for filename in SEM_EVAL_FILES]
+    ),
+    Stage(
+      "format_senticnet",
+      format_senticnet,
+      senticnet_files,
+      [f"out/{name}.csv" for _, name in FETCHES],
+      fetch_dependencies
+    ),
+    Stage(
+      "metrics",
+      metrics,
+      metrics_files,
+      [output_path],
+      ["split_iemocap", "format_meld", "format_sem_eval", "format_senticnet"],
+      { "output": output_path }
+    )
+  ]
+
+  if with_fetch:
+    # The fetch is always run, the job skips the rows already saved in its outputs
+    stages.append(Stage(
+      "fetch",
+      fetch,
+      lambda: [gold for gold, _ in FETCHES] + senticnet_files(),
+      [],
+      ["split_iemocap", "format_meld", "format_sem_eval"],
+      always=True
+    ))
+
+  return Pipeline(stages, state)
+
+def main(parser: argparse.ArgumentParser):
+  args = parser.parse_args()
+
+  roots = get_roots() if args.root is None else [root for path in args.root for root in get_roots(path)]
+  state = PipelineState(args.state)
+
+  try:
+    pipeline = build_pipeline(roots, args.workers, args.with_fetch, args.fetch_concurrency, args.manifest, args.output, state)
+    statuses = pipeline.run(args.stage, args.jobs, args.force)
+  except ValueError as error:
+    print(f"[ERROR] {error}")
+    return
+
+  print()
+  for name, status in statuses.items():
+    print(f"{name:<20}{status}")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Runner of the whole process, from the datasets to the metrics | SENTI-Lib")
+
+  parser.add_argument(
+    "-s",
+    "--stage",
+    help="Stage to be run along with the ones it depends on, it can be given multiple times. By default every stage",
+    action='append',
+    default=None
+  )
+  parser.add_argument("-j", "--jobs", help="Amount of stages run at the same time", action='store', type=int, default=3)
+  parser.add_argument(
+    "-w",
+    "--workers",
+    help="Amount of processes used to parse the files of IEMOCAP",
+    action='store',
+    type=int,
+    default=os.cpu_count()
+  )
+  parser.add_argument(
+    "-r",
+    "--root",
+    help="Root of the IEMOCAP dataset (or of a shard of it), it can be given multiple times. By default IEMOCAP_PATH of the .env file",
+    action='append',
+    default=None
+  )
+  parser.add_argument(
+    "--with-fetch",
+    help="Fetch the emotions of every dataset from the SenticNet API before formatting them (needs the .env file)",
+    action='store_true'
+  )
+  parser.add_argument(
+    "--fetch-concurrency",
+    help="Amount of requests to the SenticNet API kept in flight by the fetch",
+    action='store',
+    type=int,
+    default=1
+  )
+  parser.add_argument("-f", "--force", help="Run every stage, even the ones whose inputs did not change", action='store_true')
+  parser.add_argument("--state", help="File with the fingerprints of the last run of every stage", action='store', default="out/pipeline_state.json")
+  parser.add_argument("-m", "--manifest", help="Manifest of the evaluations of the metrics stage", action='store', default="senticnet/evaluations.json")
+  parser.add_argument("-o", "--output", help="Results of the metrics stage", action='store', default="out/evaluations.json")
+
+  main(parser)
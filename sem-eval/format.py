@@ -1,7 +1,10 @@
+from labels import CLASSIFIER_LABELS as NEW_CLASSIFIER_LABELS, LabelMapping, LabelSet, label_frame
+import frames
+import argparse
+import numpy as np
 import pandas as pd
 
 CLASSIFIER_LABELS = ["anger", "anticipation", "disgust", "fear", "joy", "love", "optimism", "pessimism", "sadness", "surprise", "trust"]
-NEW_CLASSIFIER_LABELS = ["joy", "sadness", "trust", "disgust", "fear", "anger", "surprise", "anticipation"]
 
 """
 ----------------------------
@@ -26,101 +29,67 @@ Emotions will be assigned as follows:
 - Surprise: surprise
 - Trust: trust
 """
+# Keys follow the order of the label columns in the dataset (CLASSIFIER_LABELS)
+SEM_EVAL_MAPPING = LabelMapping({
+  "anger": ["anger"],
+  "anticipation": ["anticipation"],
+  "disgust": ["disgust"],
+  "fear": ["fear"],
+  "joy": ["joy"],
+  "love": ["joy", "trust"],
+  "optimism": ["joy", "anticipation"],
+  "pessimism": ["sadness", "anticipation"],
+  "sadness": ["sadness"],
+  "surprise": ["surprise"],
+  "trust": ["trust"]
+}, NEW_CLASSIFIER_LABELS)
 
 def load_dataframe(path: str) -> pd.DataFrame:
   return pd.read_csv(path, sep='\t')
 
-def save_dataframe(df: pd.DataFrame, filename: str):
-  df.to_csv("out/" + filename, sep='\t', index=False)
+def save_dataframe(df: pd.DataFrame, filename: str, binary: bool = False):
+  frames.save_dataframe(df, "out/" + filename, binary)
 
-def pre_process(df: pd.DataFrame) -> pd.DataFrame:
-  # Obtain the text and the labels separately
-  tweet_id = df.iloc[:, 0:1]
-  text = df.iloc[:, 1:2]
-  labels = df.iloc[:, 2:].to_numpy()
+def pre_process(df: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+  # Obtain the text and the labels separately, the labels as a single (rows x labels) matrix
+  text = pd.DataFrame({
+    "id": df.iloc[:, 0].to_numpy(),
+    "text": df.iloc[:, 1].to_numpy()
+  })
+  labels = df.iloc[:, 2:].to_numpy(dtype=np.uint8)
 
-  # Join the text and the labels in a new dataframe
-  text_and_labels = [
-    [
-      tweet_id.iloc[index, 0],
-      text.iloc[index, 0],
-      labels[index].tolist()
-    ] for index in range(0,int(labels.shape[0]))
-  ]
-
-  return pd.DataFrame(text_and_labels, columns=["id", "text", "target"])
-
-def convert_row(row: list[1 | 0]) -> list[1 | 0]:
-  new_row = [0 for _ in range(0, len(NEW_CLASSIFIER_LABELS))]
-  for index, element in enumerate(row):
-    # If there is an emotion detected in the index of the row
-    if element == 1:
-
-      # We assign it according to the end result assignments we set up as end result
-      assignment_index = []
-
-      # Manually go through the original labels and parse them to the new emotions/labels
-      if CLASSIFIER_LABELS[index] == "anger":
-        assignment_index.append(5)
-      elif CLASSIFIER_LABELS[index] == "anticipation":
-        assignment_index.append(7)
-      elif CLASSIFIER_LABELS[index] == "disgust":
-        assignment_index.append(3)
-      elif CLASSIFIER_LABELS[index] == "fear":
-        assignment_index.append(4)
-      elif CLASSIFIER_LABELS[index] == "joy":
-        assignment_index.append(0)
-      elif CLASSIFIER_LABELS[index] == "love":
-        assignment_index.append(0)
-        assignment_index.append(2)
-      elif CLASSIFIER_LABELS[index] == "optimism":
-        assignment_index.append(0)
-        assignment_index.append(7)
-      elif CLASSIFIER_LABELS[index] == "pessimism":
-        assignment_index.append(1)
-        assignment_index.append(7)
-      elif CLASSIFIER_LABELS[index] == "sadness":
-        assignment_index.append(1)
-      elif CLASSIFIER_LABELS[index] == "surprise":
-        assignment_index.append(6)
-      elif CLASSIFIER_LABELS[index] == "trust":
-        assignment_index.append(2)
-
-      # We assign the new indexes to the new resulting row
-      for new_index in assignment_index:
-        new_row[new_index] = 1
-
-  return new_row
-
-def main(filename: str):
+  return text, labels
+
+def convert_column(labels: np.ndarray) -> LabelSet:
+  # Every row is already a multi-hot vector over the dataset labels
+  return LabelSet.from_dense(SEM_EVAL_MAPPING.from_multi_hot(labels), NEW_CLASSIFIER_LABELS)
+
+def main(filename: str, binary: bool = False) -> pd.DataFrame:
   # We process the dataset from the original format to the 3 columns (id, text, target)
   df = load_dataframe("./sem-eval/dataset/" + filename)
-  df = pre_process(df)
-
-  # Obtain individual columns
-  tweet_id_column = df["id"].tolist()
-  text_column = df["text"].tolist()
-  target_column = df["target"].tolist()
+  text, labels = pre_process(df)
 
   # Convert the target column to the new format
-  new_target_column = [convert_row(row) for row in target_column]
+  new_target_column = convert_column(labels)
 
   # Join the text and the labels in a new dataframe
-  text_and_labels = [
-    [
-      tweet_id_column[index],
-      text_column[index], 
-      *new_target_column[index]
-    ] for index in range(0,int(len(new_target_column)))
-  ]
-  new_df = pd.DataFrame(text_and_labels, columns=["ID", "Tweet", *NEW_CLASSIFIER_LABELS])
+  new_df = label_frame(text["id"], text["text"], new_target_column, columns=("ID", "Tweet"), target_labels=NEW_CLASSIFIER_LABELS)
 
   # Save the new dataframe
-  save_dataframe(new_df, filename.replace(".txt", ".v2.txt"))
+  save_dataframe(new_df, filename.replace(".txt", ".v2.txt"), binary)
+
+  return new_df
 
 
 if __name__ == "__main__":
-  # We tranform both training and test datasets
-  main("2018-E-c-En-train.txt")
+  parser = argparse.ArgumentParser(description="Formatter of the SemEval 2018 E-c dataset to the classifier labels | SENTI-Lib")
+  parser.add_argument(
+    "--binary",
+    help="Save the results in the binary columnar format (.cols) instead of tab separated text",
+    action='store_true'
+  )
+  args = parser.parse_args()
 
-  main("2018-E-c-En-test-gold.txt")
\ No newline at end of file
+  # We tranform both training and test datasets
+  main("2018-E-c-En-train.txt", args.binary)
+  main("2018-E-c-En-test-gold.txt", args.binary)
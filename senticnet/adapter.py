@@ -1,14 +1,18 @@
 from senticnet.client import SenticNetClient
-import re
+from senticnet.cache import SenticNetCache
+from senticnet.parser import EmotionParser
 
 class SenticNetAdapter:
-  def __init__(self):
-    self.client = SenticNetClient()
+  def __init__(self, client: SenticNetClient | None = None, cache: SenticNetCache | None = None):
+    self.client = client if client is not None else SenticNetClient()
+
+    # Optional persistent cache of the responses, keyed by the preprocessed text
+    self.cache = cache
 
     self.forbidden_char = ['&', '#', ';', '{', '}']
 
-    # Obtain the words/emotions from SenticNet response
-    self.regex_expression = r"(\b\w* (\w*))"
+    # Obtain the emotions from SenticNet response
+    self.parser = EmotionParser()
 
   def _preprocess_text(self, text: str):
     value = text
@@ -17,23 +21,23 @@ class SenticNetAdapter:
 
     return value
 
-  def _parse_emotions_response(self, response: str):
-
-    if "No emotions detected" in response:
-      return []
+  def _parse_emotions_response(self, response: str) -> list[str]:
+    return self.parser.to_names(self.parser.parse(response))
 
-    x = re.findall(self.regex_expression, response)
+  def _fetch_response(self, text: str) -> str:
+    preprocessed_text = self._preprocess_text(text)
 
-    # extract the words and strip whitespaces
-    words = []
-    for i in x:
-      words.append(i[0].strip())
+    emotions_res = None
+    if self.cache is not None:
+      emotions_res = self.cache.get(preprocessed_text, self.client.language)
 
-    return words
+    if emotions_res is None:
+      emotions_res = self.client.get_emotions(preprocessed_text)
 
-  def get_emotions(self, text: str) -> list[str]:
-    preprocessed_text = self._preprocess_text(text)
+      if self.cache is not None:
+        self.cache.put(preprocessed_text, self.client.language, emotions_res)
 
-    emotions_res = self.client.get_emotions(preprocessed_text)
+    return emotions_res
 
-    return self._parse_emotions_response(emotions_res)
\ No newline at end of file
+  def get_emotions(self, text: str) -> list[str]:
+    return self._parse_emotions_response(self._fetch_response(text))
\ No newline at end of file
@@ -0,0 +1,113 @@
+from senticnet.adapter import SenticNetAdapter
+from senticnet.cache import SenticNetCache
+from senticnet.client import SenticNetClient
+from senticnet.fetch import fetch_emotions
+from senticnet.sink import TsvSink
+from senticnet.source import read_sentences
+from senticnet.stub_server import start_stub_server
+from tempfile import TemporaryDirectory
+import argparse
+import numpy as np
+import pandas as pd
+import os
+import time
+
+MODES = ["serial", "concurrent", "cached"]
+
+class TimedAdapter:
+  """Wrapper of the adapter that records the latency of every sentence."""
+  def __init__(self, adapter: SenticNetAdapter):
+    self.adapter = adapter
+    self.latencies: list[float] = []
+
+  def get_emotions(self, text: str) -> list[str]:
+    start = time.perf_counter()
+    emotions = self.adapter.get_emotions(text)
+    self.latencies.append(time.perf_counter() - start)
+
+    return emotions
+
+def run_fetch(adapter: SenticNetAdapter, rows: list[tuple[int, str]], output_path: str, concurrency: int) -> dict:
+  """Run the fetch pipeline over the rows and measure it."""
+  timed_adapter = TimedAdapter(adapter)
+
+  start = time.perf_counter()
+  with TsvSink(output_path) as sink:
+    for index, sentence, emotions in fetch_emotions(timed_adapter, rows, concurrency):
+      sink.write(index, sentence, emotions)
+  elapsed = time.perf_counter() - start
+
+  latencies = np.array(timed_adapter.latencies) * 1000
+
+  return {
+    "rows": len(rows),
+    "elapsed": elapsed,
+    "throughput": len(rows) / elapsed,
+    "p50": np.percentile(latencies, 50),
+    "p99": np.percentile(latencies, 99)
+  }
+
+def benchmark_mode(mode: str, base_url: str, rows: list[tuple[int, str]], concurrency: int, directory: str) -> dict:
+  concurrency = 1 if mode == "serial" else concurrency
+
+  client = SenticNetClient(pool_size=concurrency, base_url=base_url, language="en", api_key="benchmark")
+  cache = SenticNetCache(os.path.join(directory, f"{mode}.db")) if mode == "cached" else None
+  adapter = SenticNetAdapter(client, cache)
+
+  try:
+    # The cached mode is measured once every sentence is already in the cache
+    if cache is not None:
+      run_fetch(adapter, rows, os.path.join(directory, "warmup.txt"), concurrency)
+      cache.hits = cache.misses = 0
+
+    result = run_fetch(adapter, rows, os.path.join(directory, f"{mode}.txt"), concurrency)
+  finally:
+    client.close()
+    if cache is not None:
+      cache.close()
+
+  return { "mode": mode, "concurrency": concurrency, **result }
+
+def main(parser: argparse.ArgumentParser):
+  args = parser.parse_args()
+
+  # Only the header is read upfront to validate the column
+  columns = pd.read_csv(args.file, sep='\t', nrows=0).columns
+  if args.name not in columns:
+    print(f"[ERROR] Column {args.name} not found in the file, available columns: {', '.join(columns)}")
+    return
+
+  rows = list(read_sentences(args.file, args.name, limit=args.rows))
+
+  server, base_url = start_stub_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+
+  print(f"Stub server: {base_url} (latency {args.latency * 1000:.0f} ms, jitter {args.jitter * 1000:.0f} ms)")
+  print(f"Rows: {len(rows)} from {args.file}")
+  print()
+  print(f"{'Mode':<12}{'Workers':>8}{'Rows':>8}{'Time (s)':>10}{'Rows/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+
+  try:
+    with TemporaryDirectory() as directory:
+      for mode in args.modes:
+        result = benchmark_mode(mode, base_url, rows, args.concurrency, directory)
+
+        print(
+          f"{result['mode']:<12}{result['concurrency']:>8}{result['rows']:>8}{result['elapsed']:>10.2f}"
+          f"{result['throughput']:>10.1f}{result['p50']:>10.2f}{result['p99']:>10.2f}"
+        )
+  finally:
+    server.shutdown()
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Throughput benchmark of the SenticNet fetcher against a local stub | SENTI-Lib")
+
+  parser.add_argument("-f", "--file", help="File with the sentences to be fetched", action='store', default="out/test_sent_emo.v2.csv")
+  parser.add_argument("-n", "--name", help="Name of the text column", action='store', default="Dialog")
+  parser.add_argument("-r", "--rows", help="Amount of sentences fetched in every mode", action='store', type=int, default=500)
+  parser.add_argument("-c", "--concurrency", help="Requests in flight for the concurrent and cached modes", action='store', type=int, default=16)
+  parser.add_argument("-l", "--latency", help="Mean latency of the stub server in seconds", action='store', type=float, default=0.05)
+  parser.add_argument("-j", "--jitter", help="Standard deviation of the stub latency in seconds", action='store', type=float, default=0.01)
+  parser.add_argument("-e", "--error-rate", help="Fraction of requests failed by the stub with HTTP 500", action='store', type=float, default=0.0)
+  parser.add_argument("-m", "--modes", help="Modes to benchmark", action='store', nargs="+", choices=MODES, default=MODES)
+
+  main(parser)
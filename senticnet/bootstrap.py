@@ -0,0 +1,285 @@
+from labels import LabelSet
+from senticnet.multilabel import AVERAGES, _divide
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+METRICS = ["precision", "recall", "f1"]
+
+# Values of the weight matrices of a block, the blocks of resamples are made smaller
+# when the amount of distinct rows is large so a block never takes much more memory
+MAX_BLOCK_VALUES = 1 << 24
+
+"""
+----------------------------
+VECTORIZED RESAMPLING
+----------------------------
+Every metric only depends on how many rows there are of every distinct combination
+of (true, predicted) bitmasks, so the rows are grouped by that combination (their
+"code") first. There are at most a few hundred codes for the 8 classifier labels.
+
+- A bootstrap resample of the n rows with replacement has the same distribution as a
+  multinomial draw of n rows over the codes (with the frequency of every code), so
+  a whole block of resamples is a single (resamples x codes) matrix of counts.
+- A paired permutation test swaps the predictions of both systems in every row with
+  probability 0.5, so the amount of swapped rows of every code is a binomial draw.
+
+The TP and the true/predicted counts of every label in all of the resamples of a
+block then come from a single product of the counts with (codes x labels) 0/1
+matrices, and so does every metric derived from them.
+"""
+
+class CodeTable:
+  """Distinct combinations of the true labels and the predictions of one or more
+  systems, with the amount of rows of each one and the per code 0/1 matrices
+  needed to compute the metrics.
+  """
+  def __init__(self, y_true: LabelSet, *y_preds: LabelSet):
+    for y_pred in y_preds:
+      if y_pred.labels != y_true.labels or len(y_pred) != len(y_true):
+        raise ValueError("The true labels and the predictions must have the same labels and rows")
+
+    self.labels = list(y_true.labels)
+    self.rows = len(y_true)
+
+    # One code per row made of the bitmasks of the true labels and of every system
+    code = y_true.masks.astype(np.int64)
+    for y_pred in y_preds:
+      code = (code << 8) | y_pred.masks
+
+    codes, self.counts = np.unique(code, return_counts=True)
+
+    # Code of every row, once they are sorted by code
+    self.row_codes = np.repeat(np.arange(len(codes)), self.counts)
+
+    shift = 8 * len(y_preds)
+    true = LabelSet((codes >> shift).astype(np.uint8), self.labels).to_dense().astype(np.float64)
+    true_size = true.sum(axis=1)
+
+    # All of the per code values are columns of a single (codes x columns) matrix, so
+    # the totals of a whole block of resamples come from a single product:
+    # [true labels, rows, then per system: true positives, predictions, and the
+    # precision, recall and F1 of a single row of the code]
+    label_count = len(self.labels)
+    columns = [true, np.ones((len(codes), 1))]
+    self.true_columns = slice(0, label_count)
+    self.rows_column = label_count
+
+    self.systems = []
+    for index in range(len(y_preds)):
+      pred_masks = ((codes >> (8 * (len(y_preds) - 1 - index))) & 0xFF).astype(np.uint8)
+      pred = LabelSet(pred_masks, self.labels).to_dense().astype(np.float64)
+      tp = true * pred
+
+      intersection = tp.sum(axis=1)
+      pred_size = pred.sum(axis=1)
+      samples = np.stack([
+        _divide(intersection, pred_size),
+        _divide(intersection, true_size),
+        _divide(2 * intersection, true_size + pred_size)
+      ], axis=1)
+
+      start = sum(column.shape[1] for column in columns)
+      self.systems.append({
+        "tp": slice(start, start + label_count),
+        "pred": slice(start + label_count, start + 2 * label_count),
+        "samples": slice(start + 2 * label_count, start + 2 * label_count + 3)
+      })
+      columns += [tp, pred, samples]
+
+    self.matrix = np.hstack(columns)
+
+  def names(self) -> list[str]:
+    return self.labels + [f"{average} avg" for average in AVERAGES]
+
+  def totals(self, weights: np.ndarray) -> np.ndarray:
+    """Get the totals of every column for a (resamples x codes) matrix with the
+    rows of every code in each resample.
+    """
+    return weights @ self.matrix
+
+  def scores(self, metric: str, totals: np.ndarray, system: int = 0, swapped_totals: np.ndarray | None = None) -> np.ndarray:
+    """Compute a metric for every label and average from the totals of a block
+    of resamples (see `totals`).
+
+    With `swapped_totals` (the totals of the rows that take the predictions of the
+    other system of a pair instead) the metric is the one of the swapped system.
+    The result is a (resamples x (labels + averages)) matrix.
+    """
+    own = self.systems[system]
+    tp = totals[:, own["tp"]]
+    pred = totals[:, own["pred"]]
+    samples = totals[:, own["samples"]]
+
+    if swapped_totals is not None:
+      other = self.systems[1 - system]
+      tp = tp + swapped_totals[:, other["tp"]] - swapped_totals[:, own["tp"]]
+      pred = pred + swapped_totals[:, other["pred"]] - swapped_totals[:, own["pred"]]
+      samples = samples + swapped_totals[:, other["samples"]] - swapped_totals[:, own["samples"]]
+
+    true = totals[:, self.true_columns]
+    rows = totals[:, self.rows_column]
+
+    if metric == "precision":
+      per_label = _divide(tp, pred)
+      micro = _divide(tp.sum(axis=1), pred.sum(axis=1))
+    elif metric == "recall":
+      per_label = _divide(tp, true)
+      micro = _divide(tp.sum(axis=1), true.sum(axis=1))
+    elif metric == "f1":
+      per_label = _divide(2 * tp, true + pred)
+      micro = _divide(2 * tp.sum(axis=1), true.sum(axis=1) + pred.sum(axis=1))
+    else:
+      raise ValueError(f"Unknown metric '{metric}', use one of: {', '.join(METRICS)}")
+
+    macro = per_label.mean(axis=1)
+    weighted = _divide((per_label * true).sum(axis=1), true.sum(axis=1))
+    sample_average = _divide(samples[:, METRICS.index(metric)], rows)
+
+    return np.column_stack([per_label, micro, macro, weighted, sample_average])
+
+def _block_sizes(resamples: int, block_size: int, codes: int) -> list[int]:
+  block_size = max(1, min(block_size, MAX_BLOCK_VALUES // max(codes, 1)))
+  sizes = [block_size] * (resamples // block_size)
+
+  if resamples % block_size > 0:
+    sizes.append(resamples % block_size)
+
+  return sizes
+
+def _count_codes(table: CodeTable, selected_rows: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+  """Count the codes of a (resamples x rows) matrix of row numbers (each one with
+  its weight, when given) with a single bincount.
+  """
+  size = len(selected_rows)
+  codes = table.row_codes[selected_rows] + np.arange(size)[:, None] * len(table.counts)
+  weights = None if weights is None else weights.ravel()
+
+  return np.bincount(codes.ravel(), weights, minlength=size * len(table.counts)).reshape(size, -1).astype(np.float64)
+
+def _sample_per_row(table: CodeTable) -> bool:
+  # With almost one code per row, drawing the rows is cheaper than drawing the codes
+  return len(table.counts) * 4 > table.rows
+
+def _bootstrap_block(task: tuple) -> np.ndarray:
+  table, metric, size, seed_sequence = task
+  gen = np.random.default_rng(seed_sequence)
+
+  if _sample_per_row(table):
+    weights = _count_codes(table, gen.integers(table.rows, size=(size, table.rows)))
+  else:
+    weights = gen.multinomial(table.rows, table.counts / table.rows, size=size).astype(np.float64)
+  totals = table.totals(weights)
+  scores = [table.scores(metric, totals, system) for system in range(len(table.systems))]
+
+  # The paired test only needs the difference between both systems
+  return scores[0] if len(scores) == 1 else scores[0] - scores[1]
+
+def _permutation_block(task: tuple) -> np.ndarray:
+  table, metric, size, seed_sequence = task
+  gen = np.random.default_rng(seed_sequence)
+
+  # Every permutation keeps all of the rows, only the swapped ones change
+  totals = np.broadcast_to(table.totals(table.counts[None, :].astype(np.float64)), (size, table.matrix.shape[1]))
+
+  if _sample_per_row(table):
+    # Every row is swapped with probability 0.5, only the swapped rows are counted
+    rows = np.broadcast_to(np.arange(table.rows), (size, table.rows))
+    swapped = _count_codes(table, rows, gen.random((size, table.rows)) < 0.5)
+  else:
+    swapped = gen.binomial(table.counts, 0.5, size=(size, len(table.counts))).astype(np.float64)
+
+  swapped_totals = table.totals(swapped)
+
+  return table.scores(metric, totals, 0, swapped_totals) - table.scores(metric, totals, 1, swapped_totals)
+
+def _run_blocks(
+  function,
+  table: CodeTable,
+  metric: str,
+  resamples: int,
+  seed: "int | np.random.SeedSequence",
+  workers: int,
+  block_size: int
+) -> np.ndarray:
+  """Run the resamples in blocks, each one with its own generator spawned from the
+  seed, so the result only depends on the seed and not on the amount of workers.
+  """
+  sizes = _block_sizes(resamples, block_size, len(table.counts))
+  root_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+  seed_sequences = root_sequence.spawn(len(sizes))
+  tasks = [(table, metric, size, seed_sequence) for size, seed_sequence in zip(sizes, seed_sequences)]
+
+  if workers <= 1 or len(tasks) <= 1:
+    return np.concatenate([function(task) for task in tasks])
+
+  with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+    return np.concatenate(list(executor.map(function, tasks)))
+
+def bootstrap(
+  y_true: LabelSet,
+  y_pred: LabelSet,
+  metric: str = "f1",
+  resamples: int = 10_000,
+  confidence: float = 0.95,
+  seed: int = 42,
+  workers: int = 1,
+  block_size: int = 1_000
+) -> dict[str, tuple[float, float, float]]:
+  """Get the percentile bootstrap confidence interval of a metric for every label
+  and average, structured as follows:
+    {
+      name: (value, lower bound, upper bound)
+    }
+  """
+  table = CodeTable(y_true, y_pred)
+  value = table.scores(metric, table.totals(table.counts[None, :].astype(np.float64)))[0]
+
+  scores = _run_blocks(_bootstrap_block, table, metric, resamples, seed, workers, block_size)
+  alpha = (1 - confidence) / 2
+  lower, upper = np.quantile(scores, [alpha, 1 - alpha], axis=0)
+
+  return { name: (float(value[i]), float(lower[i]), float(upper[i])) for i, name in enumerate(table.names()) }
+
+def paired_test(
+  y_true: LabelSet,
+  y_pred_a: LabelSet,
+  y_pred_b: LabelSet,
+  metric: str = "f1",
+  resamples: int = 10_000,
+  confidence: float = 0.95,
+  seed: int = 42,
+  workers: int = 1,
+  block_size: int = 1_000
+) -> dict[str, tuple[float, float, float, float, float, float]]:
+  """Compare a metric of two systems over the same rows, for every label and average.
+
+  The difference (a - b) gets a paired bootstrap confidence interval (both systems
+  are evaluated on the same resamples), and its two-sided p-value comes from a
+  paired permutation test (approximate randomization). The result is structured
+  as follows:
+    {
+      name: (value a, value b, difference, lower bound, upper bound, p-value)
+    }
+  """
+  table = CodeTable(y_true, y_pred_a, y_pred_b)
+  totals = table.totals(table.counts[None, :].astype(np.float64))
+  value_a = table.scores(metric, totals, 0)[0]
+  value_b = table.scores(metric, totals, 1)[0]
+  difference = value_a - value_b
+
+  bootstrap_seed, permutation_seed = np.random.SeedSequence(seed).spawn(2)
+  differences = _run_blocks(_bootstrap_block, table, metric, resamples, bootstrap_seed, workers, block_size)
+  permutations = _run_blocks(_permutation_block, table, metric, resamples, permutation_seed, workers, block_size)
+
+  alpha = (1 - confidence) / 2
+  lower, upper = np.quantile(differences, [alpha, 1 - alpha], axis=0)
+
+  # Permutations at least as extreme as the observed difference (with a small tolerance
+  # for the floating point noise), counting the observed one
+  extreme = (np.abs(permutations) >= np.abs(difference) - 1e-12).sum(axis=0)
+  p_values = (extreme + 1) / (resamples + 1)
+
+  return {
+    name: (float(value_a[i]), float(value_b[i]), float(difference[i]), float(lower[i]), float(upper[i]), float(p_values[i]))
+    for i, name in enumerate(table.names())
+  }
@@ -0,0 +1,106 @@
+from threading import Lock
+import hashlib
+import sqlite3
+import time
+
+class SenticNetCache:
+  """Persistent cache of the raw SenticNet API responses stored in a SQLite file.
+
+  Every entry is addressed by the hash of the language and the preprocessed text
+  sent to the API, so the same sentence is only queried once across datasets and
+  runs. The raw response is stored (instead of the parsed emotions) so changes in
+  the parsing do not invalidate the cache.
+
+  If `max_entries` is given, the least recently used entries are evicted once the
+  cache grows past that size.
+  """
+  def __init__(self, path: str, max_entries: int | None = None):
+    self.path = path
+    self.max_entries = max_entries
+
+    self.hits = 0
+    self.misses = 0
+
+    self._lock = Lock()
+    self._connection = sqlite3.connect(path, check_same_thread=False)
+    self._connection.execute("PRAGMA journal_mode=WAL")
+    self._connection.execute("PRAGMA synchronous=NORMAL")
+    self._connection.execute(
+      """
+      CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        language TEXT NOT NULL,
+        text TEXT NOT NULL,
+        response TEXT NOT NULL,
+        last_used REAL NOT NULL
+      )
+      """
+    )
+    self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+    self._connection.commit()
+
+    self._entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+  @staticmethod
+  def make_key(text: str, language: str) -> str:
+    return hashlib.sha256(f"{language}\0{text}".encode("utf-8")).hexdigest()
+
+  def get(self, text: str, language: str) -> str | None:
+    key = self.make_key(text, language)
+
+    with self._lock:
+      row = self._connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+
+      if row is None:
+        self.misses += 1
+        return None
+
+      self.hits += 1
+
+      # Only keep track of the usage when it is needed for the eviction
+      if self.max_entries is not None:
+        self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._connection.commit()
+
+    return row[0]
+
+  def put(self, text: str, language: str, response: str):
+    key = self.make_key(text, language)
+
+    with self._lock:
+      cursor = self._connection.execute(
+        "INSERT OR IGNORE INTO responses (key, language, text, response, last_used) VALUES (?, ?, ?, ?, ?)",
+        (key, language, text, response, time.time())
+      )
+
+      if cursor.rowcount == 0:
+        # Another worker stored the same text first, we just refresh the response
+        self._connection.execute(
+          "UPDATE responses SET response = ?, last_used = ? WHERE key = ?",
+          (response, time.time(), key)
+        )
+      else:
+        self._entries += 1
+
+      # Evict the least recently used entries that go over the limit
+      if self.max_entries is not None and self._entries > self.max_entries:
+        self._connection.execute(
+          "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+          (self._entries - self.max_entries,)
+        )
+        self._entries = self.max_entries
+
+      self._connection.commit()
+
+  def __len__(self) -> int:
+    return self._entries
+
+  def summary(self) -> str:
+    lookups = self.hits + self.misses
+    hit_rate = self.hits / lookups * 100 if lookups > 0 else 0.0
+
+    return f"Cache hits: {self.hits} | Cache misses: {self.misses} | Hit rate: {hit_rate:.1f}% | Entries: {len(self)}"
+
+  def close(self):
+    with self._lock:
+      self._connection.close()
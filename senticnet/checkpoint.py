@@ -0,0 +1,46 @@
+from typing import Dict
+import json
+import os
+import time
+
+class FetchCheckpoint:
+  """Durable progress record of a fetch job.
+
+  The checkpoint is stored as a small JSON file next to the output file. It is
+  always written to a temporary file first and then moved over the previous one,
+  so an interruption never leaves a half written checkpoint behind.
+
+  The stored state is structured as follows:
+    {
+      file: input file path,
+      column: name of the text column,
+      output: output file path,
+      completed: amount of rows saved in the output,
+      last_index: highest row index saved in the output,
+      updated_at: unix timestamp of the last update
+    }
+  """
+  def __init__(self, path: str):
+    self.path = path
+
+  def load(self) -> Dict[str, str | int | float] | None:
+    if not os.path.exists(self.path):
+      return None
+
+    with open(self.path, "r", encoding="utf-8") as file:
+      return json.load(file)
+
+  def save(self, state: Dict[str, str | int | float]):
+    state = { **state, "updated_at": time.time() }
+    temporary_path = self.path + ".tmp"
+
+    with open(temporary_path, "w", encoding="utf-8") as file:
+      json.dump(state, file, indent=2)
+      file.flush()
+      os.fsync(file.fileno())
+
+    os.replace(temporary_path, self.path)
+
+  def remove(self):
+    if os.path.exists(self.path):
+      os.remove(self.path)
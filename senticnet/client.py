@@ -1,10 +1,170 @@
-import requests
+from requests.adapters import HTTPAdapter
+from senticnet.throttle import AdaptiveConcurrency, TokenBucket
+from threading import Lock
 from config import config
+import requests
+import random
+import time
+
+# Status codes returned by the API that are worth retrying
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class SenticNetClientError(Exception):
+  """Raised when the SenticNet API could not return a valid response after
+  all of the retries were exhausted.
+  """
+
+class SenticNetClientStats:
+  """Counters shared by all the threads using a single client.
 
-class SenticNetClient:  
+  It keeps track of the amount of requests, retries and failures, together
+  with the accumulated and maximum latency of the HTTP calls.
+  """
   def __init__(self):
-    self.path = config.SENTIC_NET_URL + "/" + config.SENTIC_NET_LANGUAGE + "/" + config.SENTIC_NET_API_KEY + ".py"
+    self._lock = Lock()
+
+    self.requests = 0
+    self.retries = 0
+    self.failures = 0
+    self.total_latency = 0.0
+    self.max_latency = 0.0
+
+  def record_request(self, latency: float):
+    with self._lock:
+      self.requests += 1
+      self.total_latency += latency
+      self.max_latency = max(self.max_latency, latency)
+
+  def record_retry(self):
+    with self._lock:
+      self.retries += 1
+
+  def record_failure(self):
+    with self._lock:
+      self.failures += 1
+
+  @property
+  def mean_latency(self) -> float:
+    return self.total_latency / self.requests if self.requests > 0 else 0.0
+
+  def summary(self) -> str:
+    return (
+      f"Requests: {self.requests} | Retries: {self.retries} | Failures: {self.failures} | "
+      f"Mean latency: {self.mean_latency * 1000:.1f} ms | Max latency: {self.max_latency * 1000:.1f} ms"
+    )
+
+class SenticNetClient:
+  def __init__(
+    self,
+    pool_size: int = 10,
+    timeout: float = 10.0,
+    max_retries: int = 5,
+    backoff_factor: float = 0.5,
+    max_backoff: float = 30.0,
+    rate_limiter: TokenBucket | None = None,
+    controller: AdaptiveConcurrency | None = None,
+    base_url: str | None = None,
+    language: str | None = None,
+    api_key: str | None = None
+  ):
+    # The endpoint defaults to the one configured in the .env file
+    base_url = base_url if base_url is not None else config.SENTIC_NET_URL
+    language = language if language is not None else config.SENTIC_NET_LANGUAGE
+    api_key = api_key if api_key is not None else config.SENTIC_NET_API_KEY
+
+    if base_url is None or language is None or api_key is None:
+      raise SenticNetClientError("SENTIC_NET_URL, SENTIC_NET_LANGUAGE and SENTIC_NET_API_KEY must be configured")
+
+    self.language = language
+    self.path = base_url + "/" + language + "/" + api_key + ".py"
+
+    self.timeout = timeout
+    self.max_retries = max_retries
+    self.backoff_factor = backoff_factor
+    self.max_backoff = max_backoff
+
+    # Optional pacing of the requests and feedback for the concurrency controller
+    self.rate_limiter = rate_limiter
+    self.controller = controller
+
+    self.stats = SenticNetClientStats()
+
+    # A single session keeps the connections alive between requests, and the
+    # pool is sized so every worker thread can hold its own connection
+    self.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    self.session.mount("http://", adapter)
+    self.session.mount("https://", adapter)
+
+  def _backoff(self, attempt: int) -> float:
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+  def _retry_after(self, response: requests.Response) -> float | None:
+    # The API may tell us how long to wait before retrying a throttled request
+    value = response.headers.get("Retry-After")
+    if value is None:
+      return None
+
+    try:
+      return min(self.max_backoff, float(value))
+    except ValueError:
+      return None
+
+  def get_emotions(self, text: str) -> str:
+    last_error = None
+    retry_after = None
+
+    for attempt in range(0, self.max_retries + 1):
+      if attempt > 0:
+        self.stats.record_retry()
+        time.sleep(retry_after if retry_after is not None else self._backoff(attempt - 1))
+        retry_after = None
+
+      if self.rate_limiter is not None:
+        self.rate_limiter.acquire()
+
+      start = time.perf_counter()
+      try:
+        response = self.session.get(self.path, params={"text": text}, timeout=self.timeout)
+      except (requests.ConnectionError, requests.Timeout) as error:
+        self.stats.record_request(time.perf_counter() - start)
+        last_error = error
+
+        if self.controller is not None:
+          self.controller.on_failure()
+        continue
+
+      latency = time.perf_counter() - start
+      self.stats.record_request(latency)
+
+      if response.status_code in RETRY_STATUS_CODES:
+        if response.status_code == 429:
+          retry_after = self._retry_after(response)
+
+          if self.controller is not None:
+            self.controller.on_throttle()
+        elif self.controller is not None:
+          self.controller.on_failure()
+
+        last_error = f"HTTP {response.status_code}"
+        continue
+
+      # Only a successful response may raise the concurrency limit
+      if not response.ok:
+        if self.controller is not None:
+          self.controller.on_failure()
+
+        self.stats.record_failure()
+        raise SenticNetClientError(f"SenticNet API returned HTTP {response.status_code} for text: {text!r}")
+
+      if self.controller is not None:
+        self.controller.on_success(latency)
+
+      return response.text
+
+    self.stats.record_failure()
+    raise SenticNetClientError(f"SenticNet API failed after {self.max_retries} retries ({last_error}) for text: {text!r}")
 
-  def get_emotions(self, text: str):
-    response = requests.get(self.path, params={"text": text})
-    return response.text
+  def close(self):
+    self.session.close()
@@ -1,14 +1,130 @@
 from senticnet.adapter import SenticNetAdapter
+from senticnet.client import SenticNetClient, SenticNetClientError
+from senticnet.cache import SenticNetCache
+from senticnet.checkpoint import FetchCheckpoint
+from senticnet.sink import OutputSink, SINKS, open_sink
+from senticnet.source import read_sentences
+from senticnet.throttle import AdaptiveConcurrency, TokenBucket
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Dict, Iterable, Iterator
 import argparse
 import pandas as pd
 
-def write_to_file(file_path: str, data: list):
+def fetch_emotions(
+  adapter: SenticNetAdapter,
+  rows: Iterable[tuple[int, str]],
+  concurrency: int = 1,
+  controller: AdaptiveConcurrency | None = None
+) -> Iterator[tuple[int, str, list[str]]]:
+  """Query the SenticNet API for every (index, sentence) row and yield the
+  results in the same order as the input.
 
-  with open(file_path, 'a') as file:
-    for item in data:
-      file.write(f"{item}\t")
+  With a concurrency greater than one, up to `concurrency` requests are kept
+  in flight using a pool of worker threads. Results are still yielded in input
+  order, so a slow request only holds back the rows that come after it.
 
-    file.write("\n")
+  When a `controller` is given, the amount of requests in flight follows its
+  current limit instead, and `concurrency` is only the upper bound.
+
+  Each yielded value is a tuple structured as follows:
+    (index, sentence, [emotion_1, ..., emotion_n])
+  """
+  if concurrency <= 1:
+    for index, sentence in rows:
+      yield index, sentence, adapter.get_emotions(sentence)
+    return
+
+  with ThreadPoolExecutor(max_workers=concurrency) as executor:
+    in_flight = deque()
+
+    for index, sentence in rows:
+      window = controller.limit if controller is not None else concurrency
+
+      # Wait for the oldest requests before submitting a new one once the window is full
+      while len(in_flight) >= window:
+        pending_index, pending_sentence, future = in_flight.popleft()
+        yield pending_index, pending_sentence, future.result()
+
+      in_flight.append((index, sentence, executor.submit(adapter.get_emotions, sentence)))
+
+    # Drain the remaining requests in order
+    while in_flight:
+      pending_index, pending_sentence, future = in_flight.popleft()
+      yield pending_index, pending_sentence, future.result()
+
+def run_batch(
+  adapter: SenticNetAdapter,
+  rows: Iterable[tuple[int, str]],
+  sink: OutputSink,
+  concurrency: int,
+  controller: AdaptiveConcurrency | None = None
+):
+  """Process a single batch of rows appending the results to the output sink."""
+  saved = 0
+  for index, sentence, emotions_list in fetch_emotions(adapter, rows, concurrency, controller):
+    sink.write(index, sentence, emotions_list)
+    saved += 1
+
+  if saved == 0:
+    print("[WARNING] No rows were found starting at the selected offset.")
+
+def run_job(
+  adapter: SenticNetAdapter,
+  rows: Iterable[tuple[int, str]],
+  sink: OutputSink,
+  concurrency: int,
+  checkpoint_every: int,
+  job_state: Dict[str, str | int],
+  controller: AdaptiveConcurrency | None = None
+):
+  """Process all of the rows of the file as a resumable job.
+
+  Indices already present in the output file are skipped, so an interrupted job
+  is resumed by running the same command again. The output is synced to disk and
+  the progress recorded in a checkpoint file every `checkpoint_every` rows, the
+  checkpoint is removed once every row was saved.
+  """
+  checkpoint = FetchCheckpoint(sink.path + ".checkpoint.json")
+
+  # A checkpoint from a different job means the output file belongs to another input
+  previous_state = checkpoint.load()
+  if previous_state is not None and (
+    previous_state["file"] != job_state["file"] or previous_state["column"] != job_state["column"]
+  ):
+    print(f"[ERROR] {sink.path} belongs to a job over {previous_state['file']} ({previous_state['column']}).")
+    return
+
+  completed = sink.recover(sink.path)
+  if completed is None:
+    return
+
+  print(f"Rows already fetched: {len(completed)}")
+
+  # The rows keep being read lazily while the already fetched ones are skipped
+  pending_rows = ((index, sentence) for index, sentence in rows if index not in completed)
+
+  saved = len(completed)
+  last_index = max(completed, default=-1)
+
+  def save_checkpoint():
+    sink.sync()
+    checkpoint.save({ **job_state, "completed": saved, "last_index": last_index })
+
+  save_checkpoint()
+
+  for index, sentence, emotions_list in fetch_emotions(adapter, pending_rows, concurrency, controller):
+    sink.write(index, sentence, emotions_list)
+    saved += 1
+    last_index = max(last_index, index)
+
+    if saved % checkpoint_every == 0:
+      save_checkpoint()
+
+  sink.sync()
+  checkpoint.remove()
+
+  print(f"Job finished: {saved} rows saved in {sink.path}")
 
 def main(parser: argparse.ArgumentParser):
   args = parser.parse_args()
@@ -16,41 +132,95 @@ def main(parser: argparse.ArgumentParser):
   # Get the values for the arguments needed
   file_path: str = args.file
   column_name: str = args.name
+  output_path: str = args.output
+  output_format: str = args.format
   batch_size: int = args.batch_size
   offset: int = args.offset
+  job: bool = args.job
+  checkpoint_every: int = args.checkpoint_every
+  concurrency: int = args.concurrency
+  timeout: float = args.timeout
+  retries: int = args.retries
+  rate: float | None = args.rate
+  adaptive: bool = args.adaptive
+  cache_path: str | None = None if args.no_cache else args.cache
+  cache_size: int | None = args.cache_size
 
   print(f"File path: {file_path}")
+  print(f"Output path: {output_path} ({output_format})")
+  print(f"Mode: {'job' if job else 'batch'}")
   print(f"Batch size: {batch_size}")
   print(f"Offset: {offset}")
+  print(f"Concurrency: {concurrency}{' (adaptive)' if adaptive else ''}")
+  print(f"Rate limit: {f'{rate} requests/s' if rate is not None else 'none'}")
+  print(f"Cache: {cache_path}")
+
+  if concurrency < 1:
+    print(f"[ERROR] Concurrency must be at least 1, got {concurrency}.")
+    return
 
-  # We initiate the SenticNet adapter
-  adapter = SenticNetAdapter()
+  if checkpoint_every < 1:
+    print(f"[ERROR] Checkpoint interval must be at least 1 row, got {checkpoint_every}.")
+    return
 
-  # Read the file
-  dataframe = pd.read_csv(file_path, sep='\t')
+  if rate is not None and rate <= 0:
+    print(f"[ERROR] Rate limit must be greater than 0, got {rate}.")
+    return
 
-  # Check if the offset and the batch size are valid
-  if offset > len(dataframe):
-    print(f"[ERROR] Offset {offset} is greater than the number of rows in the file.")
+  # Only the header is read upfront to validate the column
+  columns = pd.read_csv(file_path, sep='\t', nrows=0).columns
+  if column_name not in columns:
+    print(f"[ERROR] Column {column_name} not found in the file, available columns: {', '.join(columns)}")
     return
-  
-  if offset + batch_size > len(dataframe):
-    print(len(dataframe), offset + batch_size)
-    print(f"[ERROR] Offset {offset} + batch size {batch_size} is greater than the number of rows in the file.")
+
+  # Rows are only appended to the outputs of the same sink, never to the files of the older fetcher
+  if not SINKS[output_format].is_compatible(output_path):
+    print(f"[ERROR] {output_path} was not written by the {output_format} sink, choose a new output file.")
     return
-  
-  text_column = dataframe[column_name].tolist()
 
-  # Get the current batch
-  batch = text_column[offset : offset + batch_size]
+  # The sentences are streamed from the file. A job goes through the whole file, while
+  # a batch is limited by the batch size (the last batch of the file is simply shorter)
+  rows = read_sentences(file_path, column_name, offset=offset, limit=None if job else batch_size)
+
+  # We initiate the SenticNet adapter with a connection pool large enough for every worker
+  # The adaptive controller starts at half of the maximum concurrency and moves from there
+  rate_limiter = TokenBucket(rate, burst=args.burst) if rate is not None else None
+  controller = AdaptiveConcurrency(max(1, concurrency // 2), maximum=concurrency) if adaptive else None
+
+  client = SenticNetClient(
+    pool_size=concurrency,
+    timeout=timeout,
+    max_retries=retries,
+    rate_limiter=rate_limiter,
+    controller=controller
+  )
+  cache = SenticNetCache(cache_path, max_entries=cache_size) if cache_path is not None else None
+  adapter = SenticNetAdapter(client, cache)
 
-  # Process the batch and then save the result into the selected file
-  for index, sentence in enumerate(batch):
-    # SenticNet API call and parse the response
-    emotions_list = adapter.get_emotions(sentence)
-    emotions = " ".join(emotions_list)
+  # The sink keeps the output file open for the whole run
+  sink = open_sink(output_path, output_format, flush_rows=args.flush_rows, flush_interval=args.flush_interval)
 
-    write_to_file("out/senticnet.txt", [f"{index + offset}", f"{sentence}", f"{emotions}"])
+  # Process the rows and then save the result into the selected file
+  try:
+    if job:
+      job_state = { "file": file_path, "column": column_name, "output": output_path }
+      run_job(adapter, rows, sink, concurrency, checkpoint_every, job_state, controller)
+    else:
+      run_batch(adapter, rows, sink, concurrency, controller)
+  except SenticNetClientError as error:
+    # Rows are written in order, so everything before the failing one is already saved
+    print(f"[ERROR] {error}")
+  finally:
+    sink.close()
+    client.close()
+    print(client.stats.summary())
+
+    if controller is not None:
+      print(controller.summary())
+
+    if cache is not None:
+      print(cache.summary())
+      cache.close()
 
 
 if __name__ == "__main__":
@@ -73,6 +243,37 @@ if __name__ == "__main__":
     required=True
   )
 
+  parser.add_argument(
+    "--output",
+    help="File path where the fetched emotions are appended",
+    action='store',
+    default="out/senticnet.txt"
+  )
+
+  parser.add_argument(
+    "--format",
+    help="Format of the output file",
+    action='store',
+    choices=list(SINKS.keys()),
+    default="tsv"
+  )
+
+  parser.add_argument(
+    "--flush-rows",
+    help="Amount of rows written to the output before flushing it",
+    action='store',
+    type=int,
+    default=100
+  )
+
+  parser.add_argument(
+    "--flush-interval",
+    help="Maximum amount of seconds between flushes of the output",
+    action='store',
+    type=float,
+    default=1.0
+  )
+
   parser.add_argument(
     "-b",
     "--batch-size",
@@ -91,4 +292,89 @@ if __name__ == "__main__":
     default=0
   )
 
+  parser.add_argument(
+    "-j",
+    "--job",
+    help="Process the whole file (starting at the offset) as a resumable job with checkpoints",
+    action='store_true'
+  )
+
+  parser.add_argument(
+    "--checkpoint-every",
+    help="Amount of rows saved between checkpoints when running as a job",
+    action='store',
+    type=int,
+    default=100
+  )
+
+  parser.add_argument(
+    "-c",
+    "--concurrency",
+    help="Amount of requests to the SenticNet API kept in flight at the same time",
+    action='store',
+    type=int,
+    default=1
+  )
+
+  parser.add_argument(
+    "--adaptive",
+    help="Adapt the amount of requests in flight (up to --concurrency) to the throttling and latency of the API",
+    action='store_true'
+  )
+
+  parser.add_argument(
+    "--rate",
+    help="Maximum amount of requests per second sent to the SenticNet API",
+    action='store',
+    type=float,
+    default=None
+  )
+
+  parser.add_argument(
+    "--burst",
+    help="Amount of requests that can be sent at once before the rate limit applies",
+    action='store',
+    type=int,
+    default=None
+  )
+
+  parser.add_argument(
+    "-t",
+    "--timeout",
+    help="Timeout in seconds for every request made to the SenticNet API",
+    action='store',
+    type=float,
+    default=10.0
+  )
+
+  parser.add_argument(
+    "-r",
+    "--retries",
+    help="Amount of retries for a request that failed with a transient error (429/5xx, timeouts)",
+    action='store',
+    type=int,
+    default=5
+  )
+
+  parser.add_argument(
+    "--cache",
+    help="Path of the SQLite file used to cache the SenticNet API responses between runs",
+    action='store',
+    default="out/senticnet_cache.db"
+  )
+
+  parser.add_argument(
+    "--cache-size",
+    help="Maximum amount of responses kept in the cache (least recently used are evicted)",
+    action='store',
+    type=int,
+    default=None
+  )
+
+  parser.add_argument(
+    "--no-cache",
+    help="Always query the SenticNet API without using the response cache",
+    action='store_true'
+  )
+
   main(parser)
\ No newline at end of file
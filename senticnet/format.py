@@ -1,32 +1,11 @@
+from senticnet.parser import SENTICNET_EMOTIONS
+from labels import LabelMapping, LabelSet, label_frame
+import frames
+import argparse
+import numpy as np
 import pandas as pd
 
-SENTICNET_LABELS = [
-  "grief",
-  "sadness",
-  "melancholy",
-  "contentment",
-  "joy",
-  "ecstasy",
-  "rage",
-  "anger",
-  "annoyance",
-  "serenity",
-  "calmness",
-  "bliss",
-  "loathing",
-  "disgust",
-  "dislike",
-  "acceptance",
-  "pleasantnes",
-  "delight",
-  "terror",
-  "fear",
-  "anxiety",
-  "responsiveness",
-  "eagerness",
-  "enthusiasm"
-]
-CLASSIFIER_LABELS = ["joy", "sadness", "trust", "disgust", "fear", "anger", "surprise", "anticipation"]
+SENTICNET_LABELS = list(SENTICNET_EMOTIONS)
 
 """
 ----------------------------
@@ -57,7 +36,7 @@ Emotions will be assigned as follows:
 - disgust: disgust
 - dislike: disgust
 - acceptance: joy, trust
-- pleasantnes: joy
+- pleasantness: joy
 - delight: joy, surprise
 
 - terror: fear, surprise
@@ -67,124 +46,78 @@ Emotions will be assigned as follows:
 - eagerness: anticipation, joy
 - enthusiasm: anticipation, joy
 """
+SENTICNET_MAPPING = LabelMapping({
+  "grief": ["sadness", "fear"],
+  "sadness": ["sadness"],
+  "melancholy": ["sadness", "anticipation"],
+  "contentment": ["joy"],
+  "joy": ["joy"],
+  "ecstasy": ["joy"],
+  "rage": ["anger"],
+  "anger": ["anger"],
+  "annoyance": ["anger"],
+  "serenity": ["joy", "trust"],
+  "calmness": ["joy", "trust"],
+  "bliss": ["joy", "trust"],
+  "loathing": ["disgust", "anger"],
+  "disgust": ["disgust"],
+  "dislike": ["disgust"],
+  "acceptance": ["joy", "trust"],
+  "pleasantness": ["joy"],
+  "delight": ["joy", "surprise"],
+  "terror": ["fear", "surprise"],
+  "fear": ["fear"],
+  "anxiety": ["anticipation", "fear"],
+  "responsiveness": ["anticipation", "trust"],
+  "eagerness": ["anticipation", "joy"],
+  "enthusiasm": ["anticipation", "joy"]
+})
 
 def load_dataframe(path: str) -> pd.DataFrame:
-  return pd.read_csv(path, sep='\t')
-
-def save_dataframe(df: pd.DataFrame, filename: str):
-  df.to_csv("out/" + filename, sep='\t', index=False)
-
-def convert_row(row: str) -> list[1 | 0]:
-  new_row = [0 for _ in range(0, len(CLASSIFIER_LABELS))]
-
-  if pd.isna(row):
-    return new_row
-
-  row_array = row.split(" ")
-
-  # We assign it according to the end result assignments we set up as end result
-  assignment_index = []
-
-  for element in row_array:
-    # Manually go through the labels and parse them to the new emotions/labels
-    # while ignoring the 'neutral state' and 'other' emotions
-    if element == "grief":
-      assignment_index.append(1)
-      assignment_index.append(4)
-    elif element == "sadness":
-      assignment_index.append(1)
-    elif element == "melancholy":
-      assignment_index.append(1)
-      assignment_index.append(7)
-    elif element == "contentment":
-      assignment_index.append(0)
-    elif element == "joy":
-      assignment_index.append(0)
-    elif element == "ecstasy":
-      assignment_index.append(0)
-    elif element == "rage":
-      assignment_index.append(5)
-    elif element == "anger":
-      assignment_index.append(5)
-    elif element == "annoyance":
-      assignment_index.append(5)
-    elif element == "serenity":
-      assignment_index.append(0)
-      assignment_index.append(2)
-    elif element == "calmness":
-      assignment_index.append(0)
-      assignment_index.append(2)
-    elif element == "bliss":
-      assignment_index.append(0)
-      assignment_index.append(2)
-    elif element == "loathing":
-      assignment_index.append(3)
-      assignment_index.append(5)
-    elif element == "disgust":
-      assignment_index.append(3)
-    elif element == "dislike":
-      assignment_index.append(3)
-    elif element == "acceptance":
-      assignment_index.append(0)
-      assignment_index.append(2)
-    elif element == "pleasantness":
-      assignment_index.append(0)
-    elif element == "delight":
-      assignment_index.append(0)
-      assignment_index.append(6)
-    elif element == "terror":
-      assignment_index.append(4)
-      assignment_index.append(6)
-    elif element == "fear":
-      assignment_index.append(4)
-    elif element == "anxiety":
-      assignment_index.append(4)
-      assignment_index.append(7)
-    elif element == "responsiveness":
-      assignment_index.append(2)
-      assignment_index.append(7)
-    elif element == "eagerness":
-      assignment_index.append(0)
-      assignment_index.append(7)
-    elif element == "enthusiasm":
-      assignment_index.append(0)
-      assignment_index.append(7)
-
-  # We assign the new indexes to the new resulting row
-  for new_index in assignment_index:
-    new_row[new_index] = 1
-
-  return new_row
-
-def main(filename: str):
-  # We process the dataset from the original format to the 3 columns (id, text, target)
-  df = load_dataframe("./senticnet/dataset/" + filename)
-
-  # Obtain individual columns
-  text_column = df["id"].tolist()
-  emotions_column = df["text"].tolist()
+  # The fetcher can also save its output as JSON lines
+  if path.endswith(".jsonl"):
+    return pd.read_json(path, lines=True, dtype={ "id": int, "text": str, "emotions": str })
+
+  # Older fetcher outputs end every row with a tab, index_col=False keeps the
+  # columns aligned with the header in both cases
+  return pd.read_csv(path, sep='\t', index_col=False)
+
+def save_dataframe(df: pd.DataFrame, filename: str, binary: bool = False):
+  frames.save_dataframe(df, "out/" + filename, binary)
+
+def convert_column(column: pd.Series) -> LabelSet:
+  # Every row is a string of emotions separated by spaces (empty rows are missing values)
+  return LabelSet.from_dense(SENTICNET_MAPPING.from_tokens(column, sep=" "))
+
+def main(filename: str, binary: bool = False, source: str | None = None) -> pd.DataFrame:
+  # We process the dataset from the original format to the 3 columns (id, text, target),
+  # it is read from senticnet/dataset unless the path of another fetcher output is given
+  df = load_dataframe(source if source is not None else "./senticnet/dataset/" + filename)
 
   # Convert the target column to the new format
-  new_target_column = [convert_row(row) for row in emotions_column]
+  new_target_column = convert_column(df["emotions"])
 
   # Join the text and the labels in a new dataframe
-  text_and_labels = [
-    [
-      index,
-      text_column[index], 
-      *new_target_column[index]
-    ] for index in range(0, int(len(new_target_column)))
-  ]
-  new_df = pd.DataFrame(text_and_labels, columns=["id", "dialog", *CLASSIFIER_LABELS])
+  new_df = label_frame(np.arange(len(df)), df["text"], new_target_column, columns=("id", "dialog"))
 
   # Save the new dataframe
-  save_dataframe(new_df, filename.replace(".txt", ".csv"))
-  
+  save_dataframe(new_df, filename.replace(".txt", ".csv"), binary)
+
+  return new_df
+
 
 if __name__ == "__main__":
-  main("senticnet_iemocap_test.txt")
-  main("senticnet_iemocap_train.txt")
-  main("senticnet_meld_test.txt")
-  main("senticnet_meld_train.txt")
-  main("senticnet_sem_eval_test.txt")
-  main("senticnet_sem_eval_train.txt")
\ No newline at end of file
+  parser = argparse.ArgumentParser(description="Formatter of the SenticNet fetched emotions to the classifier labels | SENTI-Lib")
+  parser.add_argument(
+    "--binary",
+    help="Save the results in the binary columnar format (.cols) instead of tab separated text",
+    action='store_true'
+  )
+  args = parser.parse_args()
+
+  main("senticnet_iemocap_test.txt", args.binary)
+  main("senticnet_iemocap_train.txt", args.binary)
+  main("senticnet_meld_test.txt", args.binary)
+  main("senticnet_meld_train.txt", args.binary)
+  main("senticnet_sem_eval_test.txt", args.binary)
+  main("senticnet_sem_eval_train.txt", args.binary)
@@ -1,21 +1,145 @@
+from labels import CLASSIFIER_LABELS, LabelSet, label_frame
+from senticnet.bootstrap import METRICS, bootstrap, paired_test
+from senticnet.multilabel import MultilabelScores, evaluate
+from senticnet.sink import OUTPUT_COLUMNS
+import senticnet.format as senticnet_format
+import frames
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import pandas as pd
 import numpy as np
-from sklearn.metrics import classification_report, multilabel_confusion_matrix
+import json
+import os
 
-CLASSIFIER_LABELS = ["joy", "sadness", "trust", "disgust", "fear", "anger", "surprise", "anticipation"]
+ALIGNMENTS = ["text", "id", "position"]
+
+# Unmatched rows shown in the report, all of them can be saved with --unmatched
+UNMATCHED_SHOWN = 5
+
+"""
+----------------------------
+ROW ALIGNMENT
+----------------------------
+The rows of the original dataset and of the predictions are matched with a hash
+join on a key shared by both files, instead of assuming that the row i of one file
+is the row i of the other, so dropped, extra or reordered rows never shift the rest:
+
+- text: the hash of the text of the row plus its occurrence number (the k-th row
+  with the same text in one file matches the k-th one in the other). The text is
+  normalized first, the fetcher reads the datasets without the quotes of the CSV
+  format and with tabs and line breaks turned into spaces.
+- id: the value of the first column (the ID of the utterance) in both files.
+- position: the first column of the predictions is the position of the row in the
+  original dataset, as written by the fetcher and by `senticnet/format.py`.
+
+Rows without a match on the other side are left out of the metrics and reported,
+so partial prediction files (like the output of a fetch still in progress) can be
+evaluated on the rows they already have.
+"""
 
 def load_dataframe(path: str) -> pd.DataFrame:
-  return pd.read_csv(path, sep='\t')
+  # Both tab separated files and binary (.cols) artifacts can be evaluated
+  return frames.load_dataframe(path)
+
+def is_fetch_output(path: str) -> bool:
+  """Check if a file is a raw output of the fetcher (id, text, emotions) instead of a formatted one."""
+  if path.endswith(".jsonl"):
+    return True
+
+  if frames.is_binary(path):
+    return False
+
+  with open(path, "r", encoding="utf-8") as file:
+    return file.readline().split()[:len(OUTPUT_COLUMNS)] == OUTPUT_COLUMNS
+
+def load_predictions(path: str) -> pd.DataFrame:
+  """Load a predictions file in the (id, dialog, *labels) format. The raw output of
+  the fetcher is converted on the fly, so it can be evaluated without formatting it.
+  """
+  if not is_fetch_output(path):
+    return load_dataframe(path)
+
+  df = senticnet_format.load_dataframe(path)
+  labels = senticnet_format.convert_column(df["emotions"])
+
+  return label_frame(df["id"], df["text"], labels, columns=("id", "dialog"))
+
+def normalize_text(text: pd.Series) -> pd.Series:
+  text = text.fillna("").astype(str).str.replace('"', "", regex=False)
+
+  return text.str.replace(r"\s+", " ", regex=True).str.strip()
+
+def get_keys(df: pd.DataFrame, align: str, gold: bool) -> pd.Index:
+  """Get the key of every row of a dataframe (see ROW ALIGNMENT)."""
+  if align == "position":
+    return pd.RangeIndex(len(df)) if gold else pd.Index(pd.to_numeric(df.iloc[:, 0]))
+
+  if align == "id":
+    return pd.Index(df.iloc[:, 0].astype(str))
+
+  if align == "text":
+    hashes = pd.util.hash_pandas_object(normalize_text(df.iloc[:, 1]), index=False).to_numpy()
+    occurrences = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+
+    return pd.MultiIndex.from_arrays([hashes, occurrences])
+
+  raise ValueError(f"Unknown alignment '{align}', use one of: {', '.join(ALIGNMENTS)}")
+
+class Alignment:
+  """Matches between the rows of the original dataset and of the predictions.
+
+  `indexer` holds the row of the predictions matched with every row of the
+  original dataset, or -1 when the row has no match.
+  """
+  def __init__(self, indexer: np.ndarray, prediction_rows: int):
+    self.indexer = indexer
+    self.prediction_rows = prediction_rows
+
+  @property
+  def gold_rows(self) -> np.ndarray:
+    return np.flatnonzero(self.indexer >= 0)
+
+  @property
+  def pred_rows(self) -> np.ndarray:
+    return self.indexer[self.indexer >= 0]
 
-def pre_process(df: pd.DataFrame) -> pd.DataFrame:
-  # Obtain the text and the labels separately
-  text = df.iloc[:, 1:2]
-  labels = df.iloc[:, 2:].to_numpy()
+  @property
+  def matched(self) -> int:
+    return int((self.indexer >= 0).sum())
 
-  # Join the text and the labels in a new dataframe
-  text_and_labels = [[text.iloc[index, 0], labels[index].tolist()] for index in range(0,int(labels.shape[0]))]
+  def unmatched_gold(self) -> np.ndarray:
+    return np.flatnonzero(self.indexer < 0)
 
-  return pd.DataFrame(text_and_labels, columns=["text", "target"])
+  def unmatched_pred(self) -> np.ndarray:
+    is_matched = np.zeros(self.prediction_rows, dtype=bool)
+    is_matched[self.pred_rows] = True
+
+    return np.flatnonzero(~is_matched)
+
+  def summary(self) -> str:
+    return (
+      f"Matched rows: {self.matched} | Unmatched original rows: {len(self.unmatched_gold())}"
+      f" | Unmatched prediction rows: {len(self.unmatched_pred())}"
+    )
+
+def align_rows(dataset_og: pd.DataFrame, dataset_pred: pd.DataFrame, align: str = "text") -> Alignment:
+  """Match the rows of both dataframes with a hash join on their keys."""
+  keys_og = get_keys(dataset_og, align, gold=True)
+  keys_pred = get_keys(dataset_pred, align, gold=False)
+
+  # With repeated keys a row could be matched more than once
+  for name, keys in [("original dataset", keys_og), ("predictions", keys_pred)]:
+    if not keys.is_unique:
+      raise ValueError(f"The keys of the {name} are repeated, they can not be aligned by {align}")
+
+  return Alignment(keys_pred.get_indexer(keys_og), len(dataset_pred))
+
+def pre_process(df: pd.DataFrame) -> tuple[pd.Series, LabelSet]:
+  # Obtain the text and the labels separately, the labels packed as one bitmask per row
+  text = df.iloc[:, 1]
+  labels = LabelSet.from_dense(df.iloc[:, 2:].to_numpy(dtype=np.uint8))
+
+  return text, labels
 
 def show_confusion_matrix(
   confusion_matrix: np.ndarray,
@@ -33,41 +157,286 @@ def show_confusion_matrix(
     print(f"{label:<15}{tn[i]:>4} \t{tp[i]:>4} \t{fn[i]:>4} \t{fp[i]:>4}")
     print()
 
-def main(filename_og: str, filename_pred: str):
+def show_intervals(intervals: dict, metric: str, confidence: float):
+  print()
+  print(f"{metric} with {confidence:.0%} bootstrap confidence intervals")
+  print(f"{'':<15}{'value':>9}{'lower':>9}{'upper':>9}")
+  for name, (value, lower, upper) in intervals.items():
+    print(f"{name:<15}{value:>9.4f}{lower:>9.4f}{upper:>9.4f}")
+
+def show_comparison(comparison: dict, metric: str, confidence: float):
+  print()
+  print(f"{metric} of both prediction files, difference (a - b) with {confidence:.0%} bootstrap confidence intervals")
+  print(f"{'':<15}{'a':>9}{'b':>9}{'diff':>9}{'lower':>9}{'upper':>9}{'p-value':>9}")
+  for name, (value_a, value_b, difference, lower, upper, p_value) in comparison.items():
+    print(
+      f"{name:<15}{value_a:>9.4f}{value_b:>9.4f}{difference:>9.4f}"
+      f"{lower:>9.4f}{upper:>9.4f}{p_value:>9.4f}"
+    )
+
+def show_unmatched(alignment: Alignment, dataset_og: pd.DataFrame, dataset_pred: pd.DataFrame):
+  print(alignment.summary())
+
+  for name, df, rows in [("original", dataset_og, alignment.unmatched_gold()), ("prediction", dataset_pred, alignment.unmatched_pred())]:
+    for row in rows[:UNMATCHED_SHOWN]:
+      print(f"  [{name} row {row}] {df.iloc[row, 0]}: {str(df.iloc[row, 1])[:80]!r}")
+
+    if len(rows) > UNMATCHED_SHOWN:
+      print(f"  ... and {len(rows) - UNMATCHED_SHOWN} more {name} rows")
+
+  print()
+
+def save_unmatched(alignment: Alignment, dataset_og: pd.DataFrame, dataset_pred: pd.DataFrame, path: str):
+  """Save the unmatched rows of both files, with the file and the row they come from."""
+  frames_unmatched = []
+
+  for name, df, rows in [("original", dataset_og, alignment.unmatched_gold()), ("prediction", dataset_pred, alignment.unmatched_pred())]:
+    frames_unmatched.append(pd.DataFrame({
+      "file": name,
+      "row": rows,
+      "id": df.iloc[rows, 0].to_numpy(),
+      "text": df.iloc[rows, 1].to_numpy()
+    }))
+
+  pd.concat(frames_unmatched).to_csv(path, sep="\t", index=False)
+
+def evaluate_files(filename_og: str, filename_pred: str, align: str = "text") -> tuple[MultilabelScores, Alignment]:
+  """Evaluate the labels of a predictions file against the original dataset, over
+  the rows matched in both files.
+  """
+  return evaluate_frames(load_dataframe(filename_og), load_predictions(filename_pred), align)
+
+def evaluate_frames(dataset_og: pd.DataFrame, dataset_pred: pd.DataFrame, align: str = "text") -> tuple[MultilabelScores, Alignment]:
+  """Evaluate the predictions against the original dataset, both already loaded."""
+  alignment = align_rows(dataset_og, dataset_pred, align)
+
+  if alignment.matched == 0:
+    raise ValueError(f"No rows of the predictions match the original dataset by {align}")
+
+  _, y_true = pre_process(dataset_og)
+  _, y_pred = pre_process(dataset_pred)
+
+  return evaluate(y_true[alignment.gold_rows], y_pred[alignment.pred_rows]), alignment
+
+def load_manifest(path: str) -> list[dict]:
+  """Load the list of evaluations of a batch, a JSON file structured as follows:
+    [
+        { name: evaluation name, gold: original dataset, prediction: predictions file, align: optional alignment }
+    ]
+  """
+  with open(path, "r", encoding="utf-8") as file:
+    return json.load(file)
+
+def evaluate_entry(entry: dict, dataframes: dict[str, pd.DataFrame] | None = None) -> dict:
+  """Evaluate a single entry of a manifest, errors are part of the result so one
+  broken pair does not stop the rest of the batch.
+
+  The files found in `dataframes` (by their path in the manifest) are used as
+  they are instead of being loaded again.
+  """
+  result = { "name": entry.get("name", entry["prediction"]), "gold": entry["gold"], "prediction": entry["prediction"] }
+  dataframes = dataframes or {}
+
+  try:
+    dataset_og = dataframes.get(entry["gold"])
+    dataset_pred = dataframes.get(entry["prediction"])
+
+    dataset_og = load_dataframe(entry["gold"]) if dataset_og is None else dataset_og
+    dataset_pred = load_predictions(entry["prediction"]) if dataset_pred is None else dataset_pred
+
+    scores, alignment = evaluate_frames(dataset_og, dataset_pred, entry.get("align", "text"))
+  except (OSError, ValueError, KeyError) as error:
+    return { **result, "status": "error", "error": str(error) }
+
+  unmatched = { "unmatched_gold": len(alignment.unmatched_gold()), "unmatched_prediction": len(alignment.unmatched_pred()) }
+
+  return { **result, "status": "ok", **unmatched, **scores.to_dict(CLASSIFIER_LABELS) }
+
+def evaluate_batch(entries: list[dict], workers: int = 1) -> list[dict]:
+  """Evaluate all of the entries of a manifest, in a pool of processes when
+  `workers` is greater than one. Results keep the order of the manifest.
+  """
+  if workers <= 1 or len(entries) <= 1:
+    return [evaluate_entry(entry) for entry in entries]
+
+  with ProcessPoolExecutor(max_workers=min(workers, len(entries))) as executor:
+    return list(executor.map(evaluate_entry, entries))
+
+def results_table(results: list[dict]) -> pd.DataFrame:
+  """Flatten the results of a batch into one row per evaluation, with a column per
+  metric: <average>_<metric> for the averages and <label>_<metric> for the labels.
+  """
+  rows = []
+
+  for result in results:
+    row = { key: result.get(key) for key in ["name", "gold", "prediction", "status", "error", "rows", "unmatched_gold", "unmatched_prediction"] }
+
+    for average, metrics in result.get("averages", {}).items():
+      row.update({ f"{average}_{metric}": value for metric, value in metrics.items() })
+
+    for label, metrics in result.get("labels", {}).items():
+      row.update({ f"{label}_{metric}": value for metric, value in metrics.items() })
+
+    rows.append(row)
+
+  return pd.DataFrame(rows)
+
+def save_results(results: list[dict], path: str):
+  """Save the results of a batch, as the full JSON results or as a flat table
+  (tab separated when the file does not end in .csv).
+  """
+  if path.endswith(".json"):
+    with open(path, "w", encoding="utf-8") as file:
+      json.dump(results, file, indent=2)
+  else:
+    results_table(results).to_csv(path, sep="," if path.endswith(".csv") else "\t", index=False)
+
+def batch_main(manifest_path: str, output_path: str, workers: int = 1, align: str = "text"):
+  # The alignment of the command line is used by the entries without their own
+  entries = [{ "align": align, **entry } for entry in load_manifest(manifest_path)]
+  results = evaluate_batch(entries, workers)
+
+  save_results(results, output_path)
+
+  # A short summary, the full results are in the output file
+  for result in results:
+    if result["status"] == "ok":
+      micro = result["averages"]["micro"]
+      unmatched = result["unmatched_gold"] + result["unmatched_prediction"]
+      print(f"{result['name']:<30}rows {result['rows']:>8}  unmatched {unmatched:>6}  micro f1 {micro['f1']:.4f}")
+    else:
+      print(f"[ERROR] {result['name']}: {result['error']}")
+
+  print(f"Results of {len(results)} evaluations saved in {output_path}")
+
+def main(
+  filename_og: str,
+  filename_pred: str,
+  align: str = "text",
+  unmatched_path: str | None = None,
+  resamples: int = 0,
+  filename_compare: str | None = None,
+  metric: str = "f1",
+  confidence: float = 0.95,
+  seed: int = 42,
+  workers: int = 1
+):
   # We load the original and the predicted dataframes
   dataset_og = load_dataframe(filename_og)
-  dataset_pred = load_dataframe(filename_pred)
+  dataset_pred = load_predictions(filename_pred)
 
-  df_og = pre_process(dataset_og)
-  df_pred = pre_process(dataset_pred)
+  # We match the rows of both dataframes
+  try:
+    alignment = align_rows(dataset_og, dataset_pred, align)
+  except ValueError as error:
+    print(f"[ERROR] {error}")
+    return
 
-  # We check if the two dataframes have the same length
-  if len(df_og) != len(df_pred):
-    print(f"[ERROR] The two dataframes do not have the same length: {len(df_og)} vs {len(df_pred)}")
+  if alignment.matched == 0:
+    print(f"[ERROR] No rows of the predictions match the original dataset by {align}")
     return
 
-  # We get the labels from the original dataframe
-  y_true = df_og["target"].tolist()
-  y_pred = df_pred["target"].tolist()
+  # Only the rows without a match are reported, the metrics use the matched ones
+  if alignment.matched < max(len(dataset_og), len(dataset_pred)):
+    show_unmatched(alignment, dataset_og, dataset_pred)
+
+  if unmatched_path is not None:
+    save_unmatched(alignment, dataset_og, dataset_pred, unmatched_path)
+
+  # We get the labels from both dataframes, the metrics only use the matched rows
+  _, labels_og = pre_process(dataset_og)
+  _, labels_pred = pre_process(dataset_pred)
+  y_true, y_pred = labels_og[alignment.gold_rows], labels_pred[alignment.pred_rows]
+
+  # All of the metrics come from the same counts, computed in a single pass over the bitmasks
+  scores = evaluate(y_true, y_pred)
 
   # We print the classification report
-  report = classification_report(
-    y_true,
-    y_pred,
-    target_names=CLASSIFIER_LABELS,
-    zero_division=0
-  )
-  print(report)
+  print(scores.report(CLASSIFIER_LABELS))
 
   # We show the confusion matrix in a readable format
-  confusion_matrices = multilabel_confusion_matrix(
-    y_true,
-    y_pred
-  )
+  show_confusion_matrix(scores.confusion_matrix(), CLASSIFIER_LABELS)
+
+  if filename_compare is not None:
+    dataset_compare = load_predictions(filename_compare)
 
-  show_confusion_matrix(confusion_matrices, CLASSIFIER_LABELS)
+    try:
+      compare_alignment = align_rows(dataset_og, dataset_compare, align)
+    except ValueError as error:
+      print(f"[ERROR] {error}")
+      return
+
+    # Both systems are compared on the original rows matched by both files
+    both = (alignment.indexer >= 0) & (compare_alignment.indexer >= 0)
+    if not both.any():
+      print("[ERROR] No rows of the original dataset are matched by both prediction files")
+      return
+
+    if both.sum() < alignment.matched:
+      print()
+      print(f"Rows matched by both prediction files: {both.sum()}")
+
+    _, labels_compare = pre_process(dataset_compare)
+    y_true = labels_og[both]
+    y_pred, y_compare = labels_pred[alignment.indexer[both]], labels_compare[compare_alignment.indexer[both]]
+
+    # Without an explicit amount of resamples the comparison uses the default one
+    comparison = paired_test(y_true, y_pred, y_compare, metric, resamples or 10_000, confidence, seed, workers)
+    show_comparison(comparison, metric, confidence)
+  elif resamples > 0:
+    intervals = bootstrap(y_true, y_pred, metric, resamples, confidence, seed, workers)
+    show_intervals(intervals, metric, confidence)
 
 if __name__ == "__main__":
-  # main("out/2018-E-c-En-test-gold.v2.txt", "out/senticnet_sem_eval_test.csv")
-  # main("out/iemocap-test.csv", "out/senticnet_iemocap_test.csv")
-  main("out/test_sent_emo.v2.csv", "out/senticnet_meld_test.csv")
\ No newline at end of file
+  parser = argparse.ArgumentParser(description="Evaluation of the SenticNet predictions against the original datasets | SENTI-Lib")
+  parser.add_argument("-g", "--gold", help="Original dataset of a single evaluation", action='store', default="out/test_sent_emo.v2.csv")
+  parser.add_argument("-p", "--prediction", help="Predictions file of a single evaluation", action='store', default="out/senticnet_meld_test.csv")
+  parser.add_argument(
+    "-m",
+    "--manifest",
+    help="JSON manifest with the (gold, prediction) pairs to be evaluated as a batch, e.g. senticnet/evaluations.json",
+    action='store',
+    default=None
+  )
+  parser.add_argument("-o", "--output", help="Results of the batch (.json, .csv or tab separated)", action='store', default="out/evaluations.json")
+  parser.add_argument(
+    "-w",
+    "--workers",
+    help="Amount of processes used to evaluate the batch or to run the resamples",
+    action='store',
+    type=int,
+    default=os.cpu_count()
+  )
+  parser.add_argument(
+    "-a",
+    "--align",
+    help="Key used to match the rows of the original dataset and of the predictions",
+    action='store',
+    choices=ALIGNMENTS,
+    default="text"
+  )
+  parser.add_argument("--unmatched", help="Save the unmatched rows of a single evaluation in a tab separated file", action='store', default=None)
+  parser.add_argument(
+    "-b",
+    "--bootstrap",
+    help="Amount of bootstrap resamples used for the confidence intervals of a single evaluation (0 to skip them)",
+    action='store',
+    type=int,
+    default=0
+  )
+  parser.add_argument(
+    "-c",
+    "--compare",
+    help="Second predictions file compared with the first one (paired bootstrap and permutation test)",
+    action='store',
+    default=None
+  )
+  parser.add_argument("--metric", help="Metric of the confidence intervals", action='store', choices=METRICS, default="f1")
+  parser.add_argument("--confidence", help="Confidence level of the intervals", action='store', type=float, default=0.95)
+  parser.add_argument("-s", "--seed", help="Seed of the resamples", action='store', type=int, default=42)
+  args = parser.parse_args()
+
+  if args.manifest is not None:
+    batch_main(args.manifest, args.output, args.workers, args.align)
+  else:
+    main(args.gold, args.prediction, args.align, args.unmatched, args.bootstrap, args.compare, args.metric, args.confidence, args.seed, args.workers)
\ No newline at end of file
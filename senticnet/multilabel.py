@@ -0,0 +1,289 @@
+from labels import CLASSIFIER_LABELS, LabelSet
+import argparse
+import numpy as np
+import time
+
+AVERAGES = ["micro", "macro", "weighted", "samples"]
+
+# Bits of every possible byte, as a (256 x 8) 0/1 matrix
+_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little").astype(np.int64)
+
+# Amount of labels of every possible byte
+_SIZES = LabelSet(np.arange(256)).cardinality().astype(np.int64)
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+  """Element-wise division where a zero denominator gives 0 (sklearn's zero_division=0)."""
+  numerator = np.asarray(numerator, dtype=np.float64)
+  denominator = np.asarray(denominator, dtype=np.float64)
+
+  result = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+  np.divide(numerator, denominator, out=result, where=denominator != 0)
+
+  return result
+
+class MultilabelScores:
+  """Counts of a multi-label evaluation and the metrics derived from them.
+
+  Every metric (per label and the micro, macro, weighted and samples averages)
+  only needs the per label TP/FP/FN/TN counts plus three per sample sums, so the
+  labels are scanned once (see `evaluate`) and everything else is computed over
+  arrays with one value per label. The results are the same ones of sklearn with
+  `zero_division=0`.
+  """
+  def __init__(
+    self,
+    tp: np.ndarray,
+    fp: np.ndarray,
+    fn: np.ndarray,
+    rows: int,
+    sample_sums: tuple[float, float, float]
+  ):
+    self.tp = np.asarray(tp, dtype=np.int64)
+    self.fp = np.asarray(fp, dtype=np.int64)
+    self.fn = np.asarray(fn, dtype=np.int64)
+    self.tn = rows - self.tp - self.fp - self.fn
+    self.rows = rows
+
+    # Sums over the samples of their precision, recall and F1
+    self.sample_sums = sample_sums
+
+  @property
+  def support(self) -> np.ndarray:
+    return self.tp + self.fn
+
+  def per_label(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Get the (precision, recall, f1, support) arrays with one value per label."""
+    precision = _divide(self.tp, self.tp + self.fp)
+    recall = _divide(self.tp, self.tp + self.fn)
+    f1 = _divide(2 * self.tp, 2 * self.tp + self.fp + self.fn)
+
+    return precision, recall, f1, self.support
+
+  def average(self, average: str) -> tuple[float, float, float, int]:
+    """Get the (precision, recall, f1, support) of an average, the support is the
+    total amount of true labels for every average.
+    """
+    support = int(self.support.sum())
+
+    if average == "micro":
+      tp, fp, fn = self.tp.sum(), self.fp.sum(), self.fn.sum()
+      return float(_divide(tp, tp + fp)), float(_divide(tp, tp + fn)), float(_divide(2 * tp, 2 * tp + fp + fn)), support
+
+    if average == "samples":
+      precision, recall, f1 = (float(_divide(total, self.rows)) for total in self.sample_sums)
+      return precision, recall, f1, support
+
+    precision, recall, f1, label_support = self.per_label()
+
+    if average == "macro":
+      return float(precision.mean()), float(recall.mean()), float(f1.mean()), support
+
+    if average == "weighted":
+      # Weighted sum divided by the total support, the same operations of sklearn (np.average)
+      # so the results round the same way
+      total = label_support.sum()
+      return tuple(float(_divide((metric * label_support).sum(), total)) for metric in (precision, recall, f1)) + (support,)
+
+    raise ValueError(f"Unknown average '{average}', use one of: {', '.join(AVERAGES)}")
+
+  def confusion_matrix(self) -> np.ndarray:
+    """Get the (labels x 2 x 2) confusion matrices, in the layout of sklearn's
+    `multilabel_confusion_matrix`: [[tn, fp], [fn, tp]].
+    """
+    return np.stack([self.tn, self.fp, self.fn, self.tp], axis=1).reshape(-1, 2, 2)
+
+  def report(self, labels: list[str] = CLASSIFIER_LABELS, digits: int = 2) -> str:
+    """Build the text report in the same format of sklearn's `classification_report`."""
+    headers = ["precision", "recall", "f1-score", "support"]
+    width = max(max(len(label) for label in labels), len("weighted avg"), digits)
+
+    head_fmt = "{:>{width}s} " + " {:>9}" * len(headers)
+    row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+
+    report = head_fmt.format("", *headers, width=width) + "\n\n"
+
+    for label, *values in zip(labels, *self.per_label()):
+      report += row_fmt.format(label, *values, width=width, digits=digits)
+
+    report += "\n"
+    for average in AVERAGES:
+      report += row_fmt.format(f"{average} avg", *self.average(average), width=width, digits=digits)
+
+    return report
+
+  def to_dict(self, labels: list[str] = CLASSIFIER_LABELS) -> dict:
+    """Get all of the metrics as plain values, structured as follows:
+      {
+        rows: amount of rows,
+        labels: { label: { precision, recall, f1, support, tp, fp, fn, tn } },
+        averages: { average: { precision, recall, f1, support } }
+      }
+    """
+    per_label = {}
+    for index, (label, precision, recall, f1, support) in enumerate(zip(labels, *self.per_label())):
+      per_label[label] = {
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1": float(f1),
+        "support": int(support),
+        "tp": int(self.tp[index]),
+        "fp": int(self.fp[index]),
+        "fn": int(self.fn[index]),
+        "tn": int(self.tn[index])
+      }
+
+    averages = {}
+    for average in AVERAGES:
+      precision, recall, f1, support = self.average(average)
+      averages[average] = { "precision": precision, "recall": recall, "f1": f1, "support": support }
+
+    return { "rows": self.rows, "labels": per_label, "averages": averages }
+
+def _evaluate_masks(y_true: LabelSet, y_pred: LabelSet) -> MultilabelScores:
+  """Evaluate bitmasks through the (256 x 256) table of how many rows have every
+  pair of (true, predicted) bitmasks, built with a single bincount.
+  """
+  label_count = len(y_true.labels)
+  codes = (y_true.masks.astype(np.int64) << 8) | y_pred.masks
+  joint = np.bincount(codes, minlength=256 * 256).reshape(256, 256)
+
+  bits = _BITS[:, :label_count]
+
+  # True positives of a label are the rows whose both bitmasks have its bit set
+  tp = np.einsum("tp,tl,pl->l", joint, bits, bits)
+  true_count = joint.sum(axis=1) @ bits
+  pred_count = joint.sum(axis=0) @ bits
+
+  # Per sample metrics of every pair of bitmasks, looked up for every row and summed in
+  # row order, so the sums round exactly like the per sample averages of sklearn
+  masks = np.arange(256)
+  intersection = _SIZES[masks[:, None] & masks[None, :]]
+  true_size = _SIZES[:, None]
+  pred_size = _SIZES[None, :]
+
+  sample_sums = tuple(
+    float(table.ravel()[codes].sum())
+    for table in (
+      _divide(intersection, pred_size),
+      _divide(intersection, true_size),
+      _divide(2 * intersection, true_size + pred_size)
+    )
+  )
+
+  return MultilabelScores(tp, pred_count - tp, true_count - tp, len(y_true), sample_sums)
+
+def _evaluate_matrices(y_true: np.ndarray, y_pred: np.ndarray) -> MultilabelScores:
+  """Evaluate (rows x labels) 0/1 matrices with column and row sums."""
+  y_true = np.asarray(y_true, dtype=bool)
+  y_pred = np.asarray(y_pred, dtype=bool)
+  both = y_true & y_pred
+
+  tp = both.sum(axis=0)
+  true_count = y_true.sum(axis=0)
+  pred_count = y_pred.sum(axis=0)
+
+  intersection = both.sum(axis=1)
+  true_size = y_true.sum(axis=1)
+  pred_size = y_pred.sum(axis=1)
+
+  sample_sums = (
+    float(_divide(intersection, pred_size).sum()),
+    float(_divide(intersection, true_size).sum()),
+    float(_divide(2 * intersection, true_size + pred_size).sum())
+  )
+
+  return MultilabelScores(tp, pred_count - tp, true_count - tp, len(y_true), sample_sums)
+
+def evaluate(y_true: "LabelSet | np.ndarray", y_pred: "LabelSet | np.ndarray") -> MultilabelScores:
+  """Compare the true and the predicted labels, given either as LabelSets or as
+  (rows x labels) 0/1 matrices (the format used by sklearn).
+
+  LabelSets are evaluated through their bitmasks, so the cost per row is a single
+  bincount no matter the amount of labels.
+  """
+  if isinstance(y_true, LabelSet) and isinstance(y_pred, LabelSet):
+    if y_true.labels != y_pred.labels:
+      raise ValueError("Both label sets must use the same labels")
+
+    return _evaluate_masks(y_true, y_pred)
+
+  if isinstance(y_true, LabelSet):
+    y_true = y_true.to_dense()
+  if isinstance(y_pred, LabelSet):
+    y_pred = y_pred.to_dense()
+
+  if np.shape(y_true) != np.shape(y_pred):
+    raise ValueError(f"The true and the predicted labels have different shapes: {np.shape(y_true)} vs {np.shape(y_pred)}")
+
+  return _evaluate_matrices(y_true, y_pred)
+
+def compare_reports(cases: int, seed: int) -> list[int]:
+  """Compare the reports with the ones of sklearn over small random cases (a few rows,
+  different label rates), where the averages are the most sensitive to rounding.
+  Returns the cases whose reports are different.
+  """
+  from sklearn.metrics import classification_report
+
+  mismatches = []
+  for case in range(cases):
+    gen = np.random.default_rng([seed, case])
+    rows = int(gen.integers(5, 400))
+
+    dense_true = gen.random((rows, len(CLASSIFIER_LABELS))) < gen.uniform(0.05, 0.4)
+    dense_pred = gen.random((rows, len(CLASSIFIER_LABELS))) < gen.uniform(0.05, 0.4)
+
+    report = classification_report(dense_true, dense_pred, target_names=CLASSIFIER_LABELS, zero_division=0)
+    reports = [
+      evaluate(LabelSet.from_dense(dense_true), LabelSet.from_dense(dense_pred)).report(),
+      evaluate(dense_true, dense_pred).report()
+    ]
+
+    if any(other != report for other in reports):
+      mismatches.append(case)
+
+  return mismatches
+
+def main(parser: argparse.ArgumentParser):
+  # sklearn is only needed to be compared against
+  from sklearn.metrics import classification_report, multilabel_confusion_matrix
+
+  args = parser.parse_args()
+  gen = np.random.default_rng(args.seed)
+
+  y_true = LabelSet.from_dense(gen.random((args.rows, len(CLASSIFIER_LABELS))) < 0.15)
+  y_pred = LabelSet.from_dense(gen.random((args.rows, len(CLASSIFIER_LABELS))) < 0.25)
+  dense_true, dense_pred = y_true.to_dense(), y_pred.to_dense()
+
+  start = time.perf_counter()
+  report = classification_report(dense_true, dense_pred, target_names=CLASSIFIER_LABELS, zero_division=0)
+  confusion_matrices = multilabel_confusion_matrix(dense_true, dense_pred)
+  sklearn_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  scores = evaluate(y_true, y_pred)
+  masks_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  dense_scores = evaluate(dense_true, dense_pred)
+  dense_time = time.perf_counter() - start
+
+  same = report == scores.report() == dense_scores.report()
+  same = same and (confusion_matrices == scores.confusion_matrix()).all()
+
+  mismatches = compare_reports(args.cases, args.seed)
+
+  print(f"Rows: {args.rows} | Same results as sklearn: {same}")
+  print(f"Random cases: {args.cases} | Different reports: {len(mismatches)}{f' (cases {mismatches})' if mismatches else ''}")
+  print()
+  print(f"{'Engine':<22}{'Time (ms)':>12}{'Speedup':>10}")
+  for name, elapsed in [("sklearn", sklearn_time), ("bitmasks", masks_time), ("0/1 matrices", dense_time)]:
+    print(f"{name:<22}{elapsed * 1000:>12.2f}{sklearn_time / elapsed:>9.1f}x")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark of the multi-label metrics against sklearn | SENTI-Lib")
+
+  parser.add_argument("-r", "--rows", help="Amount of random rows evaluated", action='store', type=int, default=1_000_000)
+  parser.add_argument("-s", "--seed", help="Seed of the random labels", action='store', type=int, default=42)
+  parser.add_argument("-c", "--cases", help="Amount of small random cases whose reports are compared with sklearn", action='store', type=int, default=300)
+
+  main(parser)
@@ -0,0 +1,63 @@
+from typing import Iterable
+import re
+
+# Emotions of the Hourglass of Emotions that the SenticNet API can return,
+# the position in the tuple is the label ID of the emotion
+SENTICNET_EMOTIONS = (
+  "grief",
+  "sadness",
+  "melancholy",
+  "contentment",
+  "joy",
+  "ecstasy",
+  "rage",
+  "anger",
+  "annoyance",
+  "serenity",
+  "calmness",
+  "bliss",
+  "loathing",
+  "disgust",
+  "dislike",
+  "acceptance",
+  "pleasantness",
+  "delight",
+  "terror",
+  "fear",
+  "anxiety",
+  "responsiveness",
+  "eagerness",
+  "enthusiasm"
+)
+
+NO_EMOTIONS_RESPONSE = "No emotions detected"
+
+class EmotionParser:
+  """Parser of the emotion responses of the SenticNet API.
+
+  The words of the response are looked up in a table with the known SenticNet
+  emotions, so only valid emotions are kept (the percentages, separators and
+  any other word are ignored) and they are mapped directly to their label IDs.
+  """
+  def __init__(self, vocabulary: Iterable[str] = SENTICNET_EMOTIONS):
+    self.vocabulary = tuple(vocabulary)
+    self.label_ids = { emotion: index for index, emotion in enumerate(self.vocabulary) }
+
+    self._words = re.compile(r"[a-z]+")
+
+  def parse(self, response: str) -> list[int]:
+    """Get the label IDs of the emotions in a response, in order of appearance."""
+    if NO_EMOTIONS_RESPONSE in response:
+      return []
+
+    label_ids = []
+    for word in self._words.findall(response.lower()):
+      label_id = self.label_ids.get(word)
+
+      if label_id is not None and label_id not in label_ids:
+        label_ids.append(label_id)
+
+    return label_ids
+
+  def to_names(self, label_ids: Iterable[int]) -> list[str]:
+    return [self.vocabulary[label_id] for label_id in label_ids]
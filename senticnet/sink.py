@@ -0,0 +1,246 @@
+from abc import ABC, abstractmethod
+from typing import TextIO
+import csv
+import io
+import json
+import os
+import time
+
+OUTPUT_COLUMNS = ["id", "text", "emotions"]
+
+class _LineBuffer:
+  # Minimal file-like object so the csv module formats a single row into a string
+  def __init__(self):
+    self.value = ""
+
+  def write(self, value: str):
+    self.value = value
+
+class OutputSink(ABC):
+  """Streaming writer for the rows fetched from the SenticNet API.
+
+  The output file is opened a single time in append mode and the rows are kept
+  in the write buffer until `flush_rows` rows were written or `flush_interval`
+  seconds went by since the last flush, whichever happens first.
+
+  Every row is written with a single call, so an interruption can only leave the
+  last row incomplete, and `recover` removes it before appending again. Rows are
+  only ever appended to files written by the same sink (see `is_compatible`).
+  """
+  # First line of every file written by the sink, None when the format has no header
+  HEADER: str | None = None
+
+  def __init__(self, path: str, flush_rows: int = 100, flush_interval: float = 1.0):
+    self.path = path
+    self.flush_rows = flush_rows
+    self.flush_interval = flush_interval
+
+    is_new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+
+    self._file: TextIO = open(path, "a", encoding="utf-8", newline="")
+    self._pending_rows = 0
+    self._last_flush = time.monotonic()
+
+    if is_new_file:
+      self._write_header()
+
+  @abstractmethod
+  def _write_header(self):
+    """Write the header of a new output file (if the format has one)."""
+
+  @abstractmethod
+  def _format_row(self, index: int, text: str, emotions: list[str]) -> str:
+    """Format a row as the text appended to the output, line break included."""
+
+  @classmethod
+  def _is_complete(cls, record: bytes) -> bool:
+    return True
+
+  @classmethod
+  @abstractmethod
+  def _parse_index(cls, record: bytes) -> int | None:
+    """Get the index of a complete record of the output, None when it is not a row written by the sink."""
+
+  @classmethod
+  def _scan(cls, path: str) -> tuple[set[int], int, bytes] | None:
+    """Read the records of an existing output file.
+
+    None is returned when any of them was not written by the sink, otherwise the
+    result is a tuple structured as follows:
+      (indices of the rows, size of the complete records, unclosed last record)
+    """
+    completed: set[int] = set()
+    valid_size = 0
+    record = b""
+
+    with open(path, "rb") as file:
+      for line in file:
+        # Only the last line may be missing its line break
+        if not line.endswith(b"\n"):
+          break
+
+        # A record may span multiple lines (e.g. quoted line breaks in the text)
+        record += line
+        if not cls._is_complete(record):
+          continue
+
+        if valid_size == 0 and cls.HEADER is not None:
+          if record != cls.HEADER.encode("utf-8"):
+            return None
+        else:
+          index = cls._parse_index(record)
+          if index is None:
+            return None
+
+          completed.add(index)
+
+        valid_size += len(record)
+        record = b""
+
+    return completed, valid_size, record
+
+  @classmethod
+  def is_compatible(cls, path: str) -> bool:
+    """Check whether rows can be appended to a file, that is, it does not exist
+    yet, it is empty or it was written by this sink.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+      return True
+
+    return cls._scan(path) is not None
+
+  @classmethod
+  def recover(cls, path: str) -> set[int] | None:
+    """Prepare an existing output file for being resumed.
+
+    The incomplete row left by a crash in the middle of a write (a last line
+    without its line break) is truncated away so it gets fetched again. The
+    indices of all of the complete rows are returned so they can be skipped.
+
+    Nothing is changed and None is returned when the file was not written by this
+    sink (e.g. the outputs of the older fetcher) or when more than a partial line
+    would have to be removed, so complete rows are never deleted.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+      return set()
+
+    result = cls._scan(path)
+    if result is None:
+      print(f"[ERROR] {path} was not written by the {cls.__name__}, it can not be resumed.")
+      return None
+
+    completed, valid_size, record = result
+
+    if valid_size != os.path.getsize(path):
+      # Complete lines that do not close a record are not a partial write of the sink
+      if record:
+        print(f"[ERROR] {path} ends with a row that is never closed, it can not be resumed.")
+        return None
+
+      print(f"[WARNING] Truncating incomplete row at the end of {path}")
+
+      with open(path, "r+b") as file:
+        file.truncate(valid_size)
+
+    return completed
+
+  def write(self, index: int, text: str, emotions: list[str]):
+    self._file.write(self._format_row(index, text, emotions))
+    self._pending_rows += 1
+
+    if self._pending_rows >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+      self.flush()
+
+  def flush(self):
+    self._file.flush()
+    self._pending_rows = 0
+    self._last_flush = time.monotonic()
+
+  def sync(self):
+    """Flush the rows and make sure they reach the disk."""
+    self.flush()
+    os.fsync(self._file.fileno())
+
+  def close(self):
+    if not self._file.closed:
+      self.flush()
+      self._file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+class TsvSink(OutputSink):
+  """Tab separated output with a header, quoting the fields that contain tabs,
+  quotes or line breaks so it can be read directly with `pd.read_csv(sep='\\t')`.
+
+  The rows are structured as follows:
+    id  text  emotion_1 ... emotion_n
+  """
+  HEADER = "\t".join(OUTPUT_COLUMNS) + "\n"
+
+  def __init__(self, path: str, flush_rows: int = 100, flush_interval: float = 1.0):
+    self._line = _LineBuffer()
+    self._writer = csv.writer(self._line, delimiter="\t", quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+
+    super().__init__(path, flush_rows, flush_interval)
+
+  def _write_header(self):
+    self._file.write(self.HEADER)
+
+  def _format_row(self, index: int, text: str, emotions: list[str]) -> str:
+    self._writer.writerow([index, text, " ".join(emotions)])
+    return self._line.value
+
+  @classmethod
+  def _is_complete(cls, record: bytes) -> bool:
+    # Quotes inside a quoted field are doubled, so the record is closed on an even count
+    return record.count(b'"') % 2 == 0
+
+  @classmethod
+  def _parse_index(cls, record: bytes) -> int | None:
+    # The rows of the older fetcher end with a tab, so they have an extra empty field
+    try:
+      fields = next(csv.reader(io.StringIO(record.decode("utf-8"), newline=""), delimiter="\t"))
+    except (UnicodeDecodeError, csv.Error, StopIteration):
+      return None
+
+    if len(fields) != len(OUTPUT_COLUMNS) or not fields[0].isdigit():
+      return None
+
+    return int(fields[0])
+
+class JsonlSink(OutputSink):
+  """One JSON object per line.
+
+  The rows are structured as follows:
+    { "id": id, "text": text, "emotions": "emotion_1 ... emotion_n" }
+  """
+  def _write_header(self):
+    # Every line is a self-describing object, there is no header
+    pass
+
+  def _format_row(self, index: int, text: str, emotions: list[str]) -> str:
+    return json.dumps({ "id": index, "text": text, "emotions": " ".join(emotions) }, ensure_ascii=False) + "\n"
+
+  @classmethod
+  def _parse_index(cls, record: bytes) -> int | None:
+    try:
+      row = json.loads(record)
+    except ValueError:
+      return None
+
+    if not isinstance(row, dict) or list(row) != OUTPUT_COLUMNS or not isinstance(row["id"], int):
+      return None
+
+    return row["id"]
+
+SINKS = {
+  "tsv": TsvSink,
+  "jsonl": JsonlSink
+}
+
+def open_sink(path: str, output_format: str = "tsv", flush_rows: int = 100, flush_interval: float = 1.0) -> OutputSink:
+  return SINKS[output_format](path, flush_rows=flush_rows, flush_interval=flush_interval)
@@ -0,0 +1,42 @@
+from typing import Iterator
+import pandas as pd
+
+def read_sentences(
+  path: str,
+  column_name: str,
+  offset: int = 0,
+  limit: int | None = None,
+  chunk_size: int = 10_000
+) -> Iterator[tuple[int, str]]:
+  """Lazily read the sentences of a column from a tab separated file.
+
+  Only the selected column is parsed, the rows before the offset are skipped by
+  the parser and the file is read in chunks of `chunk_size` rows, so the memory
+  used does not depend on the size of the file. Reading stops as soon as `limit`
+  rows were yielded.
+
+  Each yielded value is a tuple structured as follows:
+    (row_index, sentence)
+  """
+  if limit is not None and limit <= 0:
+    return
+
+  reader = pd.read_csv(
+    path,
+    sep='\t',
+    usecols=[column_name],
+    dtype=str,
+    keep_default_na=False,
+    skiprows=range(1, offset + 1),
+    chunksize=chunk_size
+  )
+
+  index = offset
+  with reader:
+    for chunk in reader:
+      for sentence in chunk[column_name]:
+        yield index, sentence
+        index += 1
+
+        if limit is not None and index - offset >= limit:
+          return
@@ -0,0 +1,131 @@
+from senticnet.parser import NO_EMOTIONS_RESPONSE, SENTICNET_EMOTIONS
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+import argparse
+import hashlib
+import random
+import re
+import time
+
+# Requests follow the API format: /<language>/<api_key>.py?text=<text>
+PATH_EXPRESSION = re.compile(r"^/(?P<language>[\w-]+)/(?P<api_key>[^/]+)\.py$")
+
+def build_response(text: str, no_emotions_rate: float = 0.15) -> str:
+  """Build a SenticNet like response for a text.
+
+  The response only depends on the text, so the same sentence always gets the
+  same emotions, and it is structured as follows:
+    emotion_1 (xx.x%) & emotion_2 (yy.y%)
+  """
+  seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+  generator = random.Random(seed)
+
+  if generator.random() < no_emotions_rate:
+    return NO_EMOTIONS_RESPONSE
+
+  emotions = generator.sample(SENTICNET_EMOTIONS, generator.choice([1, 2, 2, 2]))
+  return " & ".join(f"{emotion} ({generator.uniform(0, 100):.1f}%)" for emotion in emotions)
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+  # Keep-alive connections, so the pooled sessions of the client are exercised too.
+  # The headers and the body are sent separately, without Nagle's algorithm the
+  # body does not wait for the delayed ACK of the headers
+  protocol_version = "HTTP/1.1"
+  disable_nagle_algorithm = True
+
+  # Overwritten by `create_stub_server` with the settings of each server
+  latency = 0.05
+  jitter = 0.01
+  error_rate = 0.0
+  throttle_rate = 0.0
+
+  def do_GET(self):
+    url = urlparse(self.path)
+
+    if PATH_EXPRESSION.match(url.path) is None:
+      self._send(404, "Not found")
+      return
+
+    # Simulate the time the API takes to process the text
+    time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+    draw = random.random()
+    if draw < self.throttle_rate:
+      self._send(429, "Too many requests", headers={ "Retry-After": "1" })
+      return
+
+    if draw < self.throttle_rate + self.error_rate:
+      self._send(500, "Internal server error")
+      return
+
+    text = parse_qs(url.query).get("text", [""])[0]
+    self._send(200, build_response(text))
+
+  def _send(self, status: int, body: str, headers: dict | None = None):
+    encoded = body.encode("utf-8")
+
+    self.send_response(status)
+    self.send_header("Content-Type", "text/plain; charset=utf-8")
+    self.send_header("Content-Length", str(len(encoded)))
+    for name, value in (headers or {}).items():
+      self.send_header(name, value)
+    self.end_headers()
+
+    self.wfile.write(encoded)
+
+  def log_message(self, format, *args):
+    # Logging every request would dominate the benchmarks
+    pass
+
+class StubServer(ThreadingHTTPServer):
+  # The default listen backlog (5) overflows with many workers connecting at once,
+  # and the connections left out stall on SYN retransmits
+  request_queue_size = 128
+  daemon_threads = True
+
+def create_stub_server(
+  host: str = "127.0.0.1",
+  port: int = 0,
+  latency: float = 0.05,
+  jitter: float = 0.01,
+  error_rate: float = 0.0,
+  throttle_rate: float = 0.0
+) -> StubServer:
+  """Create a local stand-in of the SenticNet API (port 0 picks a free port)."""
+  handler = type("ConfiguredStubRequestHandler", (StubRequestHandler,), {
+    "latency": latency,
+    "jitter": jitter,
+    "error_rate": error_rate,
+    "throttle_rate": throttle_rate
+  })
+
+  return StubServer((host, port), handler)
+
+def start_stub_server(**kwargs) -> tuple[StubServer, str]:
+  """Start a stub server in a background thread and return it with its base URL."""
+  server = create_stub_server(**kwargs)
+  Thread(target=server.serve_forever, daemon=True).start()
+
+  host, port = server.server_address[:2]
+  return server, f"http://{host}:{port}"
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Local stand-in server for the SenticNet API | SENTI-Lib")
+
+  parser.add_argument("--host", help="Host to listen on", action='store', default="127.0.0.1")
+  parser.add_argument("-p", "--port", help="Port to listen on", action='store', type=int, default=8000)
+  parser.add_argument("-l", "--latency", help="Mean latency of a response in seconds", action='store', type=float, default=0.05)
+  parser.add_argument("-j", "--jitter", help="Standard deviation of the latency in seconds", action='store', type=float, default=0.01)
+  parser.add_argument("-e", "--error-rate", help="Fraction of requests answered with HTTP 500", action='store', type=float, default=0.0)
+  parser.add_argument("-t", "--throttle-rate", help="Fraction of requests answered with HTTP 429", action='store', type=float, default=0.0)
+
+  args = parser.parse_args()
+
+  server = create_stub_server(args.host, args.port, args.latency, args.jitter, args.error_rate, args.throttle_rate)
+  print(f"SenticNet stub listening on http://{args.host}:{server.server_address[1]}")
+
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    server.shutdown()
@@ -0,0 +1,108 @@
+from threading import Lock
+import time
+
+class TokenBucket:
+  """Thread safe token bucket limiting the amount of requests per second.
+
+  Tokens are refilled continuously at `rate` tokens per second up to `burst`
+  tokens. Every request takes one token, and waits for it when the bucket is
+  empty, so on average no more than `rate` requests are sent per second.
+  """
+  def __init__(self, rate: float, burst: int | None = None):
+    if rate <= 0:
+      raise ValueError(f"The rate must be greater than 0, got {rate}")
+
+    self.rate = rate
+    self.burst = burst if burst is not None else max(1, int(rate))
+
+    self._lock = Lock()
+    self._tokens = float(self.burst)
+    self._last_refill = time.monotonic()
+
+  def acquire(self):
+    with self._lock:
+      now = time.monotonic()
+      self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+      self._last_refill = now
+
+      # The token is reserved right away (the bucket may go negative), so the
+      # waiting threads are served in order without holding the lock while sleeping
+      self._tokens -= 1
+      wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    if wait > 0:
+      time.sleep(wait)
+
+class AdaptiveConcurrency:
+  """Additive increase / multiplicative decrease controller for the amount of
+  requests kept in flight.
+
+  The limit grows by roughly one request for every `limit` successful requests
+  while the API is healthy. It is cut by `decrease_factor` when the API throttles
+  us (HTTP 429), when a request fails (errors and timeouts) or when the latency
+  goes over `latency_tolerance` times the baseline latency (the lowest latency
+  recently observed). Consecutive decreases are spaced by `cooldown` seconds, so
+  a single burst of errors only counts once.
+  """
+  def __init__(
+    self,
+    initial: int,
+    minimum: int = 1,
+    maximum: int = 64,
+    decrease_factor: float = 0.5,
+    latency_tolerance: float = 2.0,
+    cooldown: float = 1.0
+  ):
+    self.minimum = minimum
+    self.maximum = maximum
+    self.decrease_factor = decrease_factor
+    self.latency_tolerance = latency_tolerance
+    self.cooldown = cooldown
+
+    self.throttled = 0
+    self.failed = 0
+    self.decreases = 0
+
+    self._lock = Lock()
+    self._limit = float(min(max(initial, minimum), maximum))
+    self._baseline_latency: float | None = None
+    self._last_decrease = 0.0
+
+  @property
+  def limit(self) -> int:
+    return int(self._limit)
+
+  def _decrease(self):
+    now = time.monotonic()
+    if now - self._last_decrease < self.cooldown:
+      return
+
+    self._last_decrease = now
+    self._limit = max(self.minimum, self._limit * self.decrease_factor)
+    self.decreases += 1
+
+  def on_success(self, latency: float):
+    with self._lock:
+      # The baseline follows the lowest latencies, slowly forgetting old ones
+      if self._baseline_latency is None or latency < self._baseline_latency:
+        self._baseline_latency = latency
+      else:
+        self._baseline_latency += (latency - self._baseline_latency) * 0.01
+
+      if latency > self.latency_tolerance * self._baseline_latency:
+        self._decrease()
+      else:
+        self._limit = min(self.maximum, self._limit + 1 / self._limit)
+
+  def on_throttle(self):
+    with self._lock:
+      self.throttled += 1
+      self._decrease()
+
+  def on_failure(self):
+    with self._lock:
+      self.failed += 1
+      self._decrease()
+
+  def summary(self) -> str:
+    return f"Concurrency limit: {self.limit} | Throttled: {self.throttled} | Failed: {self.failed} | Decreases: {self.decreases}"
@@ -0,0 +1,86 @@
+from labels import CLASSIFIER_LABELS
+from senticnet.metrics import align_rows, evaluate_entry, evaluate_frames
+from senticnet.multilabel import evaluate
+import numpy as np
+import pandas as pd
+import pytest
+
+def label_frame(ids: list, texts: list[str], labels: list[list[int]]) -> pd.DataFrame:
+  df = pd.DataFrame({ "ID": ids, "Dialog": texts })
+  return pd.concat([df, pd.DataFrame(labels, columns=CLASSIFIER_LABELS)], axis=1)
+
+GOLD = label_frame(
+  ["u0", "u1", "u2", "u3", "u4"],
+  ["Hello.", "Okay.", "Okay.", 'He said "no"', "Bye."],
+  np.eye(5, len(CLASSIFIER_LABELS), dtype=int).tolist()
+)
+
+def test_text_alignment_matches_repeated_texts_in_order():
+  # Reordered, with the second "Okay." and "Bye." missing and an extra row
+  pred = label_frame(
+    [3, 1, 9, 0],
+    ["He said no", "Okay.", "Not in the dataset", "  Hello. "],
+    np.zeros((4, len(CLASSIFIER_LABELS)), dtype=int).tolist()
+  )
+
+  alignment = align_rows(GOLD, pred, "text")
+
+  np.testing.assert_array_equal(alignment.indexer, [3, 1, -1, 0, -1])
+  np.testing.assert_array_equal(alignment.unmatched_gold(), [2, 4])
+  np.testing.assert_array_equal(alignment.unmatched_pred(), [2])
+
+def test_text_alignment_pairs_every_occurrence():
+  pred = label_frame([0, 1, 2], ["Okay.", "Okay.", "Okay."], np.zeros((3, len(CLASSIFIER_LABELS)), dtype=int).tolist())
+
+  alignment = align_rows(GOLD, pred, "text")
+
+  np.testing.assert_array_equal(alignment.indexer, [-1, 0, 1, -1, -1])
+  np.testing.assert_array_equal(alignment.unmatched_pred(), [2])
+
+def test_id_alignment():
+  pred = label_frame(["u4", "u0", "u7"], ["a", "b", "c"], np.zeros((3, len(CLASSIFIER_LABELS)), dtype=int).tolist())
+
+  alignment = align_rows(GOLD, pred, "id")
+
+  np.testing.assert_array_equal(alignment.indexer, [1, -1, -1, -1, 0])
+  np.testing.assert_array_equal(alignment.unmatched_pred(), [2])
+
+def test_position_alignment():
+  pred = label_frame([4, 2, 10], ["a", "b", "c"], np.zeros((3, len(CLASSIFIER_LABELS)), dtype=int).tolist())
+
+  alignment = align_rows(GOLD, pred, "position")
+
+  np.testing.assert_array_equal(alignment.indexer, [-1, -1, 1, -1, 0])
+  np.testing.assert_array_equal(alignment.unmatched_pred(), [2])
+
+@pytest.mark.parametrize("align, first_column", [("id", ["u1", "u1"]), ("position", [3, 3])])
+def test_repeated_keys_are_rejected(align, first_column):
+  pred = label_frame(first_column, ["a", "b"], np.zeros((2, len(CLASSIFIER_LABELS)), dtype=int).tolist())
+
+  with pytest.raises(ValueError):
+    align_rows(GOLD, pred, align)
+
+def test_repeated_gold_ids_are_reported(tmp_path):
+  gold = GOLD.assign(ID=["u0", "u0", "u1", "u2", "u3"])
+  gold_path = tmp_path / "gold.csv"
+  gold.to_csv(gold_path, sep="\t", index=False)
+
+  result = evaluate_entry({ "name": "repeated", "gold": str(gold_path), "prediction": str(gold_path), "align": "id" })
+
+  assert result["status"] == "error"
+
+def test_metrics_use_only_the_matched_rows():
+  pred = GOLD.iloc[[4, 0, 3]].reset_index(drop=True)
+  pred.iloc[0, 2:] = 1
+
+  scores, alignment = evaluate_frames(GOLD, pred, "text")
+  expected = evaluate(GOLD.iloc[[0, 3, 4], 2:].to_numpy(dtype=bool), pred.iloc[[1, 2, 0], 2:].to_numpy(dtype=bool))
+
+  assert alignment.matched == 3
+  assert scores.to_dict() == expected.to_dict()
+
+def test_no_matches_is_an_error():
+  pred = label_frame([0], ["Nothing in common"], np.zeros((1, len(CLASSIFIER_LABELS)), dtype=int).tolist())
+
+  with pytest.raises(ValueError):
+    evaluate_frames(GOLD, pred, "text")
@@ -0,0 +1,50 @@
+from labels import CLASSIFIER_LABELS
+from senticnet.metrics import evaluate_batch, evaluate_files, results_table, save_results
+import json
+import numpy as np
+import pandas as pd
+
+def write_frame(path, seed: int, rows: int = 200):
+  gen = np.random.default_rng(seed)
+  df = pd.DataFrame({ "ID": [f"u{index}" for index in range(rows)], "Dialog": [f"text {index}" for index in range(rows)] })
+  df = pd.concat([df, pd.DataFrame((gen.random((rows, len(CLASSIFIER_LABELS))) < 0.3).astype(int), columns=CLASSIFIER_LABELS)], axis=1)
+  df.to_csv(path, sep="\t", index=False)
+
+  return str(path)
+
+def create_entries(tmp_path) -> list[dict]:
+  gold = write_frame(tmp_path / "gold.csv", 0)
+
+  return [
+    { "name": "first", "gold": gold, "prediction": write_frame(tmp_path / "first.csv", 1) },
+    { "name": "missing", "gold": gold, "prediction": str(tmp_path / "missing.csv") },
+    { "name": "second", "gold": gold, "prediction": write_frame(tmp_path / "second.csv", 2), "align": "id" }
+  ]
+
+def test_batch_keeps_the_order_and_reports_errors(tmp_path):
+  entries = create_entries(tmp_path)
+  results = evaluate_batch(entries)
+
+  assert [result["name"] for result in results] == ["first", "missing", "second"]
+  assert [result["status"] for result in results] == ["ok", "error", "ok"]
+
+  scores, _ = evaluate_files(entries[0]["gold"], entries[0]["prediction"])
+  assert { key: results[0][key] for key in ["rows", "labels", "averages"] } == scores.to_dict()
+
+def test_batch_does_not_depend_on_the_workers(tmp_path):
+  entries = create_entries(tmp_path)
+
+  assert evaluate_batch(entries, workers=2) == evaluate_batch(entries)
+
+def test_results_are_saved(tmp_path):
+  results = evaluate_batch(create_entries(tmp_path))
+
+  save_results(results, str(tmp_path / "results.json"))
+  with open(tmp_path / "results.json", "r", encoding="utf-8") as file:
+    assert json.load(file) == results
+
+  save_results(results, str(tmp_path / "results.csv"))
+  table = pd.read_csv(tmp_path / "results.csv")
+
+  assert list(table["status"]) == ["ok", "error", "ok"]
+  assert table.loc[0, "micro_f1"] == results_table(results).loc[0, "micro_f1"]
@@ -0,0 +1,93 @@
+from labels import CLASSIFIER_LABELS, LabelSet
+from senticnet.bootstrap import METRICS, CodeTable, bootstrap, paired_test
+from senticnet.multilabel import AVERAGES, evaluate
+import numpy as np
+import pytest
+
+def random_labels(seed: int, rows: int, rate: float = 0.3) -> LabelSet:
+  gen = np.random.default_rng(seed)
+  return LabelSet.from_dense(gen.random((rows, len(CLASSIFIER_LABELS))) < rate)
+
+def expected_scores(y_true: LabelSet, y_pred: LabelSet, metric: str) -> np.ndarray:
+  scores = evaluate(y_true, y_pred)
+  per_label = scores.per_label()[METRICS.index(metric)]
+  averages = [scores.average(average)[METRICS.index(metric)] for average in AVERAGES]
+
+  return np.concatenate([per_label, averages])
+
+def code_weights(table: CodeTable, y_true: LabelSet, *y_preds: LabelSet, rows: np.ndarray) -> np.ndarray:
+  code = y_true.masks.astype(np.int64)
+  for y_pred in y_preds:
+    code = (code << 8) | y_pred.masks
+
+  _, inverse = np.unique(code, return_inverse=True)
+  return np.bincount(inverse[rows], minlength=len(table.counts))[None, :].astype(np.float64)
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_resample_scores_match_evaluate(metric):
+  y_true, y_pred = random_labels(0, 300), random_labels(1, 300)
+  table = CodeTable(y_true, y_pred)
+
+  # A resample of the rows with replacement, scored from its code counts
+  rows = np.random.default_rng(2).integers(300, size=300)
+  scores = table.scores(metric, table.totals(code_weights(table, y_true, y_pred, rows=rows)))[0]
+
+  np.testing.assert_allclose(scores, expected_scores(y_true[rows], y_pred[rows], metric), rtol=1e-12, atol=1e-15)
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_swapped_scores_match_evaluate(metric):
+  y_true, y_pred_a, y_pred_b = random_labels(0, 300), random_labels(1, 300), random_labels(2, 300)
+  table = CodeTable(y_true, y_pred_a, y_pred_b)
+
+  # The rows of a permutation that take the predictions of the other system
+  swapped = np.flatnonzero(np.random.default_rng(3).random(300) < 0.5)
+  totals = table.totals(code_weights(table, y_true, y_pred_a, y_pred_b, rows=np.arange(300)))
+  swapped_totals = table.totals(code_weights(table, y_true, y_pred_a, y_pred_b, rows=swapped))
+
+  masks_a, masks_b = y_pred_a.masks.copy(), y_pred_b.masks.copy()
+  masks_a[swapped], masks_b[swapped] = y_pred_b.masks[swapped], y_pred_a.masks[swapped]
+
+  for system, masks in enumerate([masks_a, masks_b]):
+    scores = table.scores(metric, totals, system, swapped_totals)[0]
+    np.testing.assert_allclose(scores, expected_scores(y_true, LabelSet(masks), metric), rtol=1e-12, atol=1e-15)
+
+@pytest.mark.parametrize("rows", [50, 2000])
+def test_bootstrap_point_estimates_and_intervals(rows):
+  y_true, y_pred = random_labels(0, rows), random_labels(1, rows)
+
+  intervals = bootstrap(y_true, y_pred, "f1", resamples=500, seed=5)
+  expected = expected_scores(y_true, y_pred, "f1")
+
+  assert list(intervals) == CLASSIFIER_LABELS + [f"{average} avg" for average in AVERAGES]
+  for (value, lower, upper), expected_value in zip(intervals.values(), expected):
+    assert value == pytest.approx(expected_value, rel=1e-12, abs=1e-15)
+    assert lower <= upper
+
+def test_bootstrap_does_not_depend_on_the_workers():
+  y_true, y_pred = random_labels(0, 400), random_labels(1, 400)
+
+  serial = bootstrap(y_true, y_pred, resamples=300, seed=9, block_size=100)
+  parallel = bootstrap(y_true, y_pred, resamples=300, seed=9, block_size=100, workers=2)
+
+  assert serial == parallel
+  assert serial != bootstrap(y_true, y_pred, resamples=300, seed=10, block_size=100)
+
+def test_paired_test_of_a_system_with_itself():
+  y_true, y_pred = random_labels(0, 400), random_labels(1, 400)
+
+  for value_a, value_b, difference, lower, upper, p_value in paired_test(y_true, y_pred, y_pred, resamples=200).values():
+    # Both systems are different columns of the same product, so only rounding tells them apart
+    assert value_a == pytest.approx(value_b, abs=1e-12)
+    assert max(abs(difference), abs(lower), abs(upper)) < 1e-12
+    assert p_value == 1
+
+def test_paired_test_finds_a_better_system():
+  y_true = random_labels(0, 1000)
+  y_pred_a = LabelSet(y_true.masks.copy())
+  y_pred_b = random_labels(1, 1000)
+
+  micro = paired_test(y_true, y_pred_a, y_pred_b, resamples=500)["micro avg"]
+
+  assert micro[2] > 0
+  assert micro[3] > 0
+  assert micro[5] < 0.01
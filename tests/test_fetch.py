@@ -0,0 +1,98 @@
+from senticnet.stub_server import build_response, start_stub_server
+from senticnet.parser import EmotionParser
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEGACY_FILE = os.path.join(ROOT, "senticnet", "dataset", "senticnet_meld_train.txt")
+
+ROWS = 300
+
+@pytest.fixture
+def job(tmp_path):
+  """Input file, output path and fetch command of a job against a local stub of the API."""
+  server, url = start_stub_server(latency=0.01, jitter=0.0)
+
+  # The fetcher reads the endpoint from the .env file of its working directory
+  with open(tmp_path / ".env", "w", encoding="utf-8") as file:
+    file.write(f"SENTIC_NET_URL={url}\nSENTIC_NET_LANGUAGE=en\nSENTIC_NET_API_KEY=test\n")
+
+  sentences = [f"sentence number {index}" for index in range(ROWS)]
+  pd.DataFrame({ "id": range(ROWS), "Dialog": sentences }).to_csv(tmp_path / "input.tsv", sep="\t", index=False)
+
+  output = tmp_path / "output.tsv"
+  command = [
+    sys.executable, "-m", "senticnet.fetch", "-f", "input.tsv", "-n", "Dialog", "--output", str(output),
+    "-j", "--checkpoint-every", "5", "--flush-rows", "1", "--no-cache"
+  ]
+
+  yield sentences, output, command
+
+  server.shutdown()
+  server.server_close()
+
+def run_fetch(command: list[str], cwd) -> subprocess.CompletedProcess:
+  return subprocess.run(command, cwd=cwd, env={ **os.environ, "PYTHONPATH": ROOT }, capture_output=True, text=True, timeout=120)
+
+def count_lines(path) -> int:
+  if not os.path.exists(path):
+    return 0
+
+  with open(path, "rb") as file:
+    return file.read().count(b"\n")
+
+def test_job_resumes_after_kill(job, tmp_path):
+  sentences, output, command = job
+
+  process = subprocess.Popen(command, cwd=tmp_path, env={ **os.environ, "PYTHONPATH": ROOT }, stdout=subprocess.DEVNULL)
+  deadline = time.monotonic() + 60
+  while count_lines(output) < 20 and time.monotonic() < deadline:
+    time.sleep(0.01)
+  process.send_signal(signal.SIGKILL)
+  process.wait()
+
+  assert process.returncode == -signal.SIGKILL
+  assert os.path.exists(str(output) + ".checkpoint.json")
+
+  # A row cut in the middle of its write is truncated and fetched again
+  with open(output, "ab") as file:
+    file.write(b"299\tsentence num")
+
+  result = run_fetch(command, tmp_path)
+  assert "[ERROR]" not in result.stdout
+  assert "Job finished" in result.stdout
+
+  df = pd.read_csv(output, sep="\t", keep_default_na=False)
+  parser = EmotionParser()
+
+  assert sorted(df["id"]) == list(range(ROWS))
+  assert list(df.sort_values("id")["text"]) == sentences
+  assert list(df.sort_values("id")["emotions"]) == [" ".join(parser.to_names(parser.parse(build_response(sentence)))) for sentence in sentences]
+
+  # A finished job leaves no checkpoint behind, and running it again fetches nothing
+  assert not os.path.exists(str(output) + ".checkpoint.json")
+
+  result = run_fetch(command, tmp_path)
+  assert f"Rows already fetched: {ROWS}" in result.stdout
+  assert count_lines(output) == ROWS + 1
+
+@pytest.mark.parametrize("job_mode", [True, False])
+def test_fetch_refuses_legacy_output(job, job_mode, tmp_path):
+  _, output, command = job
+  shutil.copyfile(LEGACY_FILE, output)
+
+  if not job_mode:
+    command = [argument for argument in command if argument != "-j"]
+
+  result = run_fetch(command, tmp_path)
+
+  assert "[ERROR]" in result.stdout
+  with open(output, "rb") as file, open(LEGACY_FILE, "rb") as legacy:
+    assert file.read() == legacy.read()
+  assert not os.path.exists(str(output) + ".checkpoint.json")
@@ -0,0 +1,64 @@
+from iemocap.manifest import ExtractionManifest
+import json
+import os
+
+RECORDS = [{ "session": "Session1", "id": "Ses01F_impro01_F000", "dialog": "Hello.", "emotions": ["joy"] }]
+
+def create_task(tmp_path) -> tuple[str, str, list[str]]:
+  transcription_file = tmp_path / "Ses01F_impro01.txt"
+  evaluation_file = tmp_path / "Ses01F_impro01_e1_cat.txt"
+  transcription_file.write_text("Ses01F_impro01_F000 [000.0000-001.0000]: Hello.\n")
+  evaluation_file.write_text("[000.0000 - 001.0000]\tSes01F_impro01_F000\t:Happiness;\t()\n")
+
+  return "Session1", str(transcription_file), [str(evaluation_file)]
+
+def test_manifest_reuses_unchanged_dialogs(tmp_path):
+  task = create_task(tmp_path)
+  path = str(tmp_path / "manifest.json")
+
+  manifest = ExtractionManifest(path)
+  assert manifest.get(task) is None
+  manifest.put(task, RECORDS, manifest.fingerprint(task))
+  manifest.save()
+
+  # The manifest only keeps the fingerprints and the name of the records file
+  with open(path, "r", encoding="utf-8") as file:
+    entry = json.load(file)["dialogs"][task[1]]
+  assert set(entry) == { "files", "records" }
+
+  assert ExtractionManifest(path).get(task) == RECORDS
+
+def test_manifest_keeps_fingerprints_from_before_parsing(tmp_path):
+  task = create_task(tmp_path)
+  path = str(tmp_path / "manifest.json")
+
+  manifest = ExtractionManifest(path)
+  files = manifest.fingerprint(task)
+
+  # The file is edited while the dialog is being parsed
+  with open(task[1], "a", encoding="utf-8") as file:
+    file.write("Ses01F_impro01_M000 [001.0000-002.0000]: Bye.\n")
+
+  manifest.put(task, RECORDS, files)
+  manifest.save()
+
+  assert ExtractionManifest(path).get(task) is None
+
+def test_manifest_removes_unused_records_files(tmp_path):
+  task = create_task(tmp_path)
+  path = str(tmp_path / "manifest.json")
+
+  manifest = ExtractionManifest(path)
+  manifest.put(task, RECORDS, manifest.fingerprint(task))
+  manifest.save()
+
+  with open(task[2][0], "a", encoding="utf-8") as file:
+    file.write("\n")
+
+  manifest = ExtractionManifest(path)
+  assert manifest.get(task) is None
+  manifest.put(task, RECORDS, manifest.fingerprint(task))
+  manifest.save()
+
+  assert len(os.listdir(manifest.records_directory)) == 1
+  assert ExtractionManifest(path).get(task) == RECORDS
@@ -0,0 +1,39 @@
+from labels import CLASSIFIER_LABELS, LabelSet
+from senticnet.multilabel import AVERAGES, compare_reports, evaluate
+from sklearn.metrics import classification_report, multilabel_confusion_matrix, precision_recall_fscore_support
+import numpy as np
+import pytest
+
+def random_labels(seed: int, rows: int, rate: float) -> tuple[np.ndarray, np.ndarray]:
+  gen = np.random.default_rng(seed)
+  dense_true = gen.random((rows, len(CLASSIFIER_LABELS))) < rate
+  dense_pred = gen.random((rows, len(CLASSIFIER_LABELS))) < rate
+
+  return dense_true, dense_pred
+
+def test_reports_match_sklearn():
+  assert compare_reports(100, seed=7) == []
+
+@pytest.mark.parametrize("seed, rows, rate", [(0, 1, 0.3), (1, 17, 0.05), (2, 500, 0.3), (3, 2000, 0.6)])
+def test_scores_match_sklearn(seed, rows, rate):
+  dense_true, dense_pred = random_labels(seed, rows, rate)
+
+  for scores in [evaluate(LabelSet.from_dense(dense_true), LabelSet.from_dense(dense_pred)), evaluate(dense_true, dense_pred)]:
+    expected = precision_recall_fscore_support(dense_true, dense_pred, average=None, zero_division=0)
+    for value, expected_value in zip(scores.per_label(), expected):
+      np.testing.assert_array_equal(value, expected_value)
+
+    for average in AVERAGES:
+      expected = precision_recall_fscore_support(dense_true, dense_pred, average=average, zero_division=0)
+      assert scores.average(average)[:3] == pytest.approx(expected[:3], rel=1e-12, abs=1e-15)
+
+    np.testing.assert_array_equal(scores.confusion_matrix(), multilabel_confusion_matrix(dense_true, dense_pred))
+
+def test_report_without_labels():
+  # Rows and labels without any true or predicted label divide by zero, which is 0
+  dense_true = np.zeros((10, len(CLASSIFIER_LABELS)), dtype=bool)
+  dense_pred = np.zeros((10, len(CLASSIFIER_LABELS)), dtype=bool)
+  dense_pred[0, 0] = True
+
+  report = classification_report(dense_true, dense_pred, target_names=CLASSIFIER_LABELS, zero_division=0)
+  assert evaluate(LabelSet.from_dense(dense_true), LabelSet.from_dense(dense_pred)).report() == report
@@ -0,0 +1,95 @@
+from senticnet.sink import JsonlSink, TsvSink
+import os
+import pandas as pd
+import pytest
+
+LEGACY_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "senticnet", "dataset", "senticnet_meld_train.txt")
+
+ROWS = [
+  (0, "plain text", ["joy"]),
+  (1, 'text with "quotes"', ["anger", "rage"]),
+  (2, "text with\ta tab", []),
+  (3, "text with\na line break", ["fear"]),
+  (4, 'a "quoted"\nline break', ["grief"])
+]
+
+def write_rows(sink_class, path: str, rows=ROWS):
+  with sink_class(str(path)) as sink:
+    for index, text, emotions in rows:
+      sink.write(index, text, emotions)
+
+def read_bytes(path) -> bytes:
+  with open(path, "rb") as file:
+    return file.read()
+
+def append_bytes(path, value: bytes):
+  with open(path, "ab") as file:
+    file.write(value)
+
+@pytest.mark.parametrize("sink_class", [TsvSink, JsonlSink])
+def test_recover_complete_file(sink_class, tmp_path):
+  path = tmp_path / "output"
+  write_rows(sink_class, path)
+  content = read_bytes(path)
+
+  assert sink_class.recover(str(path)) == { index for index, _, _ in ROWS }
+  assert read_bytes(path) == content
+
+@pytest.mark.parametrize("sink_class", [TsvSink, JsonlSink])
+def test_recover_truncates_partial_last_line(sink_class, tmp_path):
+  path = tmp_path / "output"
+  write_rows(sink_class, path)
+  content = read_bytes(path)
+
+  with sink_class(str(path)) as sink:
+    partial = sink._format_row(5, "interrupted row", ["joy"]).encode("utf-8")
+  append_bytes(path, partial[:-4])
+
+  assert sink_class.recover(str(path)) == { index for index, _, _ in ROWS }
+  assert read_bytes(path) == content
+
+def test_recover_keeps_unclosed_multiline_row(tmp_path):
+  path = tmp_path / "output.tsv"
+  write_rows(TsvSink, path)
+
+  # Only a last line without its line break may be removed, not the lines before it
+  append_bytes(path, b'5\t"interrupted\nrow')
+  content = read_bytes(path)
+
+  assert TsvSink.recover(str(path)) is None
+  assert read_bytes(path) == content
+
+def test_recover_missing_and_empty_file(tmp_path):
+  path = tmp_path / "output.tsv"
+  assert TsvSink.recover(str(path)) == set()
+
+  path.touch()
+  assert TsvSink.recover(str(path)) == set()
+
+@pytest.mark.parametrize("lines", [2000, None])
+def test_recover_refuses_legacy_file(lines, tmp_path):
+  # The older fetcher wrote the same header, but unquoted rows ending with a tab
+  path = tmp_path / "senticnet_meld_train.txt"
+  with open(LEGACY_FILE, "rb") as legacy, open(path, "wb") as file:
+    file.writelines(legacy.readlines()[:lines])
+  content = read_bytes(path)
+
+  assert not TsvSink.is_compatible(str(path))
+  assert TsvSink.recover(str(path)) is None
+  assert read_bytes(path) == content
+
+def test_recover_refuses_other_format(tmp_path):
+  path = tmp_path / "output"
+  write_rows(TsvSink, path)
+  content = read_bytes(path)
+
+  assert JsonlSink.recover(str(path)) is None
+  assert read_bytes(path) == content
+
+def test_tsv_output_is_read_by_pandas(tmp_path):
+  path = tmp_path / "output.tsv"
+  write_rows(TsvSink, path)
+
+  df = pd.read_csv(path, sep="\t", keep_default_na=False)
+  assert list(df["text"]) == [text for _, text, _ in ROWS]
+  assert list(df["emotions"]) == [" ".join(emotions) for _, _, emotions in ROWS]
@@ -0,0 +1,65 @@
+from labels import CLASSIFIER_LABELS
+import iemocap.split as split
+import io
+import numpy as np
+import pandas as pd
+import pytest
+
+ROWS = 1000
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+  """An IEMOCAP like dataset in out/iemocap.csv, in a temporary working directory."""
+  monkeypatch.chdir(tmp_path)
+  (tmp_path / "out").mkdir()
+
+  gen = np.random.default_rng(0)
+  df = pd.DataFrame({ "ID": [f"Ses01F_impro01_F{index:04d}" for index in range(ROWS)], "Dialog": [f"Utterance {index}." for index in range(ROWS)] })
+  df = pd.concat([df, pd.DataFrame((gen.random((ROWS, len(CLASSIFIER_LABELS))) < 0.2).astype(int), columns=CLASSIFIER_LABELS)], axis=1)
+  df.to_csv(tmp_path / "out" / "iemocap.csv", sep="\t", index=False)
+
+  return df
+
+def read_outputs(folds: int | None) -> dict[str, bytes]:
+  outputs = {}
+  for output, _ in split.get_outputs("iemocap.csv", folds):
+    with open("out/" + output, "rb") as file:
+      outputs[output] = file.read()
+
+  return outputs
+
+@pytest.mark.parametrize("folds", [None, 3])
+@pytest.mark.parametrize("assign, stratify", [("random", False), ("hash", False), ("random", True)])
+def test_streamed_split_is_the_in_memory_split(dataset, folds, assign, stratify):
+  split.split_in_memory("iemocap.csv", folds=folds, stratify=stratify, assign=assign)
+  in_memory = read_outputs(folds)
+
+  # Chunks that do not divide the rows, so the last one is shorter
+  split.split_streaming("iemocap.csv", folds=folds, stratify=stratify, assign=assign, chunk_size=37)
+  streamed = read_outputs(folds)
+
+  assert streamed == in_memory
+
+  # Every row is in one part of the split, or in one test part of the folds
+  parts = [pd.read_csv("out/" + output, sep="\t") for output in in_memory if folds is None or output.endswith("-test.csv")]
+  assert sorted(pd.concat(parts)["ID"]) == list(dataset["ID"])
+
+def test_split_frame_returns_the_saved_frames(dataset):
+  splits = split.split_frame(dataset, "iemocap.csv")
+
+  for output, df in splits.items():
+    pd.testing.assert_frame_equal(pd.read_csv("out/" + output, sep="\t"), df.reset_index(drop=True))
+
+def test_hash_split_keeps_the_parts_of_the_previous_rows(dataset):
+  split.split_in_memory("iemocap.csv", assign="hash")
+  full = read_outputs(None)
+
+  # The first rows are split, and the rest of the rows appended later
+  dataset.iloc[:600].to_csv("out/iemocap.csv", sep="\t", index=False)
+  split.split_streaming("iemocap.csv", assign="hash", chunk_size=37)
+
+  dataset.to_csv("out/iemocap.csv", sep="\t", index=False)
+  split.split_streaming("iemocap.csv", assign="hash", chunk_size=37, incremental=True)
+
+  for output, content in read_outputs(None).items():
+    assert sorted(pd.read_csv(io.BytesIO(content), sep="\t")["ID"]) == sorted(pd.read_csv(io.BytesIO(full[output]), sep="\t")["ID"])